@@ -1,7 +1,9 @@
 import logging
+import uuid
 from datetime import timedelta
 
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request, status
+from fastapi.security.utils import get_authorization_scheme_param
 from jose import JWTError, jwt
 
 from app.api.crud import user_crud
@@ -9,14 +11,52 @@ from app.schemas.auth import (
     AuthResponseSchema,
     RegisterPayloadSchema,
     LoginPayloadSchema,
+    LogoutPayloadSchema,
+    PasswordChangePayloadSchema,
+    RefreshPayloadSchema,
 )
 from app.config.app import settings
+from app.metrics import register_metrics_hook
 from app.models.user import User
-from app.utils import create_access_token, verify_password, oauth2_scheme
+from app.services.NotPwnedVerifier import count_breaches
+from app.services.RateLimiter import RateLimiter
+from app.utils import (
+    create_refresh_token,
+    create_user_access_token,
+    get_password_hash_async,
+    password_needs_rehash,
+    verify_password_async,
+    oauth2_scheme,
+    principal_cache,
+    revoked_tokens,
+    token_versions,
+    unknown_emails,
+)
 
 router = APIRouter()
 log = logging.getLogger("uvicorn")
 
+email_login_limiter = RateLimiter(
+    capacity=settings.login_throttle_email_burst,
+    rate=settings.login_throttle_email_rate,
+    max_keys=settings.login_throttle_max_keys,
+)
+ip_login_limiter = RateLimiter(
+    capacity=settings.login_throttle_ip_burst,
+    rate=settings.login_throttle_ip_rate,
+    max_keys=settings.login_throttle_max_keys,
+)
+register_metrics_hook(
+    "login_throttle",
+    lambda: {"email": email_login_limiter.stats(), "ip": ip_login_limiter.stats()},
+)
+
+unknown_account_stats = {"dummy_verifies": 0}
+dummy_password_hash = None
+register_metrics_hook(
+    "unknown_accounts", lambda: {**unknown_emails.stats(), **unknown_account_stats}
+)
+
 
 @router.post(
     "/register",
@@ -25,27 +65,23 @@ log = logging.getLogger("uvicorn")
     summary="Register New User",
 )
 async def register(payload: RegisterPayloadSchema) -> AuthResponseSchema:
+    await reject_pwned_password(payload.password)
     user = await user_crud.post(payload)
 
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token({"sub": user.email}, access_token_expires)
-
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-        "user": {
-            "id": user.id,
-            "name": user.name,
-            "email": user.email,
-        },
-    }
+    return issue_tokens(user)
 
 
 @router.post(
     "/login", response_model=AuthResponseSchema, status_code=200, summary="Login User"
 )
-async def login(form_data: LoginPayloadSchema) -> AuthResponseSchema:
-    user = await authenticate_user(form_data.username, form_data.password)
+async def login(
+    form_data: LoginPayloadSchema, request: Request, background_tasks: BackgroundTasks
+) -> AuthResponseSchema:
+    throttle_login(form_data.username.lower(), client_address(request))
+
+    user = await authenticate_user(
+        form_data.username, form_data.password, background_tasks
+    )
 
     if not user:
         raise HTTPException(
@@ -54,13 +90,146 @@ async def login(form_data: LoginPayloadSchema) -> AuthResponseSchema:
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+    return issue_tokens(user)
+
+
+@router.post(
+    "/refresh",
+    response_model=AuthResponseSchema,
+    status_code=200,
+    summary="Refresh Access Token",
+    description="Exchanges a refresh token for a new access and refresh token. Each refresh token can only be used once.",
+)
+async def refresh(payload: RefreshPayloadSchema) -> AuthResponseSchema:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid refresh token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    try:
+        claims = jwt.decode(
+            payload.refresh_token,
+            settings.app_secret,
+            algorithms=[settings.app_hash_algorithm],
+        )
+    except JWTError:
+        raise credentials_exception
+
+    if claims.get("typ") != "refresh" or not claims.get("jti"):
+        raise credentials_exception
+    if await revoked_tokens.is_revoked(claims["jti"]):
+        raise credentials_exception
+
+    # Rotate before the user lookup. Only one caller, on any worker, gets to
+    # insert the revocation, so a replayed token cannot race the original.
+    if not await revoked_tokens.revoke(claims["jti"], claims["exp"]):
+        raise credentials_exception
+
+    user = await user_crud.get(claims.get("uid"))
+    if not user or user.token_version != claims.get("ver"):
+        raise credentials_exception
+
+    return issue_tokens(user)
+
+
+@router.post(
+    "/password",
+    response_model=AuthResponseSchema,
+    status_code=200,
+    summary="Change Password",
+    description="Changes the signed-in user's password. Tokens issued before the change stop working, so the response carries new ones.",
+)
+async def change_password(
+    payload: PasswordChangePayloadSchema, request: Request
+) -> AuthResponseSchema:
+    scheme, access_token = get_authorization_scheme_param(
+        request.headers.get("Authorization")
     )
+    principal = await get_current_user(access_token if scheme.lower() == "bearer" else None)
+
+    user = await authenticate_user(principal.email, payload.current_password)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    await reject_pwned_password(payload.new_password)
+    await user_crud.change_password(user.id, payload.new_password)
+
+    return issue_tokens(await user_crud.get(user.id))
+
+
+@router.post("/logout", status_code=200, summary="Logout User")
+async def logout(payload: LogoutPayloadSchema, request: Request) -> dict:
+    scheme, access_token = get_authorization_scheme_param(
+        request.headers.get("Authorization")
+    )
+
+    for token in (access_token, payload.refresh_token):
+        await revoke_token(token)
+
+    return {"detail": "Logged out successfully"}
+
+
+async def verify_dummy_password(password: str) -> None:
+    """Spend the same bcrypt time as a real account so response times do not
+    reveal which emails exist."""
+    global dummy_password_hash
+
+    if dummy_password_hash is None:
+        dummy_password_hash = await get_password_hash_async(uuid.uuid4().hex)
+
+    unknown_account_stats["dummy_verifies"] += 1
+    await verify_password_async(password, dummy_password_hash)
+
+
+def client_address(request: Request) -> str:
+    """The caller's address, taken from X-Forwarded-For behind a trusted proxy."""
+    host = request.client.host if request.client else ""
+    trusted = {proxy.strip() for proxy in settings.trusted_proxies.split(",")}
+    if "*" not in trusted and host not in trusted:
+        return host
+
+    # Each proxy appends the address it was called from, so the last entry
+    # that is not one of ours is the client; anything before it can be forged.
+    for address in reversed(request.headers.get("x-forwarded-for", "").split(",")):
+        address = address.strip()
+        if address and address not in trusted:
+            return address
+
+    return host
+
+
+def throttle_login(email: str, client_ip: str) -> None:
+    for limiter, key in ((ip_login_limiter, client_ip), (email_login_limiter, email)):
+        if not limiter.allow(key):
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many login attempts. Try again later.",
+                headers={"Retry-After": str(limiter.retry_after(key))},
+            )
+
+
+async def reject_pwned_password(password: str) -> None:
+    breaches = await count_breaches(password)
+
+    if breaches is not None and breaches > settings.pwned_passwords_threshold:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="This password has appeared in a data breach. Please choose another.",
+        )
+
+
+def issue_tokens(user: User) -> dict:
+    access_token_expires = timedelta(minutes=30)
 
     return {
-        "access_token": access_token,
+        "access_token": create_user_access_token(
+            user, expires_delta=access_token_expires
+        ),
+        "refresh_token": create_refresh_token(user),
         "token_type": "bearer",
         "user": {
             "id": user.id,
@@ -70,13 +239,37 @@ async def login(form_data: LoginPayloadSchema) -> AuthResponseSchema:
     }
 
 
-async def authenticate_user(username: str, password: str):
-    user = await user_crud.get_user_by_email(username)
+async def revoke_token(token: str | None) -> None:
+    try:
+        claims = jwt.decode(
+            token, settings.app_secret, algorithms=[settings.app_hash_algorithm]
+        )
+    except (JWTError, AttributeError):
+        return
+
+    if claims.get("jti"):
+        await revoked_tokens.revoke(claims["jti"], claims["exp"])
+
+
+async def authenticate_user(
+    username: str, password: str, background_tasks: BackgroundTasks | None = None
+):
+    user = None
+    if not unknown_emails.get(username):
+        user = await user_crud.get_user_by_email(username)
+        if not user:
+            unknown_emails.set(username, True)
 
     if not user:
+        if settings.auth_dummy_verify:
+            await verify_dummy_password(password)
         return False
-    if not verify_password(password, user.password):
+    if not await verify_password_async(password, user.password):
         return False
+    if background_tasks is not None and password_needs_rehash(user.password):
+        background_tasks.add_task(
+            user_crud.rehash_password, user.id, password, user.password
+        )
     return user
 
 
@@ -91,15 +284,32 @@ async def get_current_user(token: str) -> User:  # pragma: no cover
             token, settings.app_secret, algorithms=[settings.app_hash_algorithm]
         )
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("typ") == "refresh":
+            raise credentials_exception
+        if await revoked_tokens.is_revoked(payload.get("jti")):
             raise credentials_exception
     except JWTError:
         raise credentials_exception
     except AttributeError:
         raise credentials_exception
+
+    user_id, version = payload.get("uid"), payload.get("ver")
+    if settings.auth_trust_token_claims and user_id is not None and version is not None:
+        if not await token_versions.is_current(user_id, version):
+            raise credentials_exception
+        return User(id=user_id, name=payload.get("name"), email=username)
+
+    user = principal_cache.get(token)
+    if user is not None:
+        return user
+
     user = await user_crud.get_user_by_email(email=username)
     if user is None:
         raise credentials_exception
+    if version is not None and version != user.token_version:
+        raise credentials_exception
+
+    principal_cache.set(token, user)
     return user
 
 
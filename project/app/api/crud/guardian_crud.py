@@ -1,10 +1,25 @@
 import datetime
-from typing import List
+from typing import AsyncIterator, List
 
 from tortoise.expressions import Q
 
+from app.api.crud import search_crud, student_crud
+from app.api.crud.queries import chunked, keyset, update_returning
 from app.schemas.guardian import GuardianBase, GuardianCreate
 from app.models.guardian import Guardian
+from app.traits.models.phone import phone_keys, phone_suffix
+
+EXPORT_FIELDS = [
+    "id",
+    "first_name",
+    "last_name",
+    "other_names",
+    "email",
+    "phone",
+    "identification_document_type",
+    "identification_document_number",
+    "identification_document_expiry",
+]
 
 
 async def post(payload: GuardianCreate) -> dict | None:
@@ -15,6 +30,7 @@ async def post(payload: GuardianCreate) -> dict | None:
         phone=payload.phone,
     )
     await guardian.save()
+    search_crud.index_guardian(guardian)
 
     return guardian
 
@@ -31,33 +47,54 @@ async def get(id: int | List) -> dict | List | None:
 
 
 async def get_guardian_by_phone(phone: str) -> dict | None:
-    guardian = await Guardian.filter(
-        Q(phone__endswith=phone[-9:]) & Q(deleted_at=None)
-    ).first()
+    suffix = phone_suffix(phone)
+    if suffix is None:
+        return None
+
+    guardian = await Guardian.filter(Q(phone_suffix=suffix) & Q(deleted_at=None)).first()
     if guardian:
         return guardian
     return None
 
 
-async def get_all() -> List:
-    guardians = await Guardian.filter(deleted_at=None).values()
+async def get_all(
+    limit: int | None = None, after: int | None = None, fields: List[str] | None = None
+) -> List:
+    guardians = await keyset(Guardian.filter(deleted_at=None), limit, after).values(
+        *(fields or [])
+    )
     return guardians
 
 
+async def count() -> int:
+    return await Guardian.filter(deleted_at=None).count()
+
+
+def export(chunk_size: int) -> AsyncIterator[List[dict]]:
+    return chunked(Guardian.filter(deleted_at=None), chunk_size, *EXPORT_FIELDS)
+
+
 async def delete(id: int) -> int | None:
     guardian = await Guardian.filter(Q(id=id) & Q(deleted_at=None)).update(
         deleted_at=datetime.datetime.now()
     )
     if guardian:
+        search_crud.forget_guardian(id)
+        student_crud.forget_scans(guardian=id)
         return guardian
     return None
 
 
 async def put(id: int, payload: GuardianBase) -> dict | None:
-    guardian = await Guardian.filter(Q(id=id) & Q(deleted_at=None)).update(
-        **payload.dict(exclude_unset=True)
+    values = payload.dict(exclude_unset=True)
+    if "phone" in values:
+        values.update(phone_keys(values["phone"]))
+
+    guardian = await update_returning(
+        Guardian.filter(Q(id=id) & Q(deleted_at=None)), **values
     )
     if guardian:
-        updated_guardian = await Guardian.filter(id=id).first()
-        return updated_guardian
+        search_crud.index_guardian(guardian)
+        student_crud.forget_scans(guardian=id)
+        return guardian
     return None
@@ -0,0 +1,159 @@
+import sqlite3
+from typing import AsyncIterator, List, Type, TypeVar
+
+from tortoise.backends.base.client import BaseDBAsyncClient
+from tortoise.expressions import Q
+from tortoise.models import Model
+from tortoise.queryset import QuerySet
+from tortoise.transactions import in_transaction
+
+MODEL = TypeVar("MODEL", bound=Model)
+
+# SQLite understands UPDATE ... RETURNING from 3.35 on.
+SQLITE_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+async def update_returning(queryset: QuerySet[MODEL], **values) -> MODEL | None:
+    """Update the rows matched by `queryset` and return the first one as it is now.
+
+    This is a single UPDATE ... RETURNING where the database supports it.
+    Otherwise the matching keys are read, updated and re-read inside one
+    transaction.
+    """
+    model: Type[MODEL] = queryset.model
+    if not values:
+        return await queryset.first()
+
+    query = queryset.update(**values)
+    query._db = query._db or query._choose_db(True)
+    if supports_returning(query._db):
+        query._make_query()
+        rows = await query._db.execute_query_dict(
+            "{0} RETURNING *".format(query.query), query.values
+        )
+
+        return model._init_from_db(**rows[0]) if rows else None
+
+    async with in_transaction(query._db.connection_name) as connection:
+        keys = await queryset.using_db(connection).values_list(
+            model._meta.pk_attr, flat=True
+        )
+        if not keys:
+            return None
+
+        await model.filter(pk__in=keys).using_db(connection).update(**values)
+        return await model.filter(pk=keys[0]).using_db(connection).first()
+
+
+async def insert_or_ignore(model: Type[MODEL], **values) -> bool:
+    """Insert one row unless it would break a unique constraint.
+
+    This is a single INSERT ... ON CONFLICT DO NOTHING, so concurrent
+    callers cannot both insert. Returns whether this call inserted the row.
+    """
+    instance = model(**values)
+    db = model._choose_db(True)
+    executor = db.executor_class(model=model, db=db)
+    query = executor._prepare_insert_statement(executor.regular_columns, ignore_conflicts=True)
+    parameters = [
+        executor.column_map[field](getattr(instance, field), instance)
+        for field in executor.regular_columns
+    ]
+
+    # Postgres reports no row count for an INSERT, only the rows it returns.
+    inserted, _ = await db.execute_query(
+        "{0} RETURNING {1}".format(query.get_sql(), model._meta.db_pk_column)
+        if supports_returning(db)
+        else query.get_sql(),
+        parameters,
+    )
+
+    return inserted > 0
+
+
+async def insert_many(
+    instances: List[MODEL],
+    batch_size: int,
+    connection: BaseDBAsyncClient | None = None,
+    ignore_conflicts: bool = False,
+) -> None:
+    """Insert unsaved instances with one multi-row INSERT per `batch_size` of them.
+
+    bulk_create repeats a single-row INSERT for every instance on SQLite.
+    Primary keys are not read back. With `ignore_conflicts`, rows that
+    would break a unique constraint are skipped.
+    """
+    model = type(instances[0])
+    db = connection or model._choose_db(True)
+    executor = db.executor_class(model=model, db=db)
+    columns = executor.regular_columns
+
+    for start in range(0, len(instances), batch_size):
+        batch = instances[start:start + batch_size]
+        query = db.query_class.into(model._meta.basetable).columns(*columns)
+        for row in range(len(batch)):
+            query = query.insert(
+                *[executor.parameter(row * len(columns) + i) for i in range(len(columns))]
+            )
+        if ignore_conflicts:
+            query = query.on_conflict().do_nothing()
+
+        await db.execute_query(
+            query.get_sql(),
+            [
+                executor.column_map[field](getattr(instance, field), instance)
+                for instance in batch
+                for field in columns
+            ],
+        )
+
+
+async def update_if(
+    queryset: QuerySet[MODEL], condition: Q, **values
+) -> bool | None:
+    """Update the rows in `queryset` that also match `condition`.
+
+    Returns True when a row was updated. This takes one UPDATE; only when
+    nothing was updated does a second query tell a missing row (None)
+    from one that fails `condition` (False).
+    """
+    if await queryset.filter(condition).update(**values):
+        return True
+
+    return False if await queryset.exists() else None
+
+
+def keyset(
+    queryset: QuerySet[MODEL], limit: int | None, after: int | None
+) -> QuerySet[MODEL]:
+    """Page through `queryset` by id; every page costs the same wherever it starts."""
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+
+    queryset = queryset.order_by("id")
+    return queryset.limit(limit) if limit else queryset
+
+
+async def chunked(
+    queryset: QuerySet[MODEL], size: int, *fields: str
+) -> AsyncIterator[List[dict]]:
+    """Yield `fields` of the rows in `queryset`, at most `size` rows at a time.
+
+    `fields` must include id. Each chunk is its own short keyset query, so no cursor or transaction
+    is held open while a slow client reads.
+    """
+    after = None
+    while True:
+        rows = await keyset(queryset, size, after).values(*fields)
+        if rows:
+            yield rows
+        if len(rows) < size:
+            return
+
+        after = rows[-1]["id"]
+
+
+def supports_returning(connection) -> bool:
+    dialect = connection.capabilities.dialect
+
+    return dialect == "postgres" or dialect == "sqlite" and SQLITE_RETURNING
@@ -0,0 +1,105 @@
+from typing import Callable, List
+
+from app.api.crud.queries import chunked
+from app.metrics import register_metrics_hook
+from app.models.guardian import Guardian
+from app.models.student import Student
+from app.services.SearchIndex import SearchIndex
+
+STUDENT_FIELDS = ["id", "student_code", "first_name", "other_names", "last_name"]
+GUARDIAN_FIELDS = ["id", "phone", "first_name", "other_names", "last_name"]
+
+index = SearchIndex()
+ready = False
+# Changes made while a rebuild is reading the tables, replayed onto the new
+# index so they are not lost to rows read before the change.
+pending: List[Callable[[SearchIndex], None]] | None = None
+
+register_metrics_hook("search_index", lambda: index.stats())
+
+
+async def search(query: str, limit: int = 10, kind: str | None = None) -> List[dict]:
+    if not ready and pending is None:
+        await rebuild()
+
+    return index.search(query, limit, kind)
+
+
+async def rebuild(chunk_size: int = 1000) -> None:
+    global index, pending, ready
+    fresh = SearchIndex()
+    pending = []
+
+    try:
+        async for rows in chunked(Student.filter(deleted_at=None), chunk_size, *STUDENT_FIELDS):
+            for row in rows:
+                _add_student(fresh, row)
+        async for rows in chunked(Guardian.filter(deleted_at=None), chunk_size, *GUARDIAN_FIELDS):
+            for row in rows:
+                _add_guardian(fresh, row)
+
+        for change in pending:
+            change(fresh)
+    finally:
+        pending = None
+
+    index = fresh
+    ready = True
+
+
+def index_student(student) -> None:
+    _apply(lambda index: _add_student(index, _row(student, STUDENT_FIELDS)))
+
+
+def index_students(rows: List[dict]) -> None:
+    def add(index):
+        for row in rows:
+            _add_student(index, row)
+
+    _apply(add)
+
+
+def forget_student(id: int) -> None:
+    _apply(lambda index: index.remove(("student", id)))
+
+
+def index_guardian(guardian) -> None:
+    _apply(lambda index: _add_guardian(index, _row(guardian, GUARDIAN_FIELDS)))
+
+
+def forget_guardian(id: int) -> None:
+    _apply(lambda index: index.remove(("guardian", id)))
+
+
+def _apply(change: Callable[[SearchIndex], None]) -> None:
+    change(index)
+    if pending is not None:
+        pending.append(change)
+
+
+def _row(instance, fields: List[str]) -> dict:
+    return {field: getattr(instance, field) for field in fields}
+
+
+def _add_student(index: SearchIndex, row: dict) -> None:
+    name = _fullname(row)
+    index.add(
+        ("student", row["id"]),
+        name,
+        {"type": "student", "id": row["id"], "name": name, "student_code": row["student_code"]},
+    )
+
+
+def _add_guardian(index: SearchIndex, row: dict) -> None:
+    name = _fullname(row)
+    index.add(
+        ("guardian", row["id"]),
+        name,
+        {"type": "guardian", "id": row["id"], "name": name, "phone": row["phone"]},
+    )
+
+
+def _fullname(row: dict) -> str:
+    return " ".join(
+        part for part in (row["first_name"], row["other_names"], row["last_name"]) if part
+    )
@@ -1,15 +1,54 @@
 import datetime
-from typing import Dict, List
+import re
+from typing import AsyncIterator, Dict, List, Tuple
 from faker import Faker
+from pydantic import ValidationError
+from pypika import Field, Table
+from tortoise import Tortoise
+from tortoise.exceptions import IntegrityError
 from tortoise.expressions import Q
+from tortoise.transactions import in_transaction
 
+from app.api.crud import search_crud
+from app.api.crud.queries import chunked, insert_many, insert_or_ignore, keyset, update_if, update_returning
+from app.config.app import settings
+from app.metrics import register_metrics_hook
 from app.schemas.student import StudentCreate, StudentUpdate
 from app.models.student import Student
 from app.api.crud import Student_Pydantic
 from app.models.guardian import Guardian
 from app.models.student_attendance import StudentAttendance
+from app.services.AttendanceBuffer import AttendanceBuffer
+from app.services.CodeAllocator import CodeAllocator
+from app.services.TTLCache import TTLCache
+
+EXPORT_FIELDS = ["id", "student_code", "first_name", "last_name", "other_names", "email"]
 
 fake = Faker()
+student_codes = CodeAllocator(
+    "student", settings.code_block_size, seed=lambda: Student.all().count()
+)
+
+# Student code -> what a kiosk scan needs, so repeated scans of the same
+# card resolve without touching the database.
+scan_cache = TTLCache(maxsize=settings.scan_cache_size, ttl=settings.scan_cache_ttl)
+register_metrics_hook("scan_cache", scan_cache.stats)
+
+# Write-behind check-ins and check-outs, when ATTENDANCE_BUFFER is set.
+attendance_buffer = None
+if settings.attendance_buffer:
+    attendance_buffer = AttendanceBuffer(
+        StudentAttendance,
+        "student_id",
+        settings.attendance_buffer_size,
+        settings.attendance_buffer_interval_ms / 1000,
+    )
+    register_metrics_hook("student_attendance_buffer", attendance_buffer.stats)
+
+CHECK_IN = "check-in"
+CHECK_OUT = "check-out"
+# How many times record_scans plans a batch before giving up on conflicts.
+SCAN_ATTEMPTS = 3
 
 
 async def post(payload: StudentCreate) -> dict | None:
@@ -23,11 +62,9 @@ async def post(payload: StudentCreate) -> dict | None:
     )
 
     if payload.guardians:
-        guardians = await Guardian.filter(id__in=payload.guardians)
-
-        for guardian in guardians:
-            await student.guardians.add(guardian)
+        await set_guardians(student.id, payload.guardians, replace=False)
 
+    search_crud.index_student(student)
     return student
 
 
@@ -47,6 +84,81 @@ async def get_student_by_student_code(student_code: str) -> dict | None:
     return None
 
 
+async def resolve_scan(student_code: str) -> dict | None:
+    """The student's id, display name and guardian email recipients."""
+    return (await resolve_scans([student_code])).get(student_code)
+
+
+async def resolve_scans(student_codes: List[str]) -> Dict[str, dict]:
+    """resolve_scan for many codes, reading the uncached ones in one query."""
+    scans = {}
+    for code in set(student_codes):
+        scan = scan_cache.get(code)
+        if scan is not None:
+            scans[code] = scan
+
+    missing = set(student_codes) - scans.keys()
+    if not missing:
+        return scans
+
+    for row in await scan_rows(list(missing)):
+        scan = scans.get(row["student_code"])
+        if scan is None:
+            student = Student(
+                first_name=row["first_name"],
+                last_name=row["last_name"],
+                other_names=row["other_names"],
+            )
+            scan = {"id": row["id"], "name": student.fullname(), "guardians": [], "guardian_ids": set()}
+            scan_cache.set(row["student_code"], scan)
+            scans[row["student_code"]] = scan
+
+        if row["guardian_id"] is not None:
+            scan["guardian_ids"].add(row["guardian_id"])
+            if row["guardian_email"] is not None:
+                scan["guardians"].append(
+                    {"email": row["guardian_email"], "name": row["guardian_first_name"]}
+                )
+
+    return scans
+
+
+async def scan_rows(student_codes: List[str]) -> List[dict]:
+    """One row per student and guardian, or a single row for a student without guardians."""
+    connection = Tortoise.get_connection("default")
+    relation = Student._meta.fields_map["guardians"]
+    student = Table(Student._meta.db_table)
+    through = Table(relation.through)
+    guardian = Table(Guardian._meta.db_table)
+    query = (
+        connection.query_class.from_(student)
+        .left_join(through)
+        .on(through[relation.backward_key] == student.id)
+        .left_join(guardian)
+        .on(guardian.id == through[relation.forward_key])
+        .select(
+            student.id,
+            student.student_code,
+            student.first_name,
+            student.last_name,
+            student.other_names,
+            guardian.id.as_("guardian_id"),
+            guardian.email.as_("guardian_email"),
+            guardian.first_name.as_("guardian_first_name"),
+        )
+        .where(student.student_code.isin(student_codes))
+        .where(student.deleted_at.isnull())
+    )
+
+    return await connection.execute_query_dict(str(query))
+
+
+def forget_scans(student: int | None = None, guardian: int | None = None) -> int:
+    return scan_cache.evict(
+        lambda code, scan: scan["id"] == student or guardian in scan["guardian_ids"]
+    )
+
+
 async def get_student_relation_by_student_code(
     student_code: str, relation: str
 ) -> Dict | None:
@@ -67,96 +179,344 @@ async def get_student_attendace_by_student_code(student_code: str) -> Dict | Non
     return attendance
 
 
-async def get_all() -> List:
-    students = await Student.filter(deleted_at=None)
+async def get_all(
+    limit: int | None = None, after: int | None = None, fields: List[str] | None = None
+) -> List:
+    query = keyset(Student.filter(deleted_at=None), limit, after)
+    students = await (query.values(*fields) if fields else query)
 
     return students
 
 
+async def count() -> int:
+    return await Student.filter(deleted_at=None).count()
+
+
+def export(chunk_size: int) -> AsyncIterator[List[dict]]:
+    return chunked(Student.filter(deleted_at=None), chunk_size, *EXPORT_FIELDS)
+
+
 async def delete(id: int) -> int | None:
     student = await Student.filter(Q(id=id) & Q(deleted_at=None)).update(
         deleted_at=datetime.datetime.now()
     )
 
     if student:
+        search_crud.forget_student(id)
+        forget_scans(student=id)
         return student
     return None
 
 
 async def restore(id: int) -> int | None:
-    student = await Student.filter(Q(id=id)).update(deleted_at=None)
+    student = await update_returning(Student.filter(Q(id=id)), deleted_at=None)
 
     if student:
-        return student
+        search_crud.index_student(student)
+        return 1
     return None
 
 
 async def put(id: int, payload: StudentUpdate) -> Dict | None:
     data = payload.dict(exclude_unset=True)
+    data.pop("replace_guardians", None)
 
     if "guardians" in data:
         data.pop("guardians")
 
-    student = await Student.filter(Q(id=id) & Q(deleted_at=None)).update(**data)
-
-    if payload.guardians:
-        st = await Student.get(id=id, deleted_at=None)
-        guardians = await Guardian.filter(id__in=payload.guardians)
+    student = await update_returning(
+        Student.filter(Q(id=id) & Q(deleted_at=None)), **data
+    )
 
-        if guardians:
-            for guardian in guardians:
-                await st.guardians.add(guardian)
-            
-            student = 1
+    if student and (
+        payload.guardians or payload.replace_guardians and payload.guardians is not None
+    ):
+        await set_guardians(
+            id, payload.guardians or [], replace=payload.replace_guardians
+        )
 
     if student:
-        updated_student = await Student.filter(id=id).first()
-
-        return updated_student
+        search_crud.index_student(student)
+        forget_scans(student=id)
+        return student
     return None
 
 
-async def generate_student_code() -> str:
-    student_count = await Student.all().count() + 1
-    pad = str(student_count).zfill(8)
+async def import_students(rows: List[Tuple[int, dict | None, str | None]]) -> Tuple[int, List]:
+    """Insert one batch of imported rows; returns the count created and the row errors."""
+    errors = []
+    payloads = []
+    for row, record, error in rows:
+        if error:
+            errors.append({"row": row, "detail": error})
+            continue
+
+        if isinstance(record.get("guardians"), str):
+            record["guardians"] = re.split(r"[;,\s]+", record["guardians"].strip())
+        try:
+            payloads.append((row, StudentCreate(**record)))
+        except ValidationError as e:
+            errors.append({"row": row, "detail": e.errors()})
+
+    emails = [payload.email for _, payload in payloads if payload.email]
+    taken = set(
+        await Student.filter(email__in=emails).values_list("email", flat=True)
+        if emails
+        else []
+    )
+    guardian_ids = {id for _, payload in payloads for id in payload.guardians or []}
+    known = set(
+        await Guardian.filter(id__in=guardian_ids, deleted_at=None).values_list(
+            "id", flat=True
+        )
+        if guardian_ids
+        else []
+    )
 
-    return "LS{0}-{1}".format(pad, fake.random_number(3))
+    accepted = []
+    for row, payload in payloads:
+        unknown = set(payload.guardians or []) - known
+        if payload.email and payload.email in taken:
+            errors.append({"row": row, "detail": "Email has already been taken"})
+        elif unknown:
+            errors.append(
+                {
+                    "row": row,
+                    "detail": "Unknown guardians: {0}".format(
+                        ", ".join(map(str, sorted(unknown)))
+                    ),
+                }
+            )
+        else:
+            taken.add(payload.email)
+            accepted.append((row, payload))
+
+    if not accepted:
+        return 0, errors
+
+    codes = await generate_student_codes(len(accepted))
+    try:
+        async with in_transaction() as connection:
+            await Student.bulk_create(
+                [
+                    Student(
+                        student_code=code,
+                        first_name=payload.first_name,
+                        last_name=payload.last_name,
+                        other_names=payload.other_names,
+                        email=payload.email,
+                    )
+                    for code, (_, payload) in zip(codes, accepted)
+                ],
+                using_db=connection,
+            )
+            ids = dict(
+                await Student.filter(student_code__in=codes)
+                .using_db(connection)
+                .values_list("student_code", "id")
+            )
+            await link_guardians(
+                [
+                    (ids[code], guardian)
+                    for code, (_, payload) in zip(codes, accepted)
+                    for guardian in set(payload.guardians or [])
+                ],
+                connection,
+            )
+    except IntegrityError as e:
+        # Another writer claimed one of the emails since the check above.
+        errors.extend({"row": row, "detail": str(e)} for row, _ in accepted)
+        return 0, errors
+
+    search_crud.index_students(
+        [
+            {
+                "id": ids[code],
+                "student_code": code,
+                "first_name": payload.first_name,
+                "other_names": payload.other_names,
+                "last_name": payload.last_name,
+            }
+            for code, (_, payload) in zip(codes, accepted)
+        ]
+    )
+    return len(accepted), errors
+
+
+async def set_guardians(
+    student: int, guardians: List[int], replace: bool = True
+) -> Tuple[int, int]:
+    """Link the student to `guardians`; returns the number of links added and removed."""
+    relation = Student._meta.fields_map["guardians"]
+
+    async with in_transaction() as connection:
+        wanted = set(
+            await Guardian.filter(id__in=guardians)
+            .using_db(connection)
+            .values_list("id", flat=True)
+            if guardians
+            else []
+        )
+        query = (
+            connection.query_class.from_(relation.through)
+            .select(relation.forward_key)
+            .where(Field(relation.backward_key) == student)
+        )
+        existing = {
+            row[relation.forward_key]
+            for row in await connection.execute_query_dict(str(query))
+        }
+
+        added = wanted - existing
+        removed = existing - wanted if replace else set()
+
+        await link_guardians([(student, guardian) for guardian in added], connection)
+        if removed:
+            query = (
+                connection.query_class.from_(relation.through)
+                .where(Field(relation.backward_key) == student)
+                .where(Field(relation.forward_key).isin(list(removed)))
+                .delete()
+            )
+            await connection.execute_query(str(query))
+
+    return len(added), len(removed)
+
+
+async def link_guardians(links: List[Tuple[int, int]], connection=None) -> None:
+    """Insert `(student_id, guardian_id)` pairs with one multi-row INSERT."""
+    if not links:
+        return
+
+    connection = connection or Tortoise.get_connection("default")
+    relation = Student._meta.fields_map["guardians"]
+    query = (
+        connection.query_class.into(relation.through)
+        .columns(relation.backward_key, relation.forward_key)
+        .insert(*links)
+    )
 
+    await connection.execute_query(str(query))
 
-async def has_checked_in(student: int, date) -> bool:
-    attendance = await StudentAttendance.get_or_none(student=student, date=date)
 
-    if attendance:
-        return True
+async def generate_student_code() -> str:
+    return format_student_code(await student_codes.next())
 
-    return False
 
+async def generate_student_codes(count: int) -> List[str]:
+    return [format_student_code(number) for number in await student_codes.take(count)]
 
-async def has_not_checked_out(student: int, date) -> bool:
-    attendance = await StudentAttendance.get_or_none(
-        student=student, date=date, checkout_at=None
-    )
 
-    if attendance:
-        return True
+def format_student_code(number: int) -> str:
+    pad = str(number).zfill(8)
 
-    return False
+    return "LS{0}-{1}".format(pad, fake.random_number(3))
 
 
-async def check_in(student: int, date):
-    attendance = await StudentAttendance.create(
-        student_id=student, date=date, checkin_at=datetime.datetime.now()
+async def check_in(student: int, date) -> bool:
+    """Check the student in for `date`, unless they already are."""
+    if attendance_buffer is not None:
+        return await attendance_buffer.check_in(student, date)
+
+    return await insert_or_ignore(
+        StudentAttendance, student_id=student, date=date, checkin_at=datetime.datetime.now()
     )
 
-    return attendance
 
+async def check_out(student: int, date) -> bool | None:
+    """Check the student out for `date`; False if already out, None if never in."""
+    if attendance_buffer is not None:
+        return await attendance_buffer.check_out(student, date)
 
-async def check_out(student: int, date):
-    attendance = await StudentAttendance.filter(
-        Q(student=student) & Q(date=date)
-    ).update(checkout_at=datetime.datetime.now(), updated_at=datetime.datetime.now())
+    now = datetime.datetime.now()
 
-    return attendance
+    return await update_if(
+        StudentAttendance.filter(student_id=student, date=date),
+        Q(checkout_at=None),
+        checkout_at=now,
+        updated_at=now,
+    )
+
+
+async def record_scans(
+    scans: List[Tuple[int, str, datetime.datetime]]
+) -> List[bool | None]:
+    """Apply `(student id, action, scanned_at)` scans in scan order; one result per scan."""
+    results: List[bool | None] = [None] * len(scans)
+    if not scans:
+        return results
+
+    if attendance_buffer is not None:
+        # Decided against the buffer's view of each day, as single scans
+        # are, so a batch and a check-in arriving together agree.
+        for index in sorted(range(len(scans)), key=lambda index: scans[index][2]):
+            student, action, scanned_at = scans[index]
+            record = attendance_buffer.check_in if action == CHECK_IN else attendance_buffer.check_out
+            results[index] = await record(student, scanned_at.date(), scanned_at)
+        return results
+
+    for attempt in range(SCAN_ATTEMPTS):
+        try:
+            await apply_scans(scans, results)
+            return results
+        except IntegrityError:
+            if attempt == SCAN_ATTEMPTS - 1:
+                raise
+
+
+async def apply_scans(
+    scans: List[Tuple[int, str, datetime.datetime]], results: List[bool | None]
+) -> None:
+    """One attempt at record_scans; fills in `results`."""
+    now = datetime.datetime.now()
+    async with in_transaction() as connection:
+        rows = await attendance_rows(
+            {student for student, _, _ in scans},
+            {scanned_at.date() for _, _, scanned_at in scans},
+            connection,
+        )
+        created, updated = {}, {}
+
+        for index in sorted(range(len(scans)), key=lambda index: scans[index][2]):
+            student, action, scanned_at = scans[index]
+            key = (student, scanned_at.date())
+            row = rows.get(key)
+
+            if action == CHECK_IN:
+                results[index] = row is None
+                if row is None:
+                    rows[key] = created[key] = StudentAttendance(
+                        student_id=student, date=key[1], checkin_at=scanned_at
+                    )
+            elif row is not None:
+                results[index] = row.checkout_at is None
+                if row.checkout_at is None:
+                    row.checkout_at = scanned_at
+                    row.updated_at = now
+                    if key not in created:
+                        updated[key] = row
+            else:
+                results[index] = None
+
+        if created:
+            await insert_many(list(created.values()), settings.import_batch_size, connection)
+        if updated:
+            await StudentAttendance.bulk_update(
+                list(updated.values()),
+                ["checkout_at", "updated_at"],
+                batch_size=settings.import_batch_size,
+                using_db=connection,
+            )
+
+
+async def attendance_rows(students: set, dates: set, connection) -> Dict[tuple, StudentAttendance]:
+    """The attendance rows of `students` on `dates`, locked until the transaction ends."""
+    return {
+        (row.student_id, row.date): row
+        for row in await StudentAttendance.filter(student_id__in=students, date__in=dates)
+        .select_for_update()
+        .using_db(connection)
+    }
 
 
 async def get_student_guardians_emails(student: str):
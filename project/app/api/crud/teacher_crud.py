@@ -1,15 +1,45 @@
 import datetime
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 from faker import Faker
 from tortoise.expressions import Q
 
+from app.api.crud.queries import chunked, insert_or_ignore, keyset, update_if, update_returning
+from app.config.app import settings
+from app.metrics import register_metrics_hook
 from app.schemas.teacher import TeacherCreate, TeacherUpdate
 from app.models.teacher import Teacher
 from app.models.guardian import Guardian
 from app.models.teacher_attendance import TeacherAttendance
+from app.services.AttendanceBuffer import AttendanceBuffer
+from app.services.CodeAllocator import CodeAllocator
+from app.traits.models.phone import phone_keys, phone_suffix
+
+EXPORT_FIELDS = [
+    "id",
+    "teacher_code",
+    "first_name",
+    "last_name",
+    "other_names",
+    "email",
+    "phone",
+]
 
 fake = Faker()
 
+# Write-behind check-ins and check-outs, when ATTENDANCE_BUFFER is set.
+attendance_buffer = None
+if settings.attendance_buffer:
+    attendance_buffer = AttendanceBuffer(
+        TeacherAttendance,
+        "teacher_id",
+        settings.attendance_buffer_size,
+        settings.attendance_buffer_interval_ms / 1000,
+    )
+    register_metrics_hook("teacher_attendance_buffer", attendance_buffer.stats)
+teacher_codes = CodeAllocator(
+    "teacher", settings.code_block_size, seed=lambda: Teacher.all().count()
+)
+
 
 async def post(payload: TeacherCreate) -> dict | None:
     teacher_code = await generate_teacher_code()
@@ -42,6 +72,18 @@ async def get_teacher_by_teacher_code(teacher_code: str) -> dict | None:
     return None
 
 
+async def get_teacher_by_phone(phone: str) -> dict | None:
+    suffix = phone_suffix(phone)
+    if suffix is None:
+        return None
+
+    teacher = await Teacher.filter(Q(phone_suffix=suffix) & Q(deleted_at=None)).first()
+
+    if teacher:
+        return teacher
+    return None
+
+
 async def get_teacher_attendace_by_teacher_code(teacher_code: str) -> Dict | None:
     teacher = await Teacher.get(
         teacher_code=teacher_code, deleted_at=None
@@ -52,12 +94,23 @@ async def get_teacher_attendace_by_teacher_code(teacher_code: str) -> Dict | Non
     return attendance
 
 
-async def get_all() -> List:
-    teachers = await Teacher.filter(deleted_at=None)
+async def get_all(
+    limit: int | None = None, after: int | None = None, fields: List[str] | None = None
+) -> List:
+    query = keyset(Teacher.filter(deleted_at=None), limit, after)
+    teachers = await (query.values(*fields) if fields else query)
 
     return teachers
 
 
+async def count() -> int:
+    return await Teacher.filter(deleted_at=None).count()
+
+
+def export(chunk_size: int) -> AsyncIterator[List[dict]]:
+    return chunked(Teacher.filter(deleted_at=None), chunk_size, *EXPORT_FIELDS)
+
+
 async def delete(id: int) -> int | None:
     teacher = await Teacher.filter(Q(id=id) & Q(deleted_at=None)).update(
         deleted_at=datetime.datetime.now()
@@ -76,53 +129,44 @@ async def restore(id: int) -> int | None:
     return None
 
 async def put(id: int, payload: TeacherUpdate) -> dict | None:
-    teacher = await Teacher.filter(Q(id=id) & Q(deleted_at=None)).update(
-        **payload.dict(exclude_unset=True)
+    values = payload.dict(exclude_unset=True)
+    if "phone" in values:
+        values.update(phone_keys(values["phone"]))
+
+    teacher = await update_returning(
+        Teacher.filter(Q(id=id) & Q(deleted_at=None)), **values
     )
 
     if teacher:
-        updated_teacher = await Teacher.filter(id=id).first()
-        return updated_teacher
+        return teacher
     return None
 
 async def generate_teacher_code() -> str:
-    teacher_count = await Teacher.all().count() + 1
-    pad = str(teacher_count).zfill(8)
+    pad = str(await teacher_codes.next()).zfill(8)
 
     return "LS-{0}-{1}-T".format(pad, fake.random_number(2))
 
 
-async def has_checked_in(teacher: int, date) -> bool:
-    attendance = await TeacherAttendance.get_or_none(teacher=teacher, date=date)
-
-    if attendance:
-        return True
+async def check_in(teacher: int, date) -> bool:
+    """Check the teacher in for `date`, unless they already are."""
+    if attendance_buffer is not None:
+        return await attendance_buffer.check_in(teacher, date)
 
-    return False
-
-
-async def has_not_checked_out(teacher: int, date) -> bool:
-    attendance = await TeacherAttendance.get_or_none(
-        teacher=teacher, date=date, checkout_at=None
+    return await insert_or_ignore(
+        TeacherAttendance, teacher_id=teacher, date=date, checkin_at=datetime.datetime.now()
     )
 
-    if attendance:
-        return True
 
-    return False
+async def check_out(teacher: int, date) -> bool | None:
+    """Check the teacher out for `date`; False if already out, None if never in."""
+    if attendance_buffer is not None:
+        return await attendance_buffer.check_out(teacher, date)
 
+    now = datetime.datetime.now()
 
-async def check_in(teacher: int, date):
-    attendance = await TeacherAttendance.create(
-        teacher_id=teacher, date=date, checkin_at=datetime.datetime.now()
-    )
-
-    return attendance
-
-
-async def check_out(teacher: int, date):
-    attendance = await TeacherAttendance.filter(
-        Q(teacher=teacher) & Q(date=date)
-    ).update(checkout_at=datetime.datetime.now(), updated_at=datetime.datetime.now())
-
-    return attendance
+    return await update_if(
+        TeacherAttendance.filter(teacher_id=teacher, date=date),
+        Q(checkout_at=None),
+        checkout_at=now,
+        updated_at=now,
+    )
\ No newline at end of file
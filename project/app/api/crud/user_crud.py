@@ -1,17 +1,19 @@
 import datetime
 from typing import List
 
-from tortoise.expressions import Q
+from tortoise.expressions import F, Q
 
+from app.api.crud.queries import keyset, update_returning
 from app.schemas.user import UserBase, UserCreate
 from app.models.user import User
-from app.utils import get_password_hash
+from app.utils import forget_principal, get_password_hash_async, unknown_emails
 
 
 async def post(payload: UserCreate) -> dict | None:
-    password = get_password_hash(payload.password)
+    password = await get_password_hash_async(payload.password)
     user = User(email=payload.email, name=payload.name, password=password)
     await user.save()
+    unknown_emails.pop(user.email)
 
     return user
 
@@ -30,25 +32,61 @@ async def get_user_by_email(email: str) -> dict | None:
     return None
 
 
-async def get_all() -> List:
-    users = await User.filter(deleted_at=None).values()
+async def get_all(
+    limit: int | None = None, after: int | None = None, fields: List[str] | None = None
+) -> List:
+    users = await keyset(User.filter(deleted_at=None), limit, after).values(
+        *(fields or [])
+    )
     return users
 
 
+async def count() -> int:
+    return await User.filter(deleted_at=None).count()
+
+
 async def delete(id: int) -> int | None:
+    now = datetime.datetime.now()
     user = await User.filter(Q(id=id) & Q(deleted_at=None)).update(
-        deleted_at=datetime.datetime.now()
+        deleted_at=now, updated_at=now, token_version=F("token_version") + 1
     )
     if user:
+        forget_principal(id)
         return user
     return None
 
 
 async def put(id: int, payload: UserBase) -> dict | None:
+    user = await update_returning(
+        User.filter(Q(id=id) & Q(deleted_at=None)),
+        **payload.dict(exclude_unset=True),
+        updated_at=datetime.datetime.now(),
+    )
+    if user:
+        forget_principal(id)
+        if payload.email:
+            unknown_emails.pop(payload.email)
+        return user
+    return None
+
+
+async def change_password(id: int, password: str) -> int | None:
+    hashed_password = await get_password_hash_async(password)
     user = await User.filter(Q(id=id) & Q(deleted_at=None)).update(
-        **payload.dict(exclude_unset=True)
+        password=hashed_password,
+        updated_at=datetime.datetime.now(),
+        token_version=F("token_version") + 1,
     )
     if user:
-        updated_user = await User.filter(id=id).first()
-        return updated_user
+        forget_principal(id)
+        return user
     return None
+
+
+async def rehash_password(id: int, password: str, hashed_password: str) -> int:
+    # Only replace the hash that was verified, so a password change that
+    # lands in the meantime is never overwritten.
+    rehashed_password = await get_password_hash_async(password)
+    return await User.filter(id=id, password=hashed_password).update(
+        password=rehashed_password
+    )
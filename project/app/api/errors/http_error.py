@@ -7,4 +7,6 @@ async def http_error_handler(
     request: Request,
     exc: HTTPException,
 ) -> JSONResponse:
-    return JSONResponse({"errors": exc.detail}, status_code=exc.status_code)
+    return JSONResponse(
+        {"errors": exc.detail}, status_code=exc.status_code, headers=exc.headers
+    )
@@ -1,17 +1,28 @@
+from functools import partial
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import EmailStr
 
 from app.api.auth import get_current_active_user
 from app.api.crud import guardian_crud
+from app.config.app import Settings, get_settings
 from app.models.user import User
+from app.providers.PaginationProvider import PaginationProvider
+from app.providers.ProjectionProvider import ProjectionProvider
 from app.schemas.guardian import GuardianCreate, GuardianResponse, GuardianUpdate
+from app.utils import encode_fields, export_response, fast_json_response
 
 router = APIRouter()
 
 
 @router.get("/", response_model=List[GuardianResponse], status_code=status.HTTP_200_OK, summary="Get All Guardians")
-async def index(email: str = None, phone: str = None) -> List[GuardianResponse]:
+async def index(
+    response: Response,
+    email: str = None,
+    phone: str = None,
+    page: PaginationProvider = Depends(),
+    fields: List[str] | None = Depends(ProjectionProvider(GuardianResponse)),
+) -> List[GuardianResponse]:
     if phone:
         guardian = await guardian_crud.get_guardian_by_phone(phone)
 
@@ -22,11 +33,34 @@ async def index(email: str = None, phone: str = None) -> List[GuardianResponse]:
 
         return [guardian]
 
-    guardians = await guardian_crud.get_all()
+    guardians = await page.paginate(
+        response, partial(guardian_crud.get_all, fields=fields), guardian_crud.count
+    )
+    if fields:
+        return fast_json_response(encode_fields(guardians, GuardianResponse), response)
 
     return guardians
 
 
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    summary="Export Guardians",
+    description="Streams every guardian as NDJSON, or as CSV with format=csv.",
+)
+async def export(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    settings: Settings = Depends(get_settings),
+):
+    return export_response(
+        "guardians",
+        guardian_crud.export(settings.export_chunk_size),
+        guardian_crud.EXPORT_FIELDS,
+        format,
+        GuardianResponse,
+    )
+
+
 @router.get("/{id}", response_model=GuardianResponse, status_code=status.HTTP_200_OK, summary="Get Guardians")
 async def show(id: int) -> GuardianResponse:
     guardian = await guardian_crud.get(id)
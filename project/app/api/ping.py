@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, status
 from starlette import responses
 from fastapi.responses import RedirectResponse
 
 from app.config.app import Settings, get_settings
+from app.metrics import collect_metrics
 
 router = APIRouter()
 
@@ -19,3 +20,11 @@ async def pong(settings: Settings = Depends(get_settings)):
         "environment": settings.environment,
         "testing": settings.testing,
     }
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(settings: Settings = Depends(get_settings)):
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+
+    return collect_metrics()
@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Query, status
+
+from app.api.crud import search_crud
+
+router = APIRouter()
+
+
+@router.get(
+    "/",
+    status_code=status.HTTP_200_OK,
+    summary="Search Students and Guardians",
+    description="Ranked typeahead over student and guardian names. Partial words match as prefixes.",
+)
+async def index(
+    q: str = Query(..., min_length=1, max_length=100),
+    type: str | None = Query(None, regex="^(student|guardian)$"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    results = await search_crud.search(q, limit, type)
+
+    return {"results": results}
@@ -1,22 +1,48 @@
 import datetime
-from typing import Dict
+from functools import partial
+from itertools import islice
+from typing import Dict, List
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status, UploadFile
+from starlette.concurrency import run_in_threadpool
 from starlette.responses import StreamingResponse
+from tortoise.exceptions import IntegrityError
 
 from app.api.crud import student_crud
+from app.schemas.attendance import ScanBatch
 from app.schemas.student import (
+    BaseResponse,
     StudentCreate,
     AllStudentsResponse,
     GetStudentResponse,
     StudentUpdate,
 )
-from app.utils import send_email, send_multiple_emails, generate_qrcode
+from app.utils import (
+    encode_fields,
+    export_response,
+    fast_json_response,
+    generate_qrcode,
+    read_records,
+    send_email,
+    send_grouped_emails,
+    send_multiple_emails,
+)
 from app.config.app import Settings, get_settings
+from app.providers.PaginationProvider import PaginationProvider
+from app.providers.ProjectionProvider import ProjectionProvider
 from app.logging import log
 
 router = APIRouter()
 
+# (action, what record_scans returned) -> the scan's status and detail.
+SCAN_RESULTS = {
+    ("check-in", True): ("checked_in", "{name} check in successful"),
+    ("check-in", False): ("already_checked_in", "Student has already checked in"),
+    ("check-out", True): ("checked_out", "{name} check out successful"),
+    ("check-out", False): ("already_checked_out", "Student has already checked out"),
+    ("check-out", None): ("not_checked_in", "Student has not checked in"),
+}
+
 
 @router.get(
     "/",
@@ -24,7 +50,12 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     summary="Get All Students",
 )
-async def index(student_code: str = None) -> AllStudentsResponse:
+async def index(
+    response: Response,
+    student_code: str = None,
+    page: PaginationProvider = Depends(),
+    fields: List[str] | None = Depends(ProjectionProvider(BaseResponse)),
+) -> AllStudentsResponse:
     if student_code:
         student = await student_crud.get_student_by_student_code(student_code)
 
@@ -34,11 +65,34 @@ async def index(student_code: str = None) -> AllStudentsResponse:
             )
 
         return {"students": [student]}
-    students = await student_crud.get_all()
+    students = await page.paginate(
+        response, partial(student_crud.get_all, fields=fields), student_crud.count
+    )
+    if fields:
+        return fast_json_response({"students": encode_fields(students, BaseResponse)}, response)
 
     return {"students": students}
 
 
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    summary="Export Students",
+    description="Streams every student as NDJSON, or as CSV with format=csv.",
+)
+async def export(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    settings: Settings = Depends(get_settings),
+):
+    return export_response(
+        "students",
+        student_crud.export(settings.export_chunk_size),
+        student_crud.EXPORT_FIELDS,
+        format,
+        BaseResponse,
+    )
+
+
 @router.get(
     "/{id}",
     response_model=GetStudentResponse,
@@ -68,6 +122,111 @@ async def store(payload: StudentCreate) -> GetStudentResponse:
     return {"student": student}
 
 
+@router.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    summary="Import Students",
+    description="Upload a CSV file with a header row, or NDJSON with one student per line. Guardians are existing guardian ids, separated by semicolons in CSV.",
+)
+async def import_students(
+    file: UploadFile, settings: Settings = Depends(get_settings)
+) -> Dict:
+    format = "ndjson" if file.filename.endswith((".ndjson", ".jsonl")) else "csv"
+    created = failed = 0
+    errors = []
+
+    records = read_records(file.file, format)
+    try:
+        # Reading and parsing the upload blocks, so each batch is read in
+        # the thread pool and only the inserts run on the event loop.
+        while batch := await run_in_threadpool(
+            list, islice(records, settings.import_batch_size)
+        ):
+            inserted, rejected = await student_crud.import_students(batch)
+            created += inserted
+            failed += len(rejected)
+            errors.extend(rejected[: settings.import_max_errors - len(errors)])
+    finally:
+        await file.close()
+
+    return {"created": created, "failed": failed, "errors": errors}
+
+
+@router.post(
+    "/scans",
+    status_code=status.HTTP_200_OK,
+    summary="Record Student Scans",
+    description="Check students in and out from a batch of kiosk scans, applied in the order they were scanned and dated by the device. Each scan gets its own result; guardians are notified as for single check-ins and check-outs.",
+)
+async def scans(
+    payload: ScanBatch,
+    background_tasks: BackgroundTasks,
+    request: Request,
+    settings: Settings = Depends(get_settings),
+) -> Dict:
+    events = payload.events
+    if len(events) > settings.scan_batch_max_events:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="A batch can hold at most {0} scans".format(settings.scan_batch_max_events),
+        )
+
+    students = await student_crud.resolve_scans([event.code for event in events])
+    try:
+        recorded = iter(
+            await student_crud.record_scans(
+                [
+                    (students[event.code]["id"], event.action, event.scanned_at)
+                    for event in events
+                    if event.code in students
+                ]
+            )
+        )
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Some of these scans were recorded at the same time, send the batch again",
+        )
+
+    results = []
+    messages = []
+    for event in events:
+        student = students.get(event.code)
+        if student is None:
+            outcome, detail = "not_found", "Student Not Found"
+        else:
+            outcome, detail = SCAN_RESULTS[event.action, next(recorded)]
+        results.append(
+            {
+                "code": event.code,
+                "action": event.action,
+                "status": outcome,
+                "detail": detail.format(name=student and student["name"]),
+            }
+        )
+
+        if outcome in ("checked_in", "checked_out") and student["guardians"]:
+            check_in = event.action == student_crud.CHECK_IN
+            messages.append(
+                (
+                    "Check In Notification" if check_in else "Check Out Notification",
+                    student["guardians"],
+                    {
+                        "url_for": request.url_for,
+                        "ward": student["name"],
+                        "checkin_at": event.scanned_at.strftime("%A, %d %B, %Y %H:%M %p"),
+                        "year": event.scanned_at.year,
+                    },
+                    "check_in.html" if check_in else "check_out.html",
+                )
+            )
+
+    if messages:
+        send_grouped_emails(background_tasks, messages, settings=settings)
+
+    return {"results": results}
+
+
 @router.put("/{id}", status_code=status.HTTP_200_OK, summary="Update Student Details")
 async def update(id: int, payload: StudentUpdate) -> Dict:
     student = await student_crud.put(id, payload)
@@ -116,21 +275,20 @@ async def check_in(
     request: Request,
     settings: Settings = Depends(get_settings),
 ):
-    student = await student_crud.get_student_by_student_code(student_code)
+    student = await student_crud.resolve_scan(student_code)
     date = datetime.datetime.now()
 
     if student:
-        has_checked_in = await student_crud.has_checked_in(
-            student.id, date.strftime("%Y-%m-%d")
+        checked_in = await student_crud.check_in(
+            student["id"], date.strftime("%Y-%m-%d")
         )
 
-        if has_checked_in:
+        if not checked_in:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Student has already checked in",
             )
-        await student_crud.check_in(student.id, date.strftime("%Y-%m-%d"))
-        guardians = await student_crud.get_student_guardians_emails(student_code)
+        guardians = student["guardians"]
 
         if guardians:
             send_multiple_emails(
@@ -139,7 +297,7 @@ async def check_in(
                 recipients=guardians,
                 body={
                     "url_for": request.url_for,
-                    "ward": student.fullname(),
+                    "ward": student["name"],
                     "checkin_at": date.strftime("%A, %d %B, %Y %H:%M %p"),
                     "year": date.year,
                 },
@@ -147,7 +305,7 @@ async def check_in(
                 settings=settings,
             )
 
-        return {"detail": student.fullname() + " check in successful"}
+        return {"detail": student["name"] + " check in successful"}
 
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND, detail="Student Not Found"
@@ -166,48 +324,43 @@ async def check_out(
     request: Request,
     settings: Settings = Depends(get_settings),
 ):
-    student = await student_crud.get_student_by_student_code(student_code)
+    student = await student_crud.resolve_scan(student_code)
     date = datetime.datetime.now()
 
     if student:
-        has_checked_in = await student_crud.has_checked_in(
-            student.id, date.strftime("%Y-%m-%d")
+        checked_out = await student_crud.check_out(
+            student["id"], date.strftime("%Y-%m-%d")
         )
 
-        if not has_checked_in:
+        if checked_out is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Student has not checked in",
             )
+        if not checked_out:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Student has already checked out",
+            )
 
-        has_not_checked_out = await student_crud.has_not_checked_out(
-            student.id, date.strftime("%Y-%m-%d")
-        )
-        if has_not_checked_out:
-            await student_crud.check_out(student.id, date.strftime("%Y-%m-%d"))
-            guardians = await student_crud.get_student_guardians_emails(student_code)
-
-            if guardians:
-                send_multiple_emails(
-                    background_tasks,
-                    subject="Check Out Notification",
-                    recipients=guardians,
-                    body={
-                        "url_for": request.url_for,
-                        "ward": student.fullname(),
-                        "checkin_at": date.strftime("%A, %d %B, %Y %H:%M %p"),
-                        "year": date.year,
-                    },
-                    template_name="check_out.html",
-                    settings=settings,
-                )
+        guardians = student["guardians"]
 
-            return {"detail":  student.fullname() + " check out successful"}
+        if guardians:
+            send_multiple_emails(
+                background_tasks,
+                subject="Check Out Notification",
+                recipients=guardians,
+                body={
+                    "url_for": request.url_for,
+                    "ward": student["name"],
+                    "checkin_at": date.strftime("%A, %d %B, %Y %H:%M %p"),
+                    "year": date.year,
+                },
+                template_name="check_out.html",
+                settings=settings,
+            )
 
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Student has already checked out",
-        )
+        return {"detail":  student["name"] + " check out successful"}
 
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND, detail="Student Not Found"
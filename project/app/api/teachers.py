@@ -1,18 +1,22 @@
 import datetime
-from typing import Dict
+from functools import partial
+from typing import Dict, List
 
-from fastapi import APIRouter, HTTPException, status, UploadFile, Depends, Request, BackgroundTasks
+from fastapi import APIRouter, HTTPException, status, UploadFile, Depends, Query, Request, Response, BackgroundTasks
 from starlette.responses import StreamingResponse
 
 from app.api.crud import teacher_crud
 from app.config.app import Settings, get_settings
+from app.providers.PaginationProvider import PaginationProvider
+from app.providers.ProjectionProvider import ProjectionProvider
 from app.schemas.teacher import (
+    BaseResponse,
     TeacherCreate,
     AllTeachersResponse,
     GetTeacherResponse,
     TeacherUpdate,
 )
-from app.utils import send_email, generate_qrcode
+from app.utils import encode_fields, export_response, fast_json_response, send_email, generate_qrcode
 
 router = APIRouter()
 
@@ -23,7 +27,13 @@ router = APIRouter()
     status_code=status.HTTP_200_OK,
     summary="Get All Teachers",
 )
-async def index(teacher_code: str = None) -> AllTeachersResponse:
+async def index(
+    response: Response,
+    teacher_code: str = None,
+    phone: str = None,
+    page: PaginationProvider = Depends(),
+    fields: List[str] | None = Depends(ProjectionProvider(BaseResponse)),
+) -> AllTeachersResponse:
     if teacher_code:
         teacher = await teacher_crud.get_teacher_by_teacher_code(teacher_code)
 
@@ -33,11 +43,43 @@ async def index(teacher_code: str = None) -> AllTeachersResponse:
             )
 
         return {"teachers": [teacher]}
-    teachers = await teacher_crud.get_all()
+    if phone:
+        teacher = await teacher_crud.get_teacher_by_phone(phone)
+
+        if not teacher:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="Teacher Not Found"
+            )
+
+        return {"teachers": [teacher]}
+    teachers = await page.paginate(
+        response, partial(teacher_crud.get_all, fields=fields), teacher_crud.count
+    )
+    if fields:
+        return fast_json_response({"teachers": encode_fields(teachers, BaseResponse)}, response)
 
     return {"teachers": teachers}
 
 
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    summary="Export Teachers",
+    description="Streams every teacher as NDJSON, or as CSV with format=csv.",
+)
+async def export(
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    settings: Settings = Depends(get_settings),
+):
+    return export_response(
+        "teachers",
+        teacher_crud.export(settings.export_chunk_size),
+        teacher_crud.EXPORT_FIELDS,
+        format,
+        BaseResponse,
+    )
+
+
 @router.get(
     "/{id}",
     response_model=GetTeacherResponse,
@@ -114,16 +156,15 @@ async def check_in(teacher_code: str):
     date = datetime.datetime.now()
 
     if teacher:
-        has_checked_in = await teacher_crud.has_checked_in(
+        checked_in = await teacher_crud.check_in(
             teacher.id, date.strftime("%Y-%m-%d")
         )
 
-        if has_checked_in:
+        if not checked_in:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="Teacher has already checked in",
             )
-        await teacher_crud.check_in(teacher.id, date.strftime("%Y-%m-%d"))
 
         return {"detail": teacher.fullname() + " check in successful"}
 
@@ -143,28 +184,22 @@ async def check_out(teacher_code: str):
     date = datetime.datetime.now()
 
     if teacher:
-        has_checked_in = await teacher_crud.has_checked_in(
+        checked_out = await teacher_crud.check_out(
             teacher.id, date.strftime("%Y-%m-%d")
         )
 
-        if not has_checked_in:
+        if checked_out is None:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Teacher has not checked in",
             )
+        if not checked_out:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Teacher has already checked out",
+            )
 
-        has_not_checked_out = await teacher_crud.has_not_checked_out(
-            teacher.id, date.strftime("%Y-%m-%d")
-        )
-        if has_not_checked_out:
-            await teacher_crud.check_out(teacher.id, date.strftime("%Y-%m-%d"))
-
-            return {"detail": teacher.fullname() + " check out successful"}
-
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Teacher has already checked out",
-        )
+        return {"detail": teacher.fullname() + " check out successful"}
 
     raise HTTPException(
         status_code=status.HTTP_404_NOT_FOUND, detail="Teacher Not Found"
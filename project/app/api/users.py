@@ -1,12 +1,16 @@
 import logging
+from functools import partial
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
 
 from app.schemas.user import UserCreate, UserResponse, UserUpdate
 from app.api.crud import user_crud
-from app.api.auth import get_current_active_user
+from app.api.auth import get_current_active_user, reject_pwned_password
 from app.models.user import User
+from app.utils import encode_fields, fast_json_response
+from app.providers.PaginationProvider import PaginationProvider
+from app.providers.ProjectionProvider import ProjectionProvider
 
 router = APIRouter()
 
@@ -14,8 +18,16 @@ log = logging.getLogger("uvicorn")
 
 
 @router.get("/", response_model=List[UserResponse], status_code=200, summary="Get All Users")
-async def index() -> List[UserResponse]:
-    users = await user_crud.get_all()
+async def index(
+    response: Response,
+    page: PaginationProvider = Depends(),
+    fields: List[str] | None = Depends(ProjectionProvider(UserResponse)),
+) -> List[UserResponse]:
+    users = await page.paginate(
+        response, partial(user_crud.get_all, fields=fields), user_crud.count
+    )
+    if fields:
+        return fast_json_response(encode_fields(users, UserResponse), response)
 
     return users
 
@@ -38,6 +50,7 @@ async def show(id: int) -> UserResponse:
     summary="Create New User",
 )
 async def store(payload: UserCreate) -> UserResponse:
+    await reject_pwned_password(payload.password)
     user = await user_crud.post(payload)
 
     return {"id": user.id, "name": user.name, "email": user.email}
@@ -21,8 +21,55 @@ class Settings(BaseSettings):
     app_name: str = os.getenv("APP_NAME", "Fastapi")
     environment: str = os.getenv("APP_ENVIRONMENT", "development")
     testing: bool = os.getenv("TESTING", 0)
+    metrics_enabled: bool = os.getenv("METRICS_ENABLED", 0)
     database_url = database.db_url
 
+    principal_cache_size: int = os.getenv("PRINCIPAL_CACHE_SIZE", 1024)
+    principal_cache_ttl: float = os.getenv("PRINCIPAL_CACHE_TTL", 60)
+    password_hash_workers: int = os.getenv("PASSWORD_HASH_WORKERS", 2)
+    bcrypt_target_ms: float = os.getenv("BCRYPT_TARGET_MS", 0)
+    bcrypt_min_rounds: int = os.getenv("BCRYPT_MIN_ROUNDS", 10)
+    bcrypt_max_rounds: int = os.getenv("BCRYPT_MAX_ROUNDS", 16)
+    auth_trust_token_claims: bool = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", 0)
+    token_version_staleness: float = os.getenv("TOKEN_VERSION_STALENESS", 5)
+    refresh_token_expire_days: float = os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 14)
+    revocation_staleness: float = os.getenv("REVOCATION_STALENESS", 5)
+    revocation_filter_capacity: int = os.getenv("REVOCATION_FILTER_CAPACITY", 100000)
+    revocation_filter_error_rate: float = os.getenv("REVOCATION_FILTER_ERROR_RATE", 0.001)
+    login_throttle_email_burst: float = os.getenv("LOGIN_THROTTLE_EMAIL_BURST", 5)
+    login_throttle_email_rate: float = os.getenv("LOGIN_THROTTLE_EMAIL_RATE", 0.1)
+    login_throttle_ip_burst: float = os.getenv("LOGIN_THROTTLE_IP_BURST", 30)
+    login_throttle_ip_rate: float = os.getenv("LOGIN_THROTTLE_IP_RATE", 0.5)
+    login_throttle_max_keys: int = os.getenv("LOGIN_THROTTLE_MAX_KEYS", 10000)
+    # Comma separated addresses whose X-Forwarded-For is believed; "*" for any.
+    trusted_proxies: str = os.getenv("TRUSTED_PROXIES", "127.0.0.1")
+    unknown_email_cache_size: int = os.getenv("UNKNOWN_EMAIL_CACHE_SIZE", 10000)
+    unknown_email_cache_ttl: float = os.getenv("UNKNOWN_EMAIL_CACHE_TTL", 30)
+    auth_dummy_verify: bool = os.getenv("AUTH_DUMMY_VERIFY", 1)
+    pwned_passwords_index: str | None = os.getenv("PWNED_PASSWORDS_INDEX")
+    pwned_passwords_threshold: int = os.getenv("PWNED_PASSWORDS_THRESHOLD", 0)
+    pwned_passwords_api_url: str | None = os.getenv("PWNED_PASSWORDS_API_URL")
+    pwned_passwords_api_timeout: float = os.getenv("PWNED_PASSWORDS_API_TIMEOUT", 2)
+    pwned_passwords_cache_size: int = os.getenv("PWNED_PASSWORDS_CACHE_SIZE", 256)
+    pwned_passwords_cache_ttl: float = os.getenv("PWNED_PASSWORDS_CACHE_TTL", 3600)
+
+    code_block_size: int = os.getenv("CODE_BLOCK_SIZE", 20)
+    page_size: int = os.getenv("PAGE_SIZE", 100)
+    max_page_size: int = os.getenv("MAX_PAGE_SIZE", 1000)
+    export_chunk_size: int = os.getenv("EXPORT_CHUNK_SIZE", 1000)
+    phone_country_code: str = os.getenv("PHONE_COUNTRY_CODE", "233")
+    scan_cache_size: int = os.getenv("SCAN_CACHE_SIZE", 4096)
+    scan_cache_ttl: float = os.getenv("SCAN_CACHE_TTL", 300)
+    scan_batch_max_events: int = os.getenv("SCAN_BATCH_MAX_EVENTS", 1000)
+    attendance_buffer: bool = os.getenv("ATTENDANCE_BUFFER", 0)
+    attendance_buffer_size: int = os.getenv("ATTENDANCE_BUFFER_SIZE", 500)
+    attendance_buffer_interval_ms: float = os.getenv("ATTENDANCE_BUFFER_INTERVAL_MS", 200)
+    idempotency_store: str = os.getenv("IDEMPOTENCY_STORE", "memory")
+    idempotency_cache_size: int = os.getenv("IDEMPOTENCY_CACHE_SIZE", 10000)
+    idempotency_ttl: float = os.getenv("IDEMPOTENCY_TTL", 86400)
+    import_batch_size: int = os.getenv("IMPORT_BATCH_SIZE", 500)
+    import_max_errors: int = os.getenv("IMPORT_MAX_ERRORS", 100)
+
     static_directory: DirectoryPath = os.getenv("STATIC_DIRECTORY")
 
     email_configuration = ConnectionConfig(
@@ -14,5 +14,8 @@ MODELS = [
     "app.models.student_attendance",
     "app.models.teacher",
     "app.models.teacher_attendance",
+    "app.models.code_sequence",
+    "app.models.idempotency_key",
+    "app.models.revoked_token",
     "aerich.models",
 ]
\ No newline at end of file
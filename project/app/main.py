@@ -4,18 +4,35 @@ from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from starlette.exceptions import HTTPException
 
+from app.api.crud import search_crud, student_crud, teacher_crud
 from app.db import init_db
 from app.router.api import api_router
 from app.api.errors.http_error import http_error_handler
 from app.config.app import settings
+from app.middleware.IdempotencyMiddleware import IdempotencyMiddleware
+from app.services.IdempotencyStore import get_idempotency_store
+from app.services.NotPwnedVerifier import get_pwned_verifier, PwnedRangeClient
+from app.utils import calibrate_password_hashing
 
 log = logging.getLogger("uvicorn")
 
+# (method, path pattern) of the writes a client may retry with an
+# Idempotency-Key header.
+IDEMPOTENT_ROUTES = [
+    ("POST", r"/(students|guardians|teachers)/"),
+    ("POST", r"/(students|teachers)/[^/]+/check-(in|out)"),
+    ("POST", r"/students/scans"),
+    ("PUT", r"/(students|guardians|teachers)/\d+"),
+]
+
 
 def create_application() -> FastAPI:
     application = FastAPI(title=settings.app_name)
     application.include_router(api_router)
     application.add_exception_handler(HTTPException, http_error_handler)
+    application.add_middleware(
+        IdempotencyMiddleware, store=get_idempotency_store(), routes=IDEMPOTENT_ROUTES
+    )
     application.mount("/static", StaticFiles(directory=settings.static_directory), name="static")
 
     return application
@@ -28,8 +45,25 @@ app = create_application()
 async def startup_event():
     log.info("Starting up...")
     init_db(app)
+    # Runs after the database handler that init_db just registered.
+    app.add_event_handler("startup", search_crud.rebuild)
+
+    if settings.bcrypt_target_ms:
+        rounds = calibrate_password_hashing(
+            settings.bcrypt_target_ms,
+            min_rounds=settings.bcrypt_min_rounds,
+            max_rounds=settings.bcrypt_max_rounds,
+        )
+        log.info("Using {0} bcrypt rounds".format(rounds))
 
 
 @app.on_event("shutdown") # pragma: no cover
 async def shutdown_event():
     log.info("Shutting down...")
+    for buffer in (student_crud.attendance_buffer, teacher_crud.attendance_buffer):
+        if buffer is not None:
+            await buffer.close()
+
+    verifier = get_pwned_verifier()
+    if isinstance(verifier, PwnedRangeClient):
+        await verifier.aclose()
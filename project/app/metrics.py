@@ -0,0 +1,11 @@
+from typing import Callable, Dict
+
+_hooks: Dict[str, Callable[[], dict]] = {}
+
+
+def register_metrics_hook(name: str, hook: Callable[[], dict]) -> None:
+    _hooks[name] = hook
+
+
+def collect_metrics() -> Dict[str, dict]:
+    return {name: hook() for name, hook in _hooks.items()}
@@ -0,0 +1,155 @@
+import hashlib
+import re
+from typing import Iterable, List, Tuple
+
+from starlette import status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyMiddleware:
+    """Answers a retried write with the response to the first attempt.
+
+    Requests to `routes` that carry an `Idempotency-Key` header run once
+    per key. A retry with the same key and the same request gets the stored
+    response back, marked with `Idempotent-Replayed: true`, without running
+    the endpoint or its background tasks again. Keys are scoped to the
+    caller's Authorization header. Reusing a key for a different request
+    returns 422, and retrying while the first attempt is still running
+    returns 409. Server errors are not stored, so those can be retried.
+    """
+
+    def __init__(self, app: ASGIApp, store, routes: Iterable[Tuple[str, str]]):
+        self.app = app
+        self.store = store
+        self.routes = [(method, re.compile(pattern)) for method, pattern in routes]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self._applies(scope):
+            return await self.app(scope, receive, send)
+
+        headers = Headers(scope=scope)
+        key = headers.get("idempotency-key")
+        if key is None:
+            return await self.app(scope, receive, send)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return await _error(
+                status.HTTP_400_BAD_REQUEST,
+                "Idempotency-Key must be 1 to {0} characters".format(MAX_KEY_LENGTH),
+            )(scope, receive, send)
+
+        body = await _read_body(receive)
+        key = _digest(headers.get("authorization", ""), key)
+        fingerprint = _digest(
+            scope["method"], scope["path"], scope["query_string"].decode("latin-1"), body
+        )
+
+        record = await self.store.begin(key, fingerprint)
+        if record is not None:
+            if record["fingerprint"] != fingerprint:
+                response = _error(
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                    "Idempotency-Key was already used for a different request",
+                )
+            elif record["response"] is None:
+                response = _error(
+                    status.HTTP_409_CONFLICT,
+                    "A request with this Idempotency-Key is still in progress",
+                )
+            else:
+                return await _replay(record["response"], send)
+
+            return await response(scope, receive, send)
+
+        await self._run(scope, body, receive, send, key, fingerprint)
+
+    async def _run(
+        self, scope: Scope, body: bytes, receive: Receive, send: Send, key: str, fingerprint: str
+    ) -> None:
+        received = False
+        finished = False
+        start: Message = {}
+        chunks: List[bytes] = []
+
+        async def replay_body() -> Message:
+            nonlocal received
+            if received:
+                return await receive()
+            received = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def record(message: Message) -> None:
+            nonlocal finished, start
+            if message["type"] == "http.response.start":
+                start = message
+            else:
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    # Stored before the client sees the end of the response,
+                    # so a retry can never arrive before the record.
+                    finished = True
+                    await self._finish(key, fingerprint, start, b"".join(chunks))
+
+            await send(message)
+
+        try:
+            await self.app(scope, replay_body, record)
+        finally:
+            if not finished:
+                await self.store.discard(key)
+
+    async def _finish(self, key: str, fingerprint: str, start: Message, body: bytes) -> None:
+        if start["status"] >= 500:
+            return await self.store.discard(key)
+
+        headers = [
+            [name.decode("latin-1"), value.decode("latin-1")]
+            for name, value in start.get("headers", [])
+        ]
+        await self.store.finish(key, fingerprint, (start["status"], headers, body))
+
+    def _applies(self, scope: Scope) -> bool:
+        return any(
+            scope["method"] == method and pattern.fullmatch(scope["path"])
+            for method, pattern in self.routes
+        )
+
+
+async def _read_body(receive: Receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _replay(response: tuple, send: Send) -> None:
+    status_code, headers, body = response
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (name.encode("latin-1"), value.encode("latin-1")) for name, value in headers
+            ]
+            + [(b"idempotent-replayed", b"true")],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def _error(status_code: int, detail: str) -> JSONResponse:
+    return JSONResponse({"errors": detail}, status_code=status_code)
+
+
+def _digest(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.encode())
+        digest.update(b"\0")
+
+    return digest.hexdigest()
@@ -0,0 +1,10 @@
+from tortoise.models import Model
+from tortoise import fields
+
+
+class CodeSequence(Model):
+    name = fields.CharField(50, pk=True)
+    next_value = fields.BigIntField(default=1)
+
+    class Meta:
+        table = "code_sequence"
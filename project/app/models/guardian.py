@@ -2,10 +2,11 @@ from tortoise.models import Model
 from tortoise import fields
 from tortoise.contrib.pydantic import pydantic_model_creator
 
+from app.traits.models.phone import Phone
 from app.traits.models.timestamp import Timestamp
 
 
-class Guardian(Model, Timestamp):
+class Guardian(Phone, Model, Timestamp):
     id = fields.IntField(pk=True)
     first_name = fields.CharField(119, null=False)
     last_name = fields.CharField(119, null=False)
@@ -28,7 +29,7 @@ class Guardian(Model, Timestamp):
         return "{0} {1}".format(self.first_name, self.last_name)
 
     class PydanticMeta:
-        exclude = ["created_at", "deleted_at"]
+        exclude = ["created_at", "deleted_at", "phone_e164", "phone_suffix"]
 
 
 SummarySchema = pydantic_model_creator(Guardian)
@@ -0,0 +1,14 @@
+from tortoise.models import Model
+from tortoise import fields
+
+
+class IdempotencyKey(Model):
+    key = fields.CharField(64, pk=True)
+    fingerprint = fields.CharField(64)
+    status_code = fields.IntField(null=True)
+    headers = fields.JSONField(null=True)
+    body = fields.BinaryField(null=True)
+    expires_at = fields.DatetimeField(index=True)
+
+    class Meta:
+        table = "idempotency_key"
@@ -0,0 +1,11 @@
+from tortoise.models import Model
+from tortoise import fields
+
+
+class RevokedToken(Model):
+    jti = fields.CharField(64, pk=True)
+    expires_at = fields.DatetimeField(index=True)
+    revoked_at = fields.DatetimeField(auto_now_add=True, index=True)
+
+    class Meta:
+        table = "revoked_token"
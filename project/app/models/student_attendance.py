@@ -17,6 +17,7 @@ class StudentAttendance(Model, Timestamp):
 
     class Meta:
         table = "student_attendace"
+        unique_together = (("student", "date"),)
 
     class PydanticMeta:
         exclude = ["deleted_at"]
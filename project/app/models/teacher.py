@@ -1,10 +1,11 @@
 from tortoise.models import Model
 from tortoise import fields
 
+from app.traits.models.phone import Phone
 from app.traits.models.timestamp import Timestamp
 
 
-class Teacher(Model, Timestamp):
+class Teacher(Phone, Model, Timestamp):
     id = fields.IntField(pk=True)
     teacher_code = fields.CharField(119, null=True, unique=True)
     first_name = fields.CharField(119, null=False)
@@ -27,4 +28,4 @@ class Teacher(Model, Timestamp):
         return "{0} {1}".format(self.first_name, self.last_name)
 
     class PydanticMeta:
-        exclude = ["created_at", "deleted_at"]
+        exclude = ["created_at", "deleted_at", "phone_e164", "phone_suffix"]
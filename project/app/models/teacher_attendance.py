@@ -17,6 +17,7 @@ class TeacherAttendance(Model, Timestamp):
 
     class Meta:
         table = "teacher_attendace"
+        unique_together = (("teacher", "date"),)
 
     class PydanticMeta:
         exclude = ["deleted_at"]
@@ -10,12 +10,13 @@ class User(Model, Timestamp):
     name = fields.CharField(119, null=False)
     email = fields.CharField(119, unique=True, null=False)
     password = fields.CharField(119, null=False)
+    token_version = fields.IntField(default=0)
 
     def __str__(self): # pragma: no cover
         return self.name
     
     class PydanticMeta:
-        exclude = ["password"]
+        exclude = ["password", "token_version"]
 
 
 SummarySchema = pydantic_model_creator(User)
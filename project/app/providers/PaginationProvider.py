@@ -0,0 +1,78 @@
+import base64
+import json
+from typing import Awaitable, Callable, List
+
+from fastapi import Query, Response
+from starlette import status
+from starlette.exceptions import HTTPException
+
+from app.config.app import settings
+
+
+class PaginationProvider:
+    """Keyset pagination on `id` for list endpoints.
+
+    A page is `limit` rows after the position in `cursor`, `page_size` rows
+    when only a cursor is given. The cursor for the next page is sent in
+    the X-Next-Cursor header, which is absent on the last page. Requests
+    with neither get the whole list, as before pagination, ordered by id.
+    With `include_total` the X-Total-Count header carries the number of
+    rows in the whole list.
+    """
+
+    def __init__(
+        self,
+        limit: int | None = Query(None, ge=1, le=settings.max_page_size),
+        cursor: str | None = None,
+        include_total: bool = False,
+    ):
+        self.limit = settings.page_size if limit is None and cursor else limit
+        self.include_total = include_total
+        self.after = None
+
+        if cursor:
+            try:
+                self.after = decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+                )
+
+    async def paginate(
+        self,
+        response: Response,
+        fetch: Callable[[int, int | None], Awaitable[List]],
+        count: Callable[[], Awaitable[int]],
+    ) -> List:
+        if self.limit is None:
+            rows = await fetch(None, None)
+        else:
+            # One extra row tells whether another page follows.
+            rows = await fetch(self.limit + 1, self.after)
+
+        if self.limit is not None and len(rows) > self.limit:
+            rows = rows[: self.limit]
+            last = rows[-1]
+            response.headers["X-Next-Cursor"] = encode_cursor(
+                last["id"] if isinstance(last, dict) else last.id
+            )
+        if self.include_total:
+            response.headers["X-Total-Count"] = str(await count())
+
+        return rows
+
+
+def encode_cursor(id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps({"id": id}).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))["id"]
+    except (TypeError, KeyError, UnicodeDecodeError, base64.binascii.Error) as e:
+        raise ValueError(cursor) from e
+
+    if not isinstance(id, int):
+        raise ValueError(cursor)
+
+    return id
@@ -0,0 +1,37 @@
+from typing import List, Type
+
+from fastapi import Query
+from pydantic import BaseModel
+from starlette import status
+from starlette.exceptions import HTTPException
+
+
+class ProjectionProvider:
+    """Turns `fields=a,b` into the list of columns a list endpoint should read.
+
+    Only fields of the response `schema` may be asked for, and `id` is always
+    included so pagination keeps working. Without `fields` the dependency
+    returns None and the endpoint serves full rows.
+    """
+
+    def __init__(self, schema: Type[BaseModel]):
+        self.allowed = list(schema.__fields__)
+
+    def __call__(
+        self,
+        fields: str | None = Query(
+            None, description="Comma separated fields to return, e.g. id,first_name"
+        ),
+    ) -> List[str] | None:
+        if not fields:
+            return None
+
+        requested = [field.strip() for field in fields.split(",") if field.strip()]
+        unknown = [field for field in requested if field not in self.allowed]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Unknown fields: {0}".format(", ".join(unknown)),
+            )
+
+        return list(dict.fromkeys(["id"] + requested))
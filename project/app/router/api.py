@@ -1,6 +1,6 @@
 from fastapi import APIRouter, Depends
 
-from app.api import ping, users, auth, students, guardians, attendance, teachers, teacher_attendance
+from app.api import ping, users, auth, students, guardians, attendance, teachers, teacher_attendance, search
 from app.providers.AuthenticationProvider import AuthenticationProvider
 
 api_router = APIRouter()
@@ -15,3 +15,4 @@ api_router.include_router(attendance.router, prefix="/student-attendance", tags=
 api_router.include_router(guardians.router, prefix="/guardians", tags=["guardians"])
 api_router.include_router(teachers.router, prefix="/teachers", tags=["teachers"])
 api_router.include_router(teacher_attendance.router, prefix="/teachers-attendance", tags=["teacher attendance"])
+api_router.include_router(search.router, prefix="/search", tags=["search"])
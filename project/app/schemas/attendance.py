@@ -1,6 +1,6 @@
 from typing import Any, List, TypedDict
-from datetime import date, datetime
-from pydantic import BaseModel
+from datetime import date, datetime, timezone
+from pydantic import BaseModel, Field, validator
 
 from app.schemas.student import BaseResponse as StudentBaseResponse
 from app.schemas.teacher import BaseResponse as TeacherBaseResponse
@@ -30,3 +30,22 @@ class TeacherAttendanceShemaBase(BaseModel):
 
 class TeacherAttendaceResponse(BaseModel):
     attendance: List[TeacherAttendanceShemaBase]
+
+
+class ScanEvent(BaseModel):
+    code: str
+    action: str = Field(..., regex="^(check-in|check-out)$")
+    scanned_at: datetime
+
+    @validator("scanned_at")
+    def in_utc(cls, value: datetime) -> datetime:
+        # Devices without a timezone are taken to report UTC, so every scan
+        # in a batch can be ordered against the others.
+        if value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+
+        return value.astimezone(timezone.utc)
+
+
+class ScanBatch(BaseModel):
+    events: List[ScanEvent]
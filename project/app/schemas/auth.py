@@ -17,7 +17,21 @@ class LoginPayloadSchema(BaseModel):
     password: str
 
 
+class RefreshPayloadSchema(BaseModel):
+    refresh_token: str
+
+
+class PasswordChangePayloadSchema(BaseModel):
+    current_password: str
+    new_password: str
+
+
+class LogoutPayloadSchema(BaseModel):
+    refresh_token: str | None
+
+
 class AuthResponseSchema(BaseModel):
     access_token: str
+    refresh_token: str | None
     token_type: str
     user: UserResponse
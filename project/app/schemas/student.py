@@ -17,6 +17,7 @@ class StudentUpdate(StudentBase):
     first_name: str | None
     last_name: str | None
     guardians: List[int] | None
+    replace_guardians: bool = False
 
 
 class BaseResponse(StudentBase):
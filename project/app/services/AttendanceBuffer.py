@@ -0,0 +1,218 @@
+import asyncio
+import datetime
+import logging
+from collections import OrderedDict
+from typing import Dict, Set, Tuple, Type
+
+from tortoise.models import Model
+from tortoise.transactions import in_transaction
+
+from app.api.crud.queries import insert_many
+
+log = logging.getLogger("uvicorn")
+
+
+class AttendanceBuffer:
+    """Write-behind check-ins and check-outs for one attendance model.
+
+    Events are answered from memory and written later: the check-ins with
+    one multi-row INSERT and the check-outs with one UPDATE, once `size`
+    events are waiting or `interval` seconds after the first of them. Who
+    has checked in and out is kept for the last `days` days, read from the
+    table the first time a day is seen and again, in one query, each time
+    the flush timer fires. Check-ins and duplicates are decided from that
+    view alone; only a check-out for someone missing from it is looked up
+    in the table, since another worker may have checked them in since.
+
+    Events still in memory are lost if the process dies; `close` writes
+    them on shutdown. A check-in or check-out made through another worker
+    since the last reload is accepted again, but the INSERT ... ON CONFLICT
+    DO NOTHING at flush keeps the first row per person and day, and the
+    earlier check-out time is the one kept.
+    """
+
+    def __init__(
+        self,
+        model: Type[Model],
+        owner: str,
+        size: int = 500,
+        interval: float = 0.2,
+        days: int = 2,
+    ):
+        self.model = model
+        self.owner = owner
+        self.size = size
+        self.interval = interval
+        self.days = days
+        self.flushes = 0
+        self.written = 0
+        self._days: OrderedDict = OrderedDict()
+        self._check_ins: Dict[tuple, Model] = {}
+        self._check_outs: Dict[tuple, datetime.datetime] = {}
+        self._lock = asyncio.Lock()
+        self._loading = asyncio.Lock()
+        self._timer: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._check_ins) + len(self._check_outs)
+
+    async def check_in(self, owner: int, date, at: datetime.datetime | None = None) -> bool:
+        checked_in, _ = await self._day(date)
+        if owner in checked_in:
+            return False
+
+        checked_in.add(owner)
+        self._check_ins[owner, str(date)] = self.model(
+            **{self.owner: owner}, date=date, checkin_at=at or datetime.datetime.now()
+        )
+        await self._added()
+
+        return True
+
+    async def check_out(
+        self, owner: int, date, at: datetime.datetime | None = None
+    ) -> bool | None:
+        checked_in, checked_out = await self._day(date)
+        if owner not in checked_in:
+            await self._look_up(owner, date, checked_in, checked_out)
+        if owner not in checked_in:
+            return None
+        if owner in checked_out:
+            return False
+
+        checked_out.add(owner)
+        at = at or datetime.datetime.now()
+        pending = self._check_ins.get((owner, str(date)))
+        if pending is not None:
+            pending.checkout_at = at
+        else:
+            self._check_outs[owner, str(date)] = at
+        await self._added()
+
+        return True
+
+    async def flush(self) -> int:
+        """Write every waiting event in one transaction; returns how many there were."""
+        async with self._lock:
+            check_ins, self._check_ins = self._check_ins, {}
+            check_outs, self._check_outs = self._check_outs, {}
+            if not check_ins and not check_outs:
+                return 0
+
+            try:
+                await self._write(list(check_ins.values()), check_outs)
+            except BaseException:
+                # Keep the events for the next flush, ahead of newer ones.
+                self._check_ins = {**check_ins, **self._check_ins}
+                self._check_outs = {**check_outs, **self._check_outs}
+                raise
+
+            self.flushes += 1
+            self.written += len(check_ins) + len(check_outs)
+            return len(check_ins) + len(check_outs)
+
+    async def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self),
+            "flushes": self.flushes,
+            "written": self.written,
+            "days": len(self._days),
+        }
+
+    async def _day(self, date) -> Tuple[Set[int], Set[int]]:
+        key = str(date)
+        if key not in self._days:
+            # Scans arriving together for a new day share one query.
+            async with self._loading:
+                if key not in self._days:
+                    rows = await self.model.filter(date=date).values_list(
+                        self.owner, "checkout_at"
+                    )
+                    self._days[key] = (
+                        {owner for owner, _ in rows},
+                        {owner for owner, checkout_at in rows if checkout_at is not None},
+                    )
+                    while len(self._days) > self.days:
+                        self._days.popitem(last=False)
+
+        self._days.move_to_end(key)
+        return self._days[key]
+
+    async def _look_up(self, owner: int, date, checked_in: Set[int], checked_out: Set[int]) -> None:
+        for checkout_at in await self.model.filter(
+            **{self.owner: owner}, date=date
+        ).values_list("checkout_at", flat=True):
+            checked_in.add(owner)
+            if checkout_at is not None:
+                checked_out.add(owner)
+
+    async def _reload(self) -> None:
+        """Fold in what other workers wrote for the kept days, in one query."""
+        days = {key: datetime.date.fromisoformat(key) for key in self._days}
+        if not days:
+            return
+
+        rows = await self.model.filter(date__in=list(days.values())).values_list(
+            self.owner, "date", "checkout_at"
+        )
+        for owner, date, checkout_at in rows:
+            day = self._days.get(str(date))
+            if day is not None:
+                day[0].add(owner)
+                if checkout_at is not None:
+                    day[1].add(owner)
+
+    async def _added(self) -> None:
+        if len(self) >= self.size:
+            await self._try_flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval)
+        self._timer = None
+        await self._try_flush()
+        try:
+            await self._reload()
+        except Exception:
+            log.exception("Reloading %s days failed", self.model._meta.db_table)
+
+    async def _try_flush(self) -> None:
+        # The events were already accepted, so a failed write is retried
+        # rather than reported to whoever happened to trigger it.
+        try:
+            await self.flush()
+        except Exception:
+            log.exception("Writing buffered %s rows failed", self.model._meta.db_table)
+            if self._timer is None:
+                self._timer = asyncio.create_task(self._flush_later())
+
+    async def _write(self, check_ins: list, check_outs: Dict[tuple, datetime.datetime]) -> None:
+        now = datetime.datetime.now()
+        async with in_transaction() as connection:
+            if check_ins:
+                await insert_many(check_ins, self.size, connection, ignore_conflicts=True)
+            if not check_outs:
+                return
+
+            rows = await self.model.filter(
+                **{self.owner + "__in": {owner for owner, _ in check_outs}},
+                date__in={date for _, date in check_outs},
+                checkout_at=None,
+            ).using_db(connection).values_list("id", self.owner, "date")
+            updates = [
+                self.model(id=id, checkout_at=check_outs[owner, str(date)], updated_at=now)
+                for id, owner, date in rows
+                if (owner, str(date)) in check_outs
+            ]
+            if updates:
+                await self.model.bulk_update(
+                    updates, ["checkout_at", "updated_at"], self.size, using_db=connection
+                )
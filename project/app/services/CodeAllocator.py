@@ -0,0 +1,81 @@
+from collections import deque
+from typing import Awaitable, Callable, List
+
+from tortoise.expressions import F
+
+from app.api.crud.queries import insert_or_ignore, update_returning
+from app.models.code_sequence import CodeSequence
+
+
+class CodeAllocator:
+    """Hands out unique numbers from a named row in `code_sequence`.
+
+    Each worker reserves `block_size` numbers at a time with a single
+    increment of the row, which the database serialises, and then serves
+    them from memory. Blocks never overlap, so workers cannot collide.
+    Numbers left in a block when a worker stops are skipped, not reused.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        block_size: int = 20,
+        seed: Callable[[], Awaitable[int]] | None = None,
+    ):
+        self.name = name
+        self.block_size = block_size
+        self.reservations = 0
+        self._seed = seed
+        self._created = False
+        self._next = 0
+        self._end = 0
+        self._blocks: deque = deque()
+
+    async def next(self) -> int:
+        return (await self.take(1))[0]
+
+    async def take(self, count: int) -> List[int]:
+        values: List[int] = []
+        while len(values) < count:
+            if self._next >= self._end:
+                if not self._blocks:
+                    # Coroutines that run out at the same time each reserve
+                    # their own block; nothing is handed out across an await.
+                    self._blocks.append(
+                        await self._reserve(max(self.block_size, count - len(values)))
+                    )
+                    continue
+                self._next, self._end = self._blocks.popleft()
+
+            taken = min(count - len(values), self._end - self._next)
+            values.extend(range(self._next, self._next + taken))
+            self._next += taken
+
+        return values
+
+    def stats(self) -> dict:
+        return {
+            "reservations": self.reservations,
+            "available": self._end - self._next + sum(end - start for start, end in self._blocks),
+        }
+
+    async def _reserve(self, size: int) -> tuple:
+        if not self._created:
+            await self._create()
+
+        sequence = await update_returning(
+            CodeSequence.filter(name=self.name), next_value=F("next_value") + size
+        )
+
+        self.reservations += 1
+        return sequence.next_value - size, sequence.next_value
+
+    async def _create(self) -> None:
+        if not await CodeSequence.filter(name=self.name).exists():
+            # Continue numbering after rows created before the sequence existed.
+            first = await self._seed() + 1 if self._seed else 1
+            # Workers creating it at the same time insert the same row, and
+            # the first one is kept; nothing here can abort a transaction.
+            await insert_or_ignore(CodeSequence, name=self.name, next_value=first)
+
+        self._created = True
@@ -0,0 +1,105 @@
+import datetime
+from functools import lru_cache
+
+from app.api.crud.queries import insert_or_ignore
+from app.config.app import settings
+from app.metrics import register_metrics_hook
+from app.models.idempotency_key import IdempotencyKey
+from app.services.TTLCache import TTLCache
+
+
+class IdempotencyStore:
+    """Remembers the response to each idempotency key, in this process's memory.
+
+    `begin` claims a key for a request. It returns None when the caller
+    should run the request, and otherwise the key's record: the request
+    fingerprint and, once the first request has finished, its response as
+    `(status, headers, body)`. Keys are kept for `ttl` seconds, and the
+    least recently used are dropped beyond `maxsize`.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 86400):
+        self.replays = 0
+        self._records = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def begin(self, key: str, fingerprint: str) -> dict | None:
+        record = self._records.get(key)
+        if record is None:
+            self._records.set(key, {"fingerprint": fingerprint, "response": None})
+            return None
+
+        if record["response"] is not None:
+            self.replays += 1
+        return record
+
+    async def finish(self, key: str, fingerprint: str, response: tuple) -> None:
+        self._records.set(key, {"fingerprint": fingerprint, "response": response})
+
+    async def discard(self, key: str) -> None:
+        self._records.pop(key)
+
+    def stats(self) -> dict:
+        return {**self._records.stats(), "replays": self.replays}
+
+
+class DatabaseIdempotencyStore:
+    """Remembers the response to each idempotency key in `idempotency_key`.
+
+    Every worker sees the same keys, and they survive a restart. A key is
+    claimed with a single INSERT ... ON CONFLICT DO NOTHING, so only one of
+    two concurrent requests runs. Expired rows are deleted as keys are
+    claimed, which keeps the table bounded by `ttl`.
+    """
+
+    def __init__(self, ttl: float = 86400):
+        self.ttl = ttl
+        self.replays = 0
+
+    async def begin(self, key: str, fingerprint: str) -> dict | None:
+        now = datetime.datetime.now()
+        await IdempotencyKey.filter(expires_at__lte=now).delete()
+
+        if await insert_or_ignore(
+            IdempotencyKey,
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=now + datetime.timedelta(seconds=self.ttl),
+        ):
+            return None
+
+        row = await IdempotencyKey.get_or_none(key=key)
+        if row is None:
+            # Discarded by the request that held it since the INSERT.
+            return await self.begin(key, fingerprint)
+
+        if row.status_code is None:
+            return {"fingerprint": row.fingerprint, "response": None}
+
+        self.replays += 1
+        return {
+            "fingerprint": row.fingerprint,
+            "response": (row.status_code, row.headers, row.body),
+        }
+
+    async def finish(self, key: str, fingerprint: str, response: tuple) -> None:
+        status_code, headers, body = response
+        await IdempotencyKey.filter(key=key).update(
+            status_code=status_code, headers=headers, body=body
+        )
+
+    async def discard(self, key: str) -> None:
+        await IdempotencyKey.filter(key=key).delete()
+
+    def stats(self) -> dict:
+        return {"replays": self.replays}
+
+
+@lru_cache()
+def get_idempotency_store() -> IdempotencyStore | DatabaseIdempotencyStore:
+    if settings.idempotency_store == "database":
+        store = DatabaseIdempotencyStore(settings.idempotency_ttl)
+    else:
+        store = IdempotencyStore(settings.idempotency_cache_size, settings.idempotency_ttl)
+
+    register_metrics_hook("idempotency", store.stats)
+    return store
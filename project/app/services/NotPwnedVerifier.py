@@ -1,22 +1,263 @@
-import hashlib, requests # pragma: no cover
+import argparse
+import asyncio
+import hashlib
+import logging
+import mmap
+import struct
+from functools import lru_cache
+from typing import Dict
 
+import httpx
 
-class NotPwnedVerifier: # pragma: no cover
-    def verify(self, data: str, threshold: int = 0):
+from app.config.app import settings
+from app.metrics import register_metrics_hook
+from app.services.TTLCache import TTLCache
 
-        sha1_hash = hashlib.sha1(data.encode())
-        hash_prefix = sha1_hash[:5]
+log = logging.getLogger("uvicorn")
 
-        self.search(hash_prefix)
+# Each index record is a raw SHA-1 digest followed by a big-endian breach
+# count. Records are sorted by digest so lookups can binary search the file.
+RECORD = struct.Struct(">20sI")
+
+
+class NotPwnedVerifier:
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._file = open(index_path, "rb")
+        self._map = None
+        self._records = 0
+
+        size = self._file.seek(0, 2)
+        if size % RECORD.size:
+            self._file.close()
+            raise ValueError("{0} is not a pwned passwords index".format(index_path))
+
+        if size:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._records = size // RECORD.size
+
+    def __len__(self) -> int:
+        return self._records
+
+    def verify(self, data: str, threshold: int = 0) -> bool:
+        """True when `data` appears in at most `threshold` known breaches."""
+        if len(data) == 0:
+            return False
+
+        return self.count(data) <= threshold
+
+    def count(self, data: str) -> int:
+        return self.search(hashlib.sha1(data.encode()).digest())
+
+    def search(self, digest: bytes) -> int:
+        low, high = 0, self._records
+        while low < high:
+            middle = (low + high) // 2
+            offset = middle * RECORD.size
+            candidate = self._map[offset:offset + 20]
+
+            if candidate < digest:
+                low = middle + 1
+            elif candidate > digest:
+                high = middle
+            else:
+                return RECORD.unpack_from(self._map, offset)[1]
+
+        return 0
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+
+class PwnedRangeClient:
+    """Async k-anonymity client for the Pwned Passwords range API.
+
+    Only the first five hex characters of the SHA-1 leave the process.
+    Range responses are cached, and concurrent lookups that share a prefix
+    wait on a single in-flight request. If the API cannot be reached in
+    time the lookup reports None and callers treat the password as unknown.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        timeout: float = 2,
+        max_connections: int = 10,
+        cache_size: int = 256,
+        cache_ttl: float = 3600,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.requests = 0
+        self.coalesced = 0
+        self.failures = 0
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._client: httpx.AsyncClient | None = None
+        self._loop = None
+
+    async def verify(self, data: str, threshold: int = 0) -> bool:
         if len(data) == 0:
             return False
 
-    def search(self, hash_prefix: str):
+        count = await self.count(data)
+        return count is None or count <= threshold
+
+    async def count(self, data: str) -> int | None:
+        sha1 = hashlib.sha1(data.encode()).hexdigest().upper()
+        hashes = await self.search(sha1[:5])
+
+        if hashes is None:
+            return None
+
+        start = hashes.find("\n" + sha1[5:] + ":")
+        if start == -1:
+            return 0
+
+        start += len(sha1) - 5 + 2
+        return int(hashes[start:hashes.find("\n", start)])
+
+    async def search(self, hash_prefix: str) -> str | None:
+        hashes = self._cache.get(hash_prefix)
+        if hashes is not None:
+            return hashes
+
+        task = self._inflight.get(hash_prefix)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(hash_prefix))
+            self._inflight[hash_prefix] = task
+            task.add_done_callback(lambda _: self._inflight.pop(hash_prefix, None))
+        else:
+            self.coalesced += 1
+
+        return await asyncio.shield(task)
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            **self._cache.stats(),
+            "requests": self.requests,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+        }
+
+    async def _fetch(self, hash_prefix: str) -> str | None:
+        self.requests += 1
         try:
-            response = requests.get(
-                "https://api.pwnedpasswords.com/range/{0}".format(hash_prefix)
+            response = await self._get_client().get(
+                "{0}/{1}".format(self.base_url, hash_prefix),
+                headers={"Add-Padding": "true"},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            self.failures += 1
+            log.warning("Pwned passwords lookup failed: %r", e)
+            return None
+
+        # Normalise line endings and wrap in newlines so a suffix can be
+        # found with a single substring search.
+        hashes = "\n" + response.text.replace("\r\n", "\n").strip() + "\n"
+        self._cache.set(hash_prefix, hashes)
+        return hashes
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # Pooled connections belong to the event loop that opened them.
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
             )
-        except requests.exceptions.RequestException as e:  # This is the correct syntax
-            raise SystemExit(e)
-        # chech if request was successful
-        # explode using `:`
+            self._loop = loop
+
+        return self._client
+
+
+def build_index(dump_path: str, index_path: str) -> int:
+    """Convert a `SHA1:COUNT` text dump ordered by hash into a binary index.
+
+    The dump is streamed line by line, so memory use does not depend on its
+    size. Returns the number of records written.
+    """
+    records = 0
+    previous = b""
+
+    with open(dump_path, "r") as dump, open(index_path, "wb") as index:
+        for number, line in enumerate(dump, start=1):
+            line = line.strip()
+            if not line:
+                continue
+
+            sha1, _, count = line.partition(":")
+            digest = bytes.fromhex(sha1)
+            if len(digest) != 20 or not count:
+                raise ValueError("Malformed line {0}: {1!r}".format(number, line))
+            if digest <= previous:
+                raise ValueError(
+                    "Line {0} is out of order, use the dump ordered by hash".format(number)
+                )
+
+            index.write(RECORD.pack(digest, int(count)))
+            previous = digest
+            records += 1
+
+    return records
+
+
+@lru_cache()
+def load_verifier(index_path: str) -> NotPwnedVerifier:
+    return NotPwnedVerifier(index_path)
+
+
+@lru_cache()
+def load_range_client(base_url: str) -> PwnedRangeClient:
+    client = PwnedRangeClient(
+        base_url,
+        timeout=settings.pwned_passwords_api_timeout,
+        cache_size=settings.pwned_passwords_cache_size,
+        cache_ttl=settings.pwned_passwords_cache_ttl,
+    )
+    register_metrics_hook("pwned_passwords", client.stats)
+
+    return client
+
+
+def get_pwned_verifier() -> NotPwnedVerifier | PwnedRangeClient | None:
+    if settings.pwned_passwords_index:
+        return load_verifier(settings.pwned_passwords_index)
+    if settings.pwned_passwords_api_url:
+        return load_range_client(settings.pwned_passwords_api_url)
+
+    return None
+
+
+async def count_breaches(password: str) -> int | None:
+    verifier = get_pwned_verifier()
+
+    if isinstance(verifier, PwnedRangeClient):
+        return await verifier.count(password)
+    if verifier is not None:
+        return verifier.count(password)
+
+    return None
+
+
+if __name__ == "__main__":  # pragma: no cover
+    parser = argparse.ArgumentParser(
+        description="Build a binary pwned passwords index from the SHA-1 text dump."
+    )
+    parser.add_argument("dump", help="pwned-passwords-sha1-ordered-by-hash text file")
+    parser.add_argument("index", help="path of the binary index to write")
+    args = parser.parse_args()
+
+    print("Wrote {0} records".format(build_index(args.dump, args.index)))
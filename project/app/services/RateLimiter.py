@@ -0,0 +1,85 @@
+import time
+from collections import OrderedDict
+from typing import Hashable
+
+
+class RateLimiter:
+    """Per-key token buckets with a bounded number of keys.
+
+    Each key may burst up to `capacity` attempts and regains `rate` attempts
+    per second. Buckets are refilled lazily, so `allow` is O(1). A bucket
+    that has refilled completely is indistinguishable from a missing one,
+    so compaction simply drops those; when the key limit is reached the
+    least recently seen key is evicted first.
+    """
+
+    def __init__(
+        self,
+        capacity: float,
+        rate: float,
+        max_keys: int = 10000,
+        compact_interval: float = 60,
+    ):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self.compact_interval = compact_interval
+        self.allowed = 0
+        self.rejected = 0
+        self.compactions = 0
+        self._buckets: OrderedDict = OrderedDict()
+        self._compacted_at = time.monotonic()
+
+    def allow(self, key: Hashable) -> bool:
+        now = time.monotonic()
+        if now - self._compacted_at >= self.compact_interval:
+            self.compact(now)
+
+        tokens = self._tokens(key, now)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            self.rejected += 1
+            return False
+
+        self._buckets[key] = (tokens - 1, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+
+        self.allowed += 1
+        return True
+
+    def retry_after(self, key: Hashable) -> int:
+        tokens = self._tokens(key, time.monotonic())
+        if tokens >= 1 or self.rate <= 0:
+            return 0
+
+        return int((1 - tokens) / self.rate) + 1
+
+    def reset(self, key: Hashable) -> None:
+        self._buckets.pop(key, None)
+
+    def compact(self, now: float | None = None) -> None:
+        now = time.monotonic() if now is None else now
+        for key in [key for key in self._buckets if self._tokens(key, now) >= self.capacity]:
+            del self._buckets[key]
+
+        self._compacted_at = now
+        self.compactions += 1
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "compactions": self.compactions,
+        }
+
+    def _tokens(self, key: Hashable, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+
+        tokens, updated_at = bucket
+        return min(self.capacity, tokens + (now - updated_at) * self.rate)
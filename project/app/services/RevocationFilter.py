@@ -0,0 +1,91 @@
+import hashlib
+import math
+import time
+from typing import Dict
+
+
+class RevocationFilter:
+    """Revoked token ids behind a Bloom filter.
+
+    Most lookups are for tokens that were never revoked, and the filter
+    answers those from a fixed-size bit array without touching the exact
+    set. A positive answer is confirmed against the exact `jti -> exp`
+    map, so false positives never reject a valid token. Entries are only
+    kept until the token they revoke would have expired anyway.
+
+    Expired entries are dropped once `capacity` is reached. When most
+    entries are still live the set is allowed to grow, and the next
+    compaction waits until it has doubled, so each revocation costs O(1)
+    on average however many are outstanding.
+
+    The filter only knows this process's revocations; RevocationList keeps
+    it in step with the ones other workers record in the database.
+    """
+
+    def __init__(self, capacity: int = 100_000, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.checks = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+        self.compactions = 0
+        self._bits = bytearray((self.size + 7) // 8)
+        self._revoked: Dict[str, float] = {}
+        self._compact_at = capacity
+
+    def revoke(self, jti: str, expires_at: float) -> None:
+        if len(self._revoked) >= self._compact_at:
+            self.compact()
+            self._compact_at = max(self.capacity, 2 * len(self._revoked))
+
+        self._revoked[jti] = expires_at
+        for position in self._positions(jti):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def is_revoked(self, jti: str | None) -> bool:
+        if jti is None:
+            return False
+
+        self.checks += 1
+        for position in self._positions(jti):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+
+        self.filter_hits += 1
+        if jti in self._revoked:
+            return True
+
+        self.false_positives += 1
+        return False
+
+    def compact(self) -> None:
+        """Drop revocations of expired tokens and rebuild the bit array."""
+        now = time.time()
+        self._revoked = {
+            jti: expires_at
+            for jti, expires_at in self._revoked.items()
+            if expires_at > now
+        }
+        self._bits = bytearray(len(self._bits))
+        for jti in self._revoked:
+            for position in self._positions(jti):
+                self._bits[position >> 3] |= 1 << (position & 7)
+        self.compactions += 1
+
+    def stats(self) -> dict:
+        return {
+            "revoked": len(self._revoked),
+            "checks": self.checks,
+            "filter_hits": self.filter_hits,
+            "false_positives": self.false_positives,
+            "compactions": self.compactions,
+        }
+
+    def _positions(self, jti: str):
+        digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+
+        return ((first + i * second) % self.size for i in range(self.hashes))
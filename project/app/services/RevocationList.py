@@ -0,0 +1,73 @@
+import datetime
+import time
+
+from app.api.crud.queries import insert_or_ignore
+from app.models.revoked_token import RevokedToken
+from app.services.RevocationFilter import RevocationFilter
+
+
+class RevocationList:
+    """Revoked token ids shared by every worker through `revoked_token`.
+
+    `revoke` records the id with a single INSERT ... ON CONFLICT DO NOTHING
+    and reports whether this call was the one that revoked it, so a refresh
+    token can only be spent once however many workers see it. Lookups are
+    answered by the local Bloom filter, which is refreshed from rows revoked
+    since the last refresh at most every `staleness` seconds.
+    """
+
+    def __init__(self, revocations: RevocationFilter, staleness: float = 5):
+        self.revocations = revocations
+        self.staleness = staleness
+        self.refreshes = 0
+        self._watermark: datetime.datetime | None = None
+        self._refreshed_at: float | None = None
+
+    async def revoke(self, jti: str, expires_at: float) -> bool:
+        self.revocations.revoke(jti, expires_at)
+
+        return await insert_or_ignore(
+            RevokedToken,
+            jti=jti,
+            expires_at=datetime.datetime.fromtimestamp(
+                expires_at, datetime.timezone.utc
+            ),
+        )
+
+    async def is_revoked(self, jti: str | None) -> bool:
+        await self.refresh()
+
+        return self.revocations.is_revoked(jti)
+
+    async def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if (
+            not force
+            and self._refreshed_at is not None
+            and now - self._refreshed_at < self.staleness
+        ):
+            return
+
+        self._refreshed_at = now
+        self.refreshes += 1
+
+        expired = datetime.datetime.now(datetime.timezone.utc)
+        await RevokedToken.filter(expires_at__lte=expired).delete()
+
+        query = RevokedToken.filter(expires_at__gt=expired)
+        if self._watermark is not None:
+            # Re-read a small overlap so rows written with a slightly older
+            # clock on another worker are not skipped.
+            query = query.filter(
+                revoked_at__gte=self._watermark - datetime.timedelta(seconds=1)
+            )
+
+        for jti, expires_at, revoked_at in await query.values_list(
+            "jti", "expires_at", "revoked_at"
+        ):
+            self.revocations.revoke(jti, expires_at.timestamp())
+            if self._watermark is None or revoked_at > self._watermark:
+                self._watermark = revoked_at
+
+    def stats(self) -> dict:
+        return {**self.revocations.stats(), "refreshes": self.refreshes}
@@ -0,0 +1,202 @@
+import bisect
+import heapq
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Dict, Hashable, List, Set
+
+WORD = re.compile(r"[a-z0-9]+")
+
+
+class SearchIndex:
+    """In-memory trigram index over short names, for typeahead.
+
+    Every word is padded at the front so the first letters of a word form
+    their own trigrams, which makes a partial word match as a prefix. The
+    last word of a query is not padded at the end because the user may
+    still be typing it. Candidates are ranked by the share of the query's
+    trigrams they contain, then by how closely the name's length matches,
+    with a bonus when every query word starts a word of the name.
+
+    Names that get the prefix bonus are looked up in a sorted list of
+    words. The trigram postings are only searched when no name starts
+    with what was typed, which is what makes a typo still find a match.
+    """
+
+    def __init__(self, min_score: float = 0.5):
+        self.min_score = min_score
+        self.searches = 0
+        self._documents: Dict[Hashable, tuple] = {}
+        self._postings: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._words: List[str] = []
+        self._ranked: Dict[str, list] = {}
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._documents
+
+    def add(self, key: Hashable, name: str, document: dict) -> None:
+        self.remove(key)
+
+        words = normalize(name)
+        trigrams = set()
+        for word in words:
+            trigrams.update(_trigrams("  " + word + " "))
+
+        self._documents[key] = (words, trigrams, document)
+        for trigram in trigrams:
+            self._postings[trigram].add(key)
+
+        # A name matched by a single prefix ranks by its length alone, so
+        # each word keeps its names in that order.
+        rank = (len(trigrams), document["name"], key)
+        for word in set(words):
+            if word not in self._ranked:
+                bisect.insort(self._words, word)
+                self._ranked[word] = []
+            bisect.insort(self._ranked[word], rank)
+
+    def remove(self, key: Hashable) -> None:
+        entry = self._documents.pop(key, None)
+        if entry is None:
+            return
+
+        words, trigrams, document = entry
+        for trigram in trigrams:
+            postings = self._postings[trigram]
+            postings.discard(key)
+            if not postings:
+                del self._postings[trigram]
+
+        rank = (len(trigrams), document["name"], key)
+        for word in set(words):
+            ranked = self._ranked[word]
+            del ranked[bisect.bisect_left(ranked, rank)]
+            if not ranked:
+                del self._ranked[word]
+                del self._words[bisect.bisect_left(self._words, word)]
+
+    def search(self, query: str, limit: int = 10, kind: str | None = None) -> List[dict]:
+        self.searches += 1
+        words = normalize(query)
+        if not words:
+            return []
+
+        trigrams = set()
+        for word in words[:-1]:
+            trigrams.update(_trigrams("  " + word + " "))
+        trigrams.update(_trigrams("  " + words[-1]))
+        need = max(1, math.ceil(self.min_score * len(trigrams)))
+
+        results = self._prefix_matches(words, trigrams, need, limit, kind)
+        if not results:
+            results = self._fuzzy_matches(trigrams, need, kind)
+
+        return [
+            {**document, "score": round(-score, 4)}
+            for score, _, document in heapq.nsmallest(
+                limit, results, key=lambda result: result[:2]
+            )
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self._documents),
+            "trigrams": len(self._postings),
+            "words": len(self._words),
+            "searches": self.searches,
+        }
+
+    def _prefix_matches(
+        self, words: List[str], trigrams: Set[str], need: int, limit: int, kind: str | None
+    ) -> list:
+        # Words are [a-z0-9], so every word starting with `word` sorts
+        # before `word` followed by "{".
+        ranges = [
+            (bisect.bisect_left(self._words, word), bisect.bisect_left(self._words, word + "{"))
+            for word in words
+        ]
+        start, end = min(ranges, key=lambda bounds: bounds[1] - bounds[0])
+        ranked = [self._ranked[word] for word in self._words[start:end]]
+
+        results = []
+        if len(words) == 1:
+            # Every name here contains all the query's trigrams, so the
+            # merged lists are already in score order.
+            seen = set()
+            for _, _, key in heapq.merge(*ranked):
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                result = self._score(key, trigrams, need, kind, bonus=1)
+                if result is not None:
+                    results.append(result)
+                    if len(results) == limit:
+                        break
+
+            return results
+
+        for key in {key for names in ranked for _, _, key in names}:
+            if self._starts_words(key, words):
+                result = self._score(key, trigrams, need, kind, bonus=1)
+                if result is not None:
+                    results.append(result)
+
+        return results
+
+    def _fuzzy_matches(self, trigrams: Set[str], need: int, kind: str | None) -> list:
+        # A name reaching min_score misses at most len(trigrams) - need of
+        # the query's trigrams, so it is in at least `overlap` of the rarest
+        # postings read here. Only those names are scored.
+        overlap = min(3, need)
+        postings = sorted(
+            (self._postings.get(trigram, ()) for trigram in trigrams), key=len
+        )
+        shared: Counter = Counter()
+        for keys in postings[: len(trigrams) - need + overlap]:
+            shared.update(keys)
+
+        results = []
+        for key, count in shared.items():
+            if count >= overlap:
+                result = self._score(key, trigrams, need, kind)
+                if result is not None:
+                    results.append(result)
+
+        return results
+
+    def _score(
+        self, key: Hashable, trigrams: Set[str], need: int, kind: str | None, bonus: float = 0
+    ) -> tuple | None:
+        _, name_trigrams, document = self._documents[key]
+        if kind is not None and document["type"] != kind:
+            return None
+
+        count = len(trigrams & name_trigrams)
+        if count < need:
+            return None
+
+        score = count / len(trigrams) + bonus
+        score += count / (len(trigrams) + len(name_trigrams) - count) / 10
+
+        return -score, document["name"], document
+
+    def _starts_words(self, key: Hashable, words: List[str]) -> bool:
+        names = self._documents[key][0]
+
+        return all(any(name.startswith(word) for name in names) for word in words)
+
+
+def normalize(text: str | None) -> List[str]:
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+
+    return WORD.findall(stripped.lower())
+
+
+def _trigrams(padded: str) -> Set[str]:
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
@@ -0,0 +1,76 @@
+import datetime
+import time
+from typing import Dict
+
+from app.models.user import User
+
+
+class TokenVersionTable:
+    """In-memory copy of each user's token version.
+
+    The table is refreshed incrementally from rows whose `updated_at` moved
+    since the last refresh, so a version bump made by another worker is
+    honoured within `staleness` seconds. A version of None means the user
+    was deleted and every token they hold is revoked.
+    """
+
+    def __init__(self, staleness: float = 5):
+        self.staleness = staleness
+        self.refreshes = 0
+        self._versions: Dict[int, int | None] = {}
+        self._watermark: datetime.datetime | None = None
+        self._refreshed_at: float | None = None
+
+    async def is_current(self, user_id: int, version: int) -> bool:
+        await self.refresh()
+
+        if user_id not in self._versions:
+            await self._load([user_id])
+
+        return self._versions.get(user_id) == version
+
+    async def refresh(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if (
+            not force
+            and self._refreshed_at is not None
+            and now - self._refreshed_at < self.staleness
+        ):
+            return
+
+        self._refreshed_at = now
+        self.refreshes += 1
+
+        query = User.all()
+        if self._watermark is not None:
+            # Re-read a small overlap so rows written with a slightly older
+            # clock on another worker are not skipped.
+            query = query.filter(
+                updated_at__gte=self._watermark - datetime.timedelta(seconds=1)
+            )
+
+        for row in await query.values("id", "token_version", "deleted_at", "updated_at"):
+            self._store(row)
+
+    def invalidate(self, user_id: int) -> None:
+        self._versions.pop(user_id, None)
+
+    def stats(self) -> dict:
+        return {"size": len(self._versions), "refreshes": self.refreshes}
+
+    async def _load(self, user_ids: list) -> None:
+        for user_id in user_ids:
+            self._versions[user_id] = None
+
+        rows = await User.filter(id__in=user_ids).values(
+            "id", "token_version", "deleted_at", "updated_at"
+        )
+        for row in rows:
+            self._store(row)
+
+    def _store(self, row: dict) -> None:
+        self._versions[row["id"]] = (
+            None if row["deleted_at"] is not None else row["token_version"]
+        )
+        if self._watermark is None or row["updated_at"] > self._watermark:
+            self._watermark = row["updated_at"]
@@ -0,0 +1,60 @@
+import re
+
+from tortoise import fields
+
+from app.config.app import settings
+
+# Phones are matched on their last nine digits, the national number
+# without the trunk prefix, which is what lookups have always compared.
+SUFFIX_DIGITS = 9
+NON_DIGITS = re.compile(r"\D")
+
+
+class Phone:
+    """Normalized keys for `phone`, kept in step on every save.
+
+    `phone_e164` is the number in E.164 form, assuming the default country
+    when it is written nationally, indexed for exact matches on a full
+    international number. `phone_suffix` holds its last nine
+    digits, so "024 400 0001", "+233 24 400 0001" and "00233244000001"
+    share one indexed key.
+    """
+
+    phone_e164 = fields.CharField(16, null=True, index=True)
+    phone_suffix = fields.CharField(SUFFIX_DIGITS, null=True, index=True)
+
+    async def save(self, *args, update_fields=None, **kwargs) -> None:
+        self.phone_e164 = phone_e164(self.phone)
+        self.phone_suffix = phone_suffix(self.phone)
+        if update_fields is not None and "phone" in update_fields:
+            update_fields = [*update_fields, "phone_e164", "phone_suffix"]
+
+        await super().save(*args, update_fields=update_fields, **kwargs)
+
+
+def phone_keys(phone: str | None) -> dict:
+    """Column values to write alongside `phone` in a queryset update."""
+    return {"phone_e164": phone_e164(phone), "phone_suffix": phone_suffix(phone)}
+
+
+def phone_suffix(phone: str | None) -> str | None:
+    return NON_DIGITS.sub("", phone or "")[-SUFFIX_DIGITS:] or None
+
+
+def phone_e164(phone: str | None, country_code: str | None = None) -> str | None:
+    phone = (phone or "").strip()
+    digits = NON_DIGITS.sub("", phone)
+
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0") or len(digits) <= SUFFIX_DIGITS:
+        digits = (country_code or settings.phone_country_code) + digits.removeprefix("0")
+
+    # E.164 allows at most fifteen digits; anything else is not a number
+    # we can normalize, such as one with an extension.
+    if not 7 <= len(digits) <= 15:
+        return None
+
+    return "+" + digits
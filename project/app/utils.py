@@ -1,19 +1,67 @@
+import asyncio
+import csv
 import io
-from datetime import datetime, timedelta
+import json
+import math
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import IO, AsyncIterator, Iterator, List, Tuple, Type
 
 from fastapi import BackgroundTasks, Depends
 from fastapi.security import OAuth2PasswordBearer
 from fastapi_mail import FastMail, MessageSchema
+from starlette.responses import Response, StreamingResponse
 from passlib.context import CryptContext
+from pydantic import BaseModel
+from passlib.hash import bcrypt
 from jose import jwt
 import qrcode
 
-from app.config.app import Settings, get_settings
+from app.config.app import Settings, get_settings, settings
+from app.metrics import register_metrics_hook
+from app.services.RevocationFilter import RevocationFilter
+from app.services.RevocationList import RevocationList
+from app.services.TokenVersionTable import TokenVersionTable
+from app.services.TTLCache import TTLCache
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password_hash_workers, thread_name_prefix="password"
+)
+
+principal_cache = TTLCache(
+    maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl
+)
+register_metrics_hook("principal_cache", principal_cache.stats)
+
+# Emails that recently matched no user, so repeated logins for them skip
+# the user lookup.
+unknown_emails = TTLCache(
+    maxsize=settings.unknown_email_cache_size, ttl=settings.unknown_email_cache_ttl
+)
+
+token_versions = TokenVersionTable(staleness=settings.token_version_staleness)
+register_metrics_hook("token_versions", token_versions.stats)
+
+revoked_tokens = RevocationList(
+    RevocationFilter(
+        capacity=settings.revocation_filter_capacity,
+        error_rate=settings.revocation_filter_error_rate,
+    ),
+    staleness=settings.revocation_staleness,
+)
+register_metrics_hook("revoked_tokens", revoked_tokens.stats)
+
+
+def forget_principal(user_id: int) -> int:
+    token_versions.invalidate(user_id)
+    return principal_cache.evict(lambda token, user: user.id == user_id)
+
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -23,6 +71,52 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+def password_needs_rehash(hashed_password) -> bool:
+    return pwd_context.needs_update(hashed_password)
+
+
+def calibrate_password_hashing(
+    target_ms: float,
+    min_rounds: int = 10,
+    max_rounds: int = 16,
+    context: CryptContext | None = None,
+) -> int:
+    """Pick the bcrypt cost whose hash time is closest to `target_ms` on this host.
+
+    Each extra round doubles the cost, so one timed hash at a cheap cost is
+    enough to extrapolate. Hashes outside [rounds, rounds + 1] are then
+    reported by `password_needs_rehash`.
+    """
+    context = pwd_context if context is None else context
+    sample_rounds = max(4, min_rounds - 4)
+
+    started = time.perf_counter()
+    bcrypt.using(rounds=sample_rounds).hash("calibration")
+    elapsed_ms = max((time.perf_counter() - started) * 1000, 0.001)
+
+    rounds = sample_rounds + round(math.log2(target_ms / elapsed_ms))
+    rounds = min(max_rounds, max(min_rounds, rounds))
+    context.update(
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds + 1,
+    )
+
+    return rounds
+
+
+async def verify_password_async(plain_password, hashed_password):
+    return await asyncio.wrap_future(
+        password_executor.submit(verify_password, plain_password, hashed_password)
+    )
+
+
+async def get_password_hash_async(password):
+    return await asyncio.wrap_future(
+        password_executor.submit(get_password_hash, password)
+    )
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     settings = get_settings()
     to_encode = data.copy()
@@ -37,6 +131,38 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
     return encoded_jwt
 
 
+def create_user_access_token(
+    user, expires_delta: timedelta | None = None, scopes: list = ["*"]
+):
+    return create_access_token(
+        {
+            "sub": user.email,
+            "uid": user.id,
+            "name": user.name,
+            "ver": user.token_version,
+            "scopes": scopes,
+            "jti": uuid.uuid4().hex,
+        },
+        expires_delta,
+    )
+
+
+def create_refresh_token(user, expires_delta: timedelta | None = None):
+    if expires_delta is None:
+        expires_delta = timedelta(days=settings.refresh_token_expire_days)
+
+    return create_access_token(
+        {
+            "sub": user.email,
+            "uid": user.id,
+            "ver": user.token_version,
+            "typ": "refresh",
+            "jti": uuid.uuid4().hex,
+        },
+        expires_delta,
+    )
+
+
 def send_email(
     background_tasks: BackgroundTasks,
     subject: str,
@@ -79,6 +205,31 @@ def send_multiple_emails(
         )
 
 
+def send_grouped_emails(
+    background_tasks: BackgroundTasks,
+    messages: List[Tuple[str, list, dict, str]],
+    settings: Settings = Depends(get_settings),
+) -> None:
+    """Send `(subject, recipients, body, template_name)` messages from one background task.
+
+    Each recipient still gets their own email, sent one after another.
+    """
+    fm = FastMail(settings.email_configuration)
+
+    async def dispatch():
+        for subject, recipients, body, template_name in messages:
+            for recipient in recipients:
+                message = MessageSchema(
+                    subject=subject,
+                    recipients=[recipient["email"]],
+                    template_body={**body, "guardian_name": recipient["name"]},
+                    subtype="html",
+                )
+                await fm.send_message(message, template_name=template_name)
+
+    background_tasks.add_task(dispatch)
+
+
 def generate_qrcode(data):
     code_image = qrcode.make(data)
     response_buffer = io.BytesIO()
@@ -86,3 +237,142 @@ def generate_qrcode(data):
     response_buffer.seek(0)
 
     return response_buffer
+
+
+def read_records(file: IO[bytes], format: str) -> Iterator[Tuple[int, dict | None, str | None]]:
+    """Yield `(row, record, error)` for each row of an uploaded CSV or NDJSON file.
+
+    Rows are read from the file one at a time, so memory use does not grow
+    with the size of the upload. A line that is not UTF-8 is reported
+    against the row it starts, and nothing after it is read.
+    """
+    lines = _decoded_lines(file)
+    row = 0
+    try:
+        if format == "csv":
+            reader = csv.DictReader(lines)
+            for row, record in enumerate(reader, start=1):
+                if None in record:
+                    yield row, None, "Expected {0} columns, found {1}".format(
+                        len(reader.fieldnames), len(reader.fieldnames) + len(record[None])
+                    )
+                else:
+                    yield row, {key: value or None for key, value in record.items()}, None
+            return
+
+        for line in lines:
+            if not line.strip():
+                continue
+
+            row += 1
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row, None, "Invalid JSON: {0}".format(e)
+                continue
+
+            if isinstance(record, dict):
+                yield row, record, None
+            else:
+                yield row, None, "Expected a JSON object"
+    except UnicodeDecodeError:
+        yield row + 1, None, "The file is not UTF-8 text from this row on"
+
+
+def _decoded_lines(file: IO[bytes]) -> Iterator[str]:
+    # Decoded a line at a time, so rows before a bad byte are still read.
+    # A newline byte never occurs inside a multi-byte UTF-8 character.
+    encoding = "utf-8-sig"
+    for line in file:
+        yield line.decode(encoding)
+        encoding = "utf-8"
+
+
+def fast_json_response(content, response: Response) -> Response:
+    """Serialize plain rows directly, without building models or validating them."""
+    return Response(
+        json.dumps(content, default=_encode_value),
+        media_type="application/json",
+        headers={
+            key: value
+            for key, value in response.headers.items()
+            if key != "content-length"
+        },
+    )
+
+
+def encode_fields(rows: List[dict], schema: Type[BaseModel]) -> List[dict]:
+    """Convert projected values the way `schema` does on the full response.
+
+    Strings, numbers and None are left alone; anything else, such as a
+    datetime read from a date field, goes through the field's validator.
+    """
+    fields = schema.__fields__
+    for row in rows:
+        for key, value in row.items():
+            if value is not None and not isinstance(value, (str, int, float)):
+                converted, error = fields[key].validate(value, row, loc=key)
+                if error is None:
+                    row[key] = converted
+
+    return rows
+
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def export_response(
+    name: str,
+    chunks: AsyncIterator[List[dict]],
+    fields: List[str],
+    format: str,
+    schema: Type[BaseModel],
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_records(chunks, fields, format, schema),
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": 'attachment; filename="{0}.{1}"'.format(name, format)
+        },
+    )
+
+
+async def stream_records(
+    chunks: AsyncIterator[List[dict]], fields: List[str], format: str, schema: Type[BaseModel]
+) -> AsyncIterator[bytes]:
+    """Encode chunks of rows as CSV with a header row, or as NDJSON.
+
+    Values are converted as `schema` converts them in the API's responses.
+    """
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+
+        async for rows in chunks:
+            writer.writerows(map(_export_row, encode_fields(rows, schema)))
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+        yield buffer.getvalue().encode()
+        return
+
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(_export_row(row)) + "\n" for row in encode_fields(rows, schema)
+        ).encode()
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+
+    raise TypeError("{0!r} is not JSON serializable".format(value))
+
+
+def _export_row(row: dict) -> dict:
+    return {
+        key: value.isoformat() if isinstance(value, (date, datetime)) else value
+        for key, value in row.items()
+    }
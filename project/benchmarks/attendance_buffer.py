@@ -0,0 +1,103 @@
+"""Morning check-in rush: a commit per scan versus write-behind flushes.
+
+Run from the project directory:
+
+    python -m benchmarks.attendance_buffer [--students 2000] [--concurrency 50]
+                                           [--size 500] [--interval-ms 200]
+                                           [--output attendance_buffer.json]
+
+Each case checks in every seeded student once, `concurrency` scans at a
+time, and then scans them all again to time the duplicate path. The
+buffered case is timed until its last event has been written, and each
+case starts on a fresh day.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from app.api.crud import student_crud
+from app.models.student import Student
+from app.models.student_attendance import StudentAttendance
+from app.services.AttendanceBuffer import AttendanceBuffer
+from benchmarks.harness import close_database, count_statements, open_database, report, summarize, without_transactions
+
+
+async def seed(students: int) -> list:
+    await Student.bulk_create(
+        [
+            Student(student_code="LS{0:08d}-1".format(id), first_name="Kofi", last_name=str(id))
+            for id in range(students)
+        ]
+    )
+
+    return await Student.all().values_list("id", flat=True)
+
+
+async def timed(name: str, buffer, ids: list, date: str, concurrency: int, expected: bool) -> dict:
+    student_crud.attendance_buffer = buffer
+    samples = []
+
+    async def scan(id):
+        began = time.perf_counter()
+        assert await student_crud.check_in(id, date) is expected
+        samples.append(time.perf_counter() - began)
+
+    started = time.perf_counter()
+    async with count_statements() as statements:
+        for start in range(0, len(ids), concurrency):
+            await asyncio.gather(*(scan(id) for id in ids[start:start + concurrency]))
+        if buffer is not None:
+            await buffer.close()
+    elapsed = time.perf_counter() - started
+
+    result = summarize(name, samples, elapsed)
+    result["concurrency"] = concurrency
+    result["queries"] = len(without_transactions(statements))
+
+    return result
+
+
+async def run(students: int, concurrency: int, size: int, interval: float) -> list:
+    ids = await seed(students)
+
+    results = []
+    for day, name in enumerate(("per_request", "buffered")):
+        date = (datetime.date(2023, 1, 9) + datetime.timedelta(days=day)).isoformat()
+        buffer = (
+            AttendanceBuffer(StudentAttendance, "student_id", size, interval)
+            if name == "buffered"
+            else None
+        )
+        results.append(await timed(name, buffer, ids, date, concurrency, True))
+        results.append(await timed(name + "_repeat", buffer, ids, date, concurrency, False))
+        assert await StudentAttendance.filter(date=date).count() == len(ids)
+
+    student_crud.attendance_buffer = None
+    return results
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        await open_database("sqlite://{0}".format(os.path.join(directory, "bench.db")))
+        try:
+            results = await run(
+                args.students, args.concurrency, args.size, args.interval_ms / 1000
+            )
+        finally:
+            await close_database()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--size", type=int, default=500)
+    parser.add_argument("--interval-ms", type=float, default=200)
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,139 @@
+"""Throughput and latency of the authentication path.
+
+Run from the project directory:
+
+    python -m benchmarks.auth_suite [--users 1000] [--output auth.json]
+                                    [--compare previous.json]
+
+Every case runs against a freshly seeded SQLite database and the result is
+written as JSON (see benchmarks.harness.report) so two commits can be
+compared with --compare.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from datetime import timedelta
+
+from fastapi import Depends
+
+from app.api import auth
+from app.api.auth import get_current_user
+from app.config.app import settings
+from app.main import create_application
+from app.models.user import User
+from app.providers.AuthenticationProvider import AuthenticationProvider
+from app.services.RateLimiter import RateLimiter
+from app.utils import (
+    create_access_token,
+    create_user_access_token,
+    get_password_hash,
+    principal_cache,
+    verify_password,
+)
+from benchmarks.harness import (
+    asgi_request,
+    close_database,
+    compare,
+    measure,
+    open_database,
+    report,
+)
+
+PASSWORD = "correct horse battery staple"
+
+
+async def seed(users: int) -> User:
+    password = get_password_hash(PASSWORD)
+    await User.bulk_create(
+        [
+            User(name="User {0}".format(i), email="user{0}@example.com".format(i), password=password)
+            for i in range(users)
+        ]
+    )
+
+    return await User.get(email="user{0}@example.com".format(users // 2))
+
+
+def build_application():
+    app = create_application()
+
+    async def protected(user: User = Depends(AuthenticationProvider())):
+        return {"id": user.id}
+
+    app.add_api_route("/_bench/protected", protected)
+
+    # Benchmarks log in far faster than a person, so lift the throttle.
+    unlimited = float("inf")
+    auth.email_login_limiter = RateLimiter(capacity=unlimited, rate=unlimited)
+    auth.ip_login_limiter = RateLimiter(capacity=unlimited, rate=unlimited)
+
+    return app
+
+
+async def run(users: int, iterations: int, hash_iterations: int) -> list:
+    user = await seed(users)
+    app = build_application()
+    token = create_user_access_token(user, timedelta(minutes=30))
+    bearer = {"Authorization": "Bearer {0}".format(token)}
+    login = {"username": user.email, "password": PASSWORD}
+
+    async def uncached_current_user():
+        principal_cache.clear()
+        await get_current_user(token)
+
+    async def trusted_current_user():
+        settings.auth_trust_token_claims = True
+        try:
+            await get_current_user(token)
+        finally:
+            settings.auth_trust_token_claims = False
+
+    async def protected_route():
+        status, _ = await asgi_request(app, "GET", "/_bench/protected", headers=bearer)
+        assert status == 200, status
+
+    async def login_route():
+        status, _ = await asgi_request(app, "POST", "/auth/login", login)
+        assert status == 200, status
+
+    async def create_token():
+        create_access_token({"sub": user.email}, timedelta(minutes=30))
+
+    async def verify():
+        verify_password(PASSWORD, user.password)
+
+    return [
+        await measure("create_access_token", create_token, iterations),
+        await measure("get_current_user_db", uncached_current_user, iterations),
+        await measure("get_current_user_cached", lambda: get_current_user(token), iterations),
+        await measure("get_current_user_trusted_claims", trusted_current_user, iterations),
+        await measure("protected_route", protected_route, iterations),
+        await measure("verify_password", verify, hash_iterations),
+        await measure("login_route", login_route, hash_iterations),
+    ]
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        await open_database("sqlite://{0}".format(os.path.join(directory, "bench.db")))
+        try:
+            results = await run(args.users, args.iterations, args.hash_iterations)
+        finally:
+            await close_database()
+
+    document = report(results, args.output)
+    if args.compare:
+        print(json.dumps(compare(args.compare, document), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--hash-iterations", type=int, default=20)
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--compare", help="previous JSON report to compare against")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""Statements and latency of a student check-out under concurrent scans.
+
+Run from the project directory:
+
+    python -m benchmarks.check_out [--students 2000] [--concurrency 50]
+                                   [--output check_out.json]
+
+The `three_queries` case restores the old check-in lookup, check-out lookup
+and UPDATE so both numbers come from the same tree. Each case checks out
+every seeded student once, `concurrency` scans at a time, and then scans
+them all again to time the already-checked-out path.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from app.api.crud import student_crud
+from app.models.student import Student
+from app.models.student_attendance import StudentAttendance
+from benchmarks.harness import close_database, count_statements, open_database, report, summarize, without_transactions
+
+
+async def three_queries(student: int, date) -> bool | None:
+    if not await StudentAttendance.get_or_none(student=student, date=date):
+        return None
+    if not await StudentAttendance.get_or_none(student=student, date=date, checkout_at=None):
+        return False
+
+    await StudentAttendance.filter(student=student, date=date).update(
+        checkout_at=datetime.datetime.now(), updated_at=datetime.datetime.now()
+    )
+    return True
+
+
+async def seed(students: int, date: str) -> list:
+    await Student.bulk_create(
+        [
+            Student(student_code="LS{0:08d}-1".format(id), first_name="Kofi", last_name=str(id))
+            for id in range(students)
+        ]
+    )
+    ids = await Student.all().values_list("id", flat=True)
+    await StudentAttendance.bulk_create(
+        [StudentAttendance(student_id=id, date=date, checkin_at=datetime.datetime.now()) for id in ids]
+    )
+
+    return ids
+
+
+async def timed(name: str, check_out, ids: list, date: str, concurrency: int, expected) -> dict:
+    samples = []
+
+    async def scan(id):
+        began = time.perf_counter()
+        assert await check_out(id, date) is expected
+        samples.append(time.perf_counter() - began)
+
+    async with count_statements() as statements:
+        await scan(ids[0])
+
+    started = time.perf_counter()
+    for start in range(1, len(ids), concurrency):
+        await asyncio.gather(*(scan(id) for id in ids[start:start + concurrency]))
+
+    result = summarize(name, samples, time.perf_counter() - started)
+    result["concurrency"] = concurrency
+    result["queries"] = len(without_transactions(statements))
+
+    return result
+
+
+async def run(students: int, concurrency: int) -> list:
+    date = datetime.date.today().strftime("%Y-%m-%d")
+    ids = await seed(students, date)
+
+    results = []
+    for name, check_out in (("three_queries", three_queries), ("conditional", student_crud.check_out)):
+        await StudentAttendance.all().update(checkout_at=None)
+        results.append(await timed(name, check_out, ids, date, concurrency, True))
+        results.append(
+            await timed(name + "_repeat", check_out, ids, date, concurrency, False)
+        )
+
+    return results
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        await open_database("sqlite://{0}".format(os.path.join(directory, "bench.db")))
+        try:
+            results = await run(args.students, args.concurrency)
+        finally:
+            await close_database()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,181 @@
+import contextlib
+import json
+import platform
+import statistics
+import subprocess
+import time
+from typing import Awaitable, Callable, List
+
+from tortoise import Tortoise
+
+from app.config import database
+
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+
+async def open_database(db_url: str = "sqlite://:memory:") -> None:
+    await Tortoise.init(db_url=db_url, modules={"models": database.MODELS[:-1]})
+    await Tortoise.generate_schemas()
+
+
+async def close_database() -> None:
+    await Tortoise.close_connections()
+
+
+@contextlib.asynccontextmanager
+async def count_statements(connection_name: str = "default"):
+    """Collect every SQL statement the SQLite connection runs inside the block."""
+    statements: List[str] = []
+    connection = Tortoise.get_connection(connection_name)._connection
+    await connection.set_trace_callback(statements.append)
+    try:
+        yield statements
+    finally:
+        await connection.set_trace_callback(None)
+
+
+def without_transactions(statements: List[str]) -> List[str]:
+    """The statements from count_statements, without transaction control."""
+    return [sql for sql in statements if not sql.lstrip().upper().startswith(TRANSACTION_CONTROL)]
+
+
+async def asgi_request(
+    app, method: str, path: str, json_body: dict | None = None, headers: dict | None = None
+) -> tuple[int, bytes]:
+    """Drive a single request through the ASGI app without a network socket."""
+    path, _, query = path.partition("?")
+    body = json.dumps(json_body).encode() if json_body is not None else b""
+    raw_headers = [(b"host", b"bench")]
+    if json_body is not None:
+        raw_headers.append((b"content-type", b"application/json"))
+    for key, value in (headers or {}).items():
+        raw_headers.append((key.lower().encode(), value.encode()))
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    received = False
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+
+    return status, b"".join(chunks)
+
+
+def summarize(name: str, samples: List[float], elapsed: float) -> dict:
+    """Summarize per-operation latencies (seconds) as throughput and percentiles."""
+    ordered = sorted(samples)
+
+    def percentile(p: float) -> float:
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return round(ordered[index] * 1000, 3)
+
+    return {
+        "name": name,
+        "ops": len(ordered),
+        "ops_per_sec": round(len(ordered) / elapsed, 1) if elapsed else None,
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": percentile(50),
+        "p95_ms": percentile(95),
+        "p99_ms": percentile(99),
+    }
+
+
+async def measure(
+    name: str, operation: Callable[[], Awaitable], iterations: int
+) -> dict:
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        began = time.perf_counter()
+        await operation()
+        samples.append(time.perf_counter() - began)
+
+    return summarize(name, samples, time.perf_counter() - started)
+
+
+def report(results: List[dict], output: str | None = None) -> dict:
+    """Wrap results with enough context to compare runs across commits."""
+    document = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "results": results,
+    }
+    text = json.dumps(document, indent=2)
+
+    if output:
+        with open(output, "w") as file:
+            file.write(text + "\n")
+    else:
+        print(text)
+
+    return document
+
+
+def compare(baseline_path: str, document: dict) -> List[dict]:
+    """Relative change of each case against a previous report (positive is slower)."""
+    with open(baseline_path) as file:
+        baseline = {result["name"]: result for result in json.load(file)["results"]}
+
+    changes = []
+    for result in document["results"]:
+        before = baseline.get(result["name"])
+        if before is None:
+            continue
+
+        changes.append(
+            {
+                "name": result["name"],
+                "p50_change": _change(before["p50_ms"], result["p50_ms"]),
+                "p99_change": _change(before["p99_ms"], result["p99_ms"]),
+                "ops_per_sec_change": _change(before["ops_per_sec"], result["ops_per_sec"]),
+            }
+        )
+
+    return changes
+
+
+def _change(before: float, after: float) -> float | None:
+    if not before:
+        return None
+    return round((after - before) / before, 4)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
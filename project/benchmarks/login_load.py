@@ -0,0 +1,84 @@
+"""p99 latency of /ping while /auth/login is saturated.
+
+Run from the project directory:
+
+    python -m benchmarks.login_load [--logins 8] [--duration 5]
+
+The `inline` mode restores the old behaviour of running bcrypt on the event
+loop so both numbers come from the same tree.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.api import auth
+from app.api.crud import user_crud
+from app.main import create_application
+from app.schemas.user import UserCreate
+from app.services.RateLimiter import RateLimiter
+from app.utils import verify_password
+from benchmarks.harness import asgi_request, close_database, open_database, summarize
+
+EMAIL = "bench@example.com"
+PASSWORD = "correct horse battery staple"
+
+offloaded_verify = auth.verify_password_async
+
+
+async def inline_verify(plain_password, hashed_password):
+    return verify_password(plain_password, hashed_password)
+
+
+async def run(mode: str, logins: int, duration: float) -> dict:
+    app = create_application()
+    auth.verify_password_async = inline_verify if mode == "inline" else offloaded_verify
+    # Every worker logs in as one account, which the throttle would turn
+    # away after its burst without ever reaching bcrypt.
+    unlimited = float("inf")
+    auth.email_login_limiter = RateLimiter(capacity=unlimited, rate=unlimited)
+    auth.ip_login_limiter = RateLimiter(capacity=unlimited, rate=unlimited)
+    stop = time.perf_counter() + duration
+
+    async def login_worker():
+        while time.perf_counter() < stop:
+            await asgi_request(
+                app, "POST", "/auth/login", {"username": EMAIL, "password": PASSWORD}
+            )
+
+    async def ping_worker():
+        samples = []
+        while time.perf_counter() < stop:
+            began = time.perf_counter()
+            await asgi_request(app, "GET", "/ping")
+            samples.append(time.perf_counter() - began)
+            await asyncio.sleep(0.005)
+        return samples
+
+    started = time.perf_counter()
+    *_, samples = await asyncio.gather(
+        *(login_worker() for _ in range(logins)), ping_worker()
+    )
+    result = summarize("ping_under_login_load", samples, time.perf_counter() - started)
+    result["mode"] = mode
+
+    return result
+
+
+async def main(logins: int, duration: float) -> None:
+    await open_database()
+    await user_crud.post(UserCreate(name="Bench", email=EMAIL, password=PASSWORD))
+    try:
+        for mode in ("inline", "offloaded"):
+            print(json.dumps(await run(mode, logins, duration)))
+    finally:
+        await close_database()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.logins, args.duration))
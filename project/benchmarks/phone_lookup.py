@@ -0,0 +1,111 @@
+"""Guardian lookup by phone, by trailing-digits match against the indexed key.
+
+Run from the project directory:
+
+    python -m benchmarks.phone_lookup [--guardians 100000] [--iterations 200]
+                                      [--output phone.json]
+
+The table is filled with generated Ghanaian mobile numbers written in a mix
+of national and international forms. Each case looks up random guardians by
+a number written differently from the stored one, and reports the SQLite
+query plan it ran with.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+
+from tortoise import Tortoise
+from tortoise.expressions import Q
+
+from app.api.crud import guardian_crud
+from app.models.guardian import Guardian
+from app.traits.models.phone import phone_keys
+from benchmarks.harness import close_database, measure, open_database, report
+
+FORMS = ["0{0}", "+233{0}", "+233 {0}", "00233{0}"]
+
+
+def guardian(id: int, number: int) -> Guardian:
+    # bulk_create skips save(), so the keys are filled in here.
+    phone = FORMS[id % len(FORMS)].format(number)
+
+    return Guardian(first_name="Guardian", last_name=str(id), phone=phone, **phone_keys(phone))
+
+
+async def seed(guardians: int) -> list:
+    random.seed(42)
+    numbers = random.sample(range(200000000, 599999999), guardians)
+
+    for start in range(0, guardians, 5000):
+        await Guardian.bulk_create(
+            [guardian(id, numbers[id]) for id in range(start, min(start + 5000, guardians))]
+        )
+
+    return numbers
+
+
+async def query_plan(queryset) -> str:
+    sql = queryset.sql()
+    rows = await Tortoise.get_connection("default").execute_query_dict(
+        "EXPLAIN QUERY PLAN " + sql
+    )
+
+    return "; ".join(row["detail"] for row in rows)
+
+
+async def run(guardians: int, iterations: int) -> list:
+    numbers = await seed(guardians)
+    lookups = iter(["0" + str(number) for number in random.choices(numbers, k=iterations * 2)])
+
+    async def by_endswith():
+        phone = next(lookups)
+        assert await Guardian.filter(
+            Q(phone__endswith=phone[-9:]) & Q(deleted_at=None)
+        ).first()
+
+    async def by_suffix():
+        assert await guardian_crud.get_guardian_by_phone(next(lookups))
+
+    cases = [
+        (
+            "phone_endswith",
+            by_endswith,
+            Guardian.filter(Q(phone__endswith="244000001") & Q(deleted_at=None)).limit(1),
+        ),
+        (
+            "phone_suffix",
+            by_suffix,
+            Guardian.filter(Q(phone_suffix="244000001") & Q(deleted_at=None)).limit(1),
+        ),
+    ]
+
+    results = []
+    for name, lookup, queryset in cases:
+        result = await measure(name, lookup, iterations)
+        result["guardians"] = guardians
+        result["plan"] = await query_plan(queryset)
+        results.append(result)
+
+    return results
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        await open_database("sqlite://{0}".format(os.path.join(directory, "bench.db")))
+        try:
+            results = await run(args.guardians, args.iterations)
+        finally:
+            await close_database()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--guardians", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,100 @@
+"""Draining a kiosk's queued scans one request at a time versus as one batch.
+
+Run from the project directory:
+
+    python -m benchmarks.scan_batch [--sizes 10 100 500] [--rounds 20]
+                                    [--output scan_batch.json]
+
+Each round checks in `size` students, either with one check-in request per
+scan or with a single POST /students/scans. Attendance is cleared between
+rounds, and the scan cache is warm in both cases, as it is on a busy kiosk.
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import tempfile
+import time
+
+from app.api.crud import student_crud
+from app.main import create_application
+from app.models.student import Student
+from app.models.student_attendance import StudentAttendance
+from benchmarks.harness import asgi_request, close_database, count_statements, open_database, report, summarize, without_transactions
+
+
+async def seed(students: int) -> list:
+    codes = ["LS{0:08d}-1".format(id) for id in range(students)]
+    await Student.bulk_create(
+        [Student(student_code=code, first_name="Kofi", last_name=code) for code in codes]
+    )
+    await student_crud.resolve_scans(codes)
+
+    return codes
+
+
+async def per_scan(app, codes: list) -> None:
+    for code in codes:
+        status, _ = await asgi_request(app, "POST", "/students/{0}/check-in".format(code))
+        assert status == 200
+
+
+async def batch(app, codes: list) -> None:
+    scanned_at = datetime.datetime.now().isoformat()
+    events = [{"code": code, "action": "check-in", "scanned_at": scanned_at} for code in codes]
+    status, _ = await asgi_request(app, "POST", "/students/scans", {"events": events})
+    assert status == 200
+
+
+async def timed(name: str, drain, app, codes: list, rounds: int) -> dict:
+    samples = []
+    for _ in range(rounds):
+        await StudentAttendance.all().delete()
+        began = time.perf_counter()
+        await drain(app, codes)
+        samples.append(time.perf_counter() - began)
+
+    await StudentAttendance.all().delete()
+    async with count_statements() as statements:
+        await drain(app, codes)
+
+    result = summarize(name, samples, sum(samples))
+    result["scans"] = len(codes)
+    result["scans_per_sec"] = round(len(codes) * rounds / sum(samples), 1)
+    result["queries"] = len(without_transactions(statements))
+
+    return result
+
+
+async def run(sizes: list, rounds: int) -> list:
+    app = create_application()
+    codes = await seed(max(sizes))
+
+    results = []
+    for size in sizes:
+        for name, drain in (("per_scan", per_scan), ("batch", batch)):
+            results.append(
+                await timed("{0}_{1}".format(name, size), drain, app, codes[:size], rounds)
+            )
+
+    return results
+
+
+async def main(args) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        await open_database("sqlite://{0}".format(os.path.join(directory, "bench.db")))
+        try:
+            results = await run(args.sizes, args.rounds)
+        finally:
+            await close_database()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
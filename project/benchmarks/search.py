@@ -0,0 +1,77 @@
+"""Typeahead latency of the in-process name search index.
+
+Run from the project directory:
+
+    python -m benchmarks.search [--names 100000] [--iterations 200]
+                                [--output search.json]
+
+The index is filled with generated student and guardian names, then each
+case replays the prefixes a user produces while typing a name, or a
+name with a letter missing.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from faker import Faker
+
+from app.services.SearchIndex import SearchIndex
+from benchmarks.harness import measure, report
+
+
+def build(names: int) -> tuple:
+    fake = Faker()
+    Faker.seed(42)
+    people = [fake.name() for _ in range(names)]
+    index = SearchIndex()
+
+    started = time.perf_counter()
+    for id, name in enumerate(people):
+        kind = "student" if id % 2 else "guardian"
+        index.add((kind, id), name, {"type": kind, "id": id, "name": name})
+
+    return index, people, time.perf_counter() - started
+
+
+async def run(names: int, iterations: int) -> list:
+    index, people, elapsed = build(names)
+    random.seed(42)
+    typed = [
+        name[:length]
+        for name in random.sample(people, iterations)
+        for length in (1, 3, len(name.split()[0]) + 3, len(name))
+    ]
+    # Dropping a letter from the middle of a name leaves no prefix match,
+    # so these go through the trigram postings.
+    typos = [
+        name[:len(name) // 2] + name[len(name) // 2 + 1:]
+        for name in random.sample(people, iterations)
+    ]
+    queries = iter(typed + typos)
+
+    async def search():
+        index.search(next(queries), 10)
+
+    results = [
+        await measure("search_typeahead", search, len(typed)),
+        await measure("search_typo", search, len(typos)),
+    ]
+    for result in results:
+        result["build_seconds"] = round(elapsed, 2)
+        result["documents"] = len(index)
+
+    return results
+
+
+async def main(args) -> None:
+    report(await run(args.names, args.iterations), args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=100000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
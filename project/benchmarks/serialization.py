@@ -0,0 +1,98 @@
+"""Cost of serializing list responses, per 10k rows.
+
+Run from the project directory:
+
+    python -m benchmarks.serialization [--rows 10000] [--iterations 20]
+                                       [--output serialization.json]
+
+"models" is the default list path: Tortoise instances validated through
+the response schema and rendered by FastAPI. "values" is the fields=
+path: a .values() projection dumped straight to JSON. Each case is timed
+with the rows already loaded, and again including the query.
+"""
+import argparse
+import asyncio
+
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from starlette.responses import JSONResponse, Response
+
+from app.api.crud import student_crud
+from app.models.student import Student
+from app.schemas.student import AllStudentsResponse, BaseResponse
+from app.utils import fast_json_response
+from benchmarks.harness import close_database, measure, open_database, report
+
+FIELDS = ["id", "student_code", "first_name", "last_name"]
+
+
+async def seed(rows: int) -> None:
+    await Student.bulk_create(
+        [
+            Student(
+                student_code="LS{0:08d}-123".format(i),
+                first_name="First{0}".format(i),
+                last_name="Last{0}".format(i),
+                email="student{0}@example.com".format(i),
+            )
+            for i in range(rows)
+        ]
+    )
+
+
+async def run(rows: int, iterations: int) -> list:
+    await seed(rows)
+    field = create_response_field(name="students", type_=AllStudentsResponse)
+    models = await student_crud.get_all(rows)
+    values = await student_crud.get_all(rows, fields=FIELDS)
+    every_value = await student_crud.get_all(rows, fields=list(BaseResponse.__fields__))
+
+    async def render_models(students):
+        content = await serialize_response(
+            field=field, response_content={"students": students}, is_coroutine=True
+        )
+        JSONResponse(content)
+
+    async def models_serialize():
+        await render_models(models)
+
+    async def values_serialize():
+        fast_json_response({"students": values}, Response())
+
+    async def all_values_serialize():
+        fast_json_response({"students": every_value}, Response())
+
+    async def models_end_to_end():
+        await render_models(await student_crud.get_all(rows))
+
+    async def values_end_to_end():
+        fast_json_response(
+            {"students": await student_crud.get_all(rows, fields=FIELDS)}, Response()
+        )
+
+    return [
+        await measure("serialize_models", models_serialize, iterations),
+        await measure("serialize_values_all_fields", all_values_serialize, iterations),
+        await measure("serialize_values_projected", values_serialize, iterations),
+        await measure("query_and_serialize_models", models_end_to_end, iterations),
+        await measure("query_and_serialize_values_projected", values_end_to_end, iterations),
+    ]
+
+
+async def main(args) -> None:
+    await open_database()
+    try:
+        results = await run(args.rows, args.iterations)
+    finally:
+        await close_database()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,97 @@
+"""Statements and latency per update endpoint.
+
+Run from the project directory:
+
+    python -m benchmarks.update_queries [--iterations 200] [--fallback]
+                                        [--output updates.json]
+
+Each case counts the SQL statements one request runs, then times it. With
+--fallback, updates skip RETURNING and use the UPDATE + SELECT path that
+older SQLite builds get.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+
+from app.api.crud import queries
+from app.main import create_application
+from app.models.guardian import Guardian
+from app.models.student import Student
+from app.models.teacher import Teacher
+from app.models.user import User
+from benchmarks.harness import (
+    asgi_request,
+    close_database,
+    count_statements,
+    measure,
+    open_database,
+    report,
+    without_transactions,
+)
+
+
+async def seed() -> dict:
+    guardian = await Guardian.create(first_name="Ama", last_name="Mensah", phone="0244000001")
+    student = await Student.create(student_code="LS00000001-1", first_name="Kofi", last_name="Mensah")
+    teacher = await Teacher.create(
+        teacher_code="LS-00000001-1-T", first_name="Akua", last_name="Boateng", phone="0244000002"
+    )
+    user = await User.create(name="Admin", email="admin@example.com", password="x")
+
+    return {"guardian": guardian.id, "student": student.id, "teacher": teacher.id, "user": user.id}
+
+
+async def run(iterations: int) -> list:
+    ids = await seed()
+    app = create_application()
+    cases = [
+        ("put_student", "/students/{0}".format(ids["student"]), {"first_name": "Kwame"}),
+        (
+            "put_student_guardians",
+            "/students/{0}".format(ids["student"]),
+            {"first_name": "Kwame", "guardians": [ids["guardian"]]},
+        ),
+        ("put_teacher", "/teachers/{0}".format(ids["teacher"]), {"first_name": "Abena"}),
+        ("put_guardian", "/guardians/{0}".format(ids["guardian"]), {"first_name": "Efua"}),
+        ("put_user", "/users/{0}".format(ids["user"]), {"name": "Administrator"}),
+    ]
+
+    results = []
+    for name, path, body in cases:
+        async def update():
+            status, _ = await asgi_request(app, "PUT", path, body)
+            assert status == 200, status
+
+        async with count_statements() as statements:
+            await update()
+
+        result = await measure(name, update, iterations)
+        result["statements"] = len(statements)
+        result["queries"] = len(without_transactions(statements))
+        results.append(result)
+
+    return results
+
+
+async def main(args) -> None:
+    if args.fallback:
+        queries.SQLITE_RETURNING = False
+
+    with tempfile.TemporaryDirectory() as directory:
+        await open_database("sqlite://{0}".format(os.path.join(directory, "bench.db")))
+        try:
+            results = await run(args.iterations)
+        finally:
+            await close_database()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--fallback", action="store_true")
+    parser.add_argument("--output")
+
+    asyncio.run(main(parser.parse_args()))
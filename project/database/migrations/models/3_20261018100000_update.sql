@@ -0,0 +1,7 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "code_sequence" (
+    "name" VARCHAR(50) NOT NULL  PRIMARY KEY,
+    "next_value" BIGINT NOT NULL  DEFAULT 1
+);
+-- downgrade --
+DROP TABLE IF EXISTS "code_sequence";
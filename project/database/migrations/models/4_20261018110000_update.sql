@@ -0,0 +1,44 @@
+-- upgrade --
+ALTER TABLE "guardian" ADD "phone_e164" VARCHAR(16);
+ALTER TABLE "guardian" ADD "phone_suffix" VARCHAR(9);
+ALTER TABLE "teacher" ADD "phone_e164" VARCHAR(16);
+ALTER TABLE "teacher" ADD "phone_suffix" VARCHAR(9);
+-- Backfill with the rules of app.traits.models.phone, taking 233 as the
+-- default country code.
+UPDATE "guardian" SET
+    "phone_suffix" = NULLIF(RIGHT("digits", 9), ''),
+    "phone_e164" = CASE WHEN LENGTH("number") BETWEEN 7 AND 15 THEN '+' || "number" END
+FROM (
+    SELECT "id" AS "key", "digits", CASE
+        WHEN LTRIM("phone") LIKE '+%' THEN "digits"
+        WHEN "digits" LIKE '00%' THEN SUBSTRING("digits" FROM 3)
+        WHEN "digits" LIKE '0%' THEN '233' || SUBSTRING("digits" FROM 2)
+        WHEN LENGTH("digits") <= 9 THEN '233' || "digits"
+        ELSE "digits"
+    END AS "number"
+    FROM (SELECT "id", "phone", REGEXP_REPLACE("phone", '\D', '', 'g') AS "digits" FROM "guardian") AS "raw"
+) AS "normalized"
+WHERE "guardian"."id" = "normalized"."key";
+UPDATE "teacher" SET
+    "phone_suffix" = NULLIF(RIGHT("digits", 9), ''),
+    "phone_e164" = CASE WHEN LENGTH("number") BETWEEN 7 AND 15 THEN '+' || "number" END
+FROM (
+    SELECT "id" AS "key", "digits", CASE
+        WHEN LTRIM("phone") LIKE '+%' THEN "digits"
+        WHEN "digits" LIKE '00%' THEN SUBSTRING("digits" FROM 3)
+        WHEN "digits" LIKE '0%' THEN '233' || SUBSTRING("digits" FROM 2)
+        WHEN LENGTH("digits") <= 9 THEN '233' || "digits"
+        ELSE "digits"
+    END AS "number"
+    FROM (SELECT "id", "phone", REGEXP_REPLACE("phone", '\D', '', 'g') AS "digits" FROM "teacher") AS "raw"
+) AS "normalized"
+WHERE "teacher"."id" = "normalized"."key";
+CREATE INDEX IF NOT EXISTS "idx_guardian_phone_s_8f748f" ON "guardian" ("phone_suffix");
+CREATE INDEX IF NOT EXISTS "idx_teacher_phone_s_5257ac" ON "teacher" ("phone_suffix");
+-- downgrade --
+DROP INDEX IF EXISTS "idx_teacher_phone_s_5257ac";
+DROP INDEX IF EXISTS "idx_guardian_phone_s_8f748f";
+ALTER TABLE "teacher" DROP COLUMN "phone_suffix";
+ALTER TABLE "teacher" DROP COLUMN "phone_e164";
+ALTER TABLE "guardian" DROP COLUMN "phone_suffix";
+ALTER TABLE "guardian" DROP COLUMN "phone_e164";
@@ -0,0 +1,28 @@
+-- upgrade --
+-- Fold duplicate check-ins into the first row of each day, keeping the
+-- latest check-out, before the unique constraints go on.
+UPDATE "student_attendace" AS "keep" SET "checkout_at" = "day"."checkout_at"
+FROM (
+    SELECT MIN("id") AS "id", MAX("checkout_at") AS "checkout_at"
+    FROM "student_attendace" GROUP BY "student_id", "date" HAVING COUNT(*) > 1
+) AS "day"
+WHERE "keep"."id" = "day"."id";
+DELETE FROM "student_attendace" AS "duplicate" USING "student_attendace" AS "keep"
+WHERE "duplicate"."student_id" = "keep"."student_id"
+    AND "duplicate"."date" = "keep"."date"
+    AND "duplicate"."id" > "keep"."id";
+ALTER TABLE "student_attendace" ADD CONSTRAINT "uid_student_att_student_b122a7" UNIQUE ("student_id", "date");
+UPDATE "teacher_attendace" AS "keep" SET "checkout_at" = "day"."checkout_at"
+FROM (
+    SELECT MIN("id") AS "id", MAX("checkout_at") AS "checkout_at"
+    FROM "teacher_attendace" GROUP BY "teacher_id", "date" HAVING COUNT(*) > 1
+) AS "day"
+WHERE "keep"."id" = "day"."id";
+DELETE FROM "teacher_attendace" AS "duplicate" USING "teacher_attendace" AS "keep"
+WHERE "duplicate"."teacher_id" = "keep"."teacher_id"
+    AND "duplicate"."date" = "keep"."date"
+    AND "duplicate"."id" > "keep"."id";
+ALTER TABLE "teacher_attendace" ADD CONSTRAINT "uid_teacher_att_teacher_2125c7" UNIQUE ("teacher_id", "date");
+-- downgrade --
+ALTER TABLE "teacher_attendace" DROP CONSTRAINT "uid_teacher_att_teacher_2125c7";
+ALTER TABLE "student_attendace" DROP CONSTRAINT "uid_student_att_student_b122a7";
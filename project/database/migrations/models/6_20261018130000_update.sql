@@ -0,0 +1,12 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "idempotency_key" (
+    "key" VARCHAR(64) NOT NULL  PRIMARY KEY,
+    "fingerprint" VARCHAR(64) NOT NULL,
+    "status_code" INT,
+    "headers" JSONB,
+    "body" BYTEA,
+    "expires_at" TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "idx_idempotency_expires_8bff94" ON "idempotency_key" ("expires_at");
+-- downgrade --
+DROP TABLE IF EXISTS "idempotency_key";
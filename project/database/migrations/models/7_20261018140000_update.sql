@@ -0,0 +1,6 @@
+-- upgrade --
+CREATE INDEX IF NOT EXISTS "idx_guardian_phone_e_c6a56e" ON "guardian" ("phone_e164");
+CREATE INDEX IF NOT EXISTS "idx_teacher_phone_e_eddcfe" ON "teacher" ("phone_e164");
+-- downgrade --
+DROP INDEX IF EXISTS "idx_teacher_phone_e_eddcfe";
+DROP INDEX IF EXISTS "idx_guardian_phone_e_c6a56e";
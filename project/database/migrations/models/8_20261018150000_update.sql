@@ -0,0 +1,10 @@
+-- upgrade --
+CREATE TABLE IF NOT EXISTS "revoked_token" (
+    "jti" VARCHAR(64) NOT NULL  PRIMARY KEY,
+    "expires_at" TIMESTAMPTZ NOT NULL,
+    "revoked_at" TIMESTAMPTZ NOT NULL  DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS "idx_revoked_tok_expires_77ccc7" ON "revoked_token" ("expires_at");
+CREATE INDEX IF NOT EXISTS "idx_revoked_tok_revoked_f4208b" ON "revoked_token" ("revoked_at");
+-- downgrade --
+DROP TABLE IF EXISTS "revoked_token";
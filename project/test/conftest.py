@@ -1,4 +1,4 @@
-import os, pytest
+import asyncio, os, pytest
 
 from fastapi_mail import ConnectionConfig
 from starlette.testclient import TestClient
@@ -53,6 +53,18 @@ def anyio_backend(request):
     return request.param
 
 
+@pytest.fixture
+def concurrent_db(test_app_with_db):
+    """let several coroutines of one test wait on the sqlite connection lock"""
+    # asyncio locks bind to the first loop they are contended on, and every
+    # test runs on a fresh loop.
+    Tortoise.get_connection("default")._lock = asyncio.Lock()
+
+    yield
+
+    Tortoise.get_connection("default")._lock = asyncio.Lock()
+
+
 @pytest.fixture
 async def create_student(request) -> Student:
     """create a student in the db"""
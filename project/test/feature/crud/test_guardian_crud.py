@@ -1,5 +1,16 @@
 import pytest
+from faker import Faker
+
 from app.api.crud import guardian_crud
+from app.models.guardian import Guardian
+from app.schemas.guardian import GuardianUpdate
+
+fake = Faker()
+
+
+def national_number() -> str:
+    """Nine digits after the trunk prefix, different in every test."""
+    return fake.unique.numerify("2########")
 
 
 @pytest.mark.parametrize("anyio_backend", ["asyncio"])
@@ -12,3 +23,30 @@ async def test_get_with_id_list(test_app_with_db, anyio_backend, create_guardian
     assert data["last_name"] == guardian.last_name
 
 
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_get_guardian_by_phone_matches_any_written_form(test_app_with_db, anyio_backend):
+    number = national_number()
+    guardian = await Guardian.create(
+        first_name="Ama", last_name="Mensah", phone="0{0} {1} {2}".format(number[:2], number[2:5], number[5:])
+    )
+
+    for phone in ["0" + number, "+233 {0} {1}".format(number[:2], number[2:]), "00233" + number]:
+        assert (await guardian_crud.get_guardian_by_phone(phone)).id == guardian.id
+    assert await guardian_crud.get_guardian_by_phone("no number") is None
+    assert guardian.phone_e164 == "+233" + number
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_phone_changes_update_the_lookup_keys(test_app_with_db, anyio_backend):
+    first, second, third = national_number(), national_number(), national_number()
+    guardian = await Guardian.create(first_name="Kofi", last_name="Boateng", phone="0" + first)
+
+    await guardian_crud.put(guardian.id, GuardianUpdate(phone="+233 " + second))
+    assert (await guardian_crud.get_guardian_by_phone("0" + second)).id == guardian.id
+
+    guardian.phone = "0" + third
+    await guardian.save(update_fields=["phone"])
+    assert (await Guardian.get(id=guardian.id)).phone_suffix == third
+    assert await guardian_crud.get_guardian_by_phone("0" + second) is None
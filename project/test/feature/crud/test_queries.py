@@ -0,0 +1,115 @@
+import asyncio
+import datetime
+
+import pytest
+from faker import Faker
+from tortoise.expressions import F, Q
+
+from app.api.crud import queries, student_crud, teacher_crud
+from app.api.crud.queries import insert_many, insert_or_ignore, update_returning
+from app.models.student_attendance import StudentAttendance
+from app.models.teacher_attendance import TeacherAttendance
+from app.models.user import User
+
+fake = Faker()
+
+
+@pytest.fixture(params=[True, False], ids=["returning", "fallback"])
+def returning(request, monkeypatch):
+    monkeypatch.setattr(queries, "SQLITE_RETURNING", request.param)
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_update_returning_returns_the_updated_row(
+    test_app_with_db, anyio_backend, returning
+):
+    user = await User.create(name=fake.name(), email=fake.email(), password="secret")
+    name = fake.name()
+
+    updated = await update_returning(
+        User.filter(Q(id=user.id) & Q(deleted_at=None)),
+        name=name,
+        token_version=F("token_version") + 1,
+    )
+
+    assert updated.id == user.id
+    assert updated.name == name
+    assert updated.token_version == 1
+    assert (await User.get(id=user.id)).name == name
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_update_returning_without_a_match_returns_none(
+    test_app_with_db, anyio_backend, returning
+):
+    assert await update_returning(User.filter(id=0), name=fake.name()) is None
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_update_returning_without_values_reads_the_row(
+    test_app_with_db, anyio_backend
+):
+    user = await User.create(name=fake.name(), email=fake.email(), password="secret")
+
+    assert (await update_returning(User.filter(id=user.id))).name == user.name
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_insert_or_ignore_inserts_once(
+    test_app_with_db, anyio_backend, returning, create_student
+):
+    date = datetime.date(2020, 1, 6)
+
+    assert await insert_or_ignore(StudentAttendance, student_id=create_student.id, date=date)
+    assert not await insert_or_ignore(StudentAttendance, student_id=create_student.id, date=date)
+    assert await StudentAttendance.filter(student_id=create_student.id, date=date).count() == 1
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_insert_many_inserts_every_row_in_batches(
+    test_app_with_db, anyio_backend, create_student
+):
+    dates = [datetime.date(2020, 2, day) for day in range(1, 6)]
+
+    await insert_many(
+        [StudentAttendance(student_id=create_student.id, date=date) for date in dates], batch_size=2
+    )
+
+    rows = await StudentAttendance.filter(student_id=create_student.id).order_by("date")
+    assert [row.date for row in rows] == dates
+    assert all(row.created_at is not None for row in rows)
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_parallel_check_ins_record_one_row(
+    test_app_with_db, concurrent_db, anyio_backend, create_student, create_teacher
+):
+    today = datetime.date.today().strftime("%Y-%m-%d")
+
+    students = await asyncio.gather(
+        *[student_crud.check_in(create_student.id, today) for _ in range(50)]
+    )
+    teachers = await asyncio.gather(
+        *[teacher_crud.check_in(create_teacher.id, today) for _ in range(50)]
+    )
+
+    assert students.count(True) == 1
+    assert teachers.count(True) == 1
+    assert await StudentAttendance.filter(student_id=create_student.id).count() == 1
+    assert await TeacherAttendance.filter(teacher_id=create_teacher.id).count() == 1
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_parallel_check_outs_succeed_once(
+    test_app_with_db, concurrent_db, anyio_backend, create_student
+):
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    assert await student_crud.check_out(create_student.id, today) is None
+
+    await student_crud.check_in(create_student.id, today)
+    results = await asyncio.gather(
+        *[student_crud.check_out(create_student.id, today) for _ in range(20)]
+    )
+
+    assert results.count(True) == 1
+    assert results.count(False) == 19
@@ -1,5 +1,18 @@
-import pytest, datetime
-from app.api.crud import student_crud
+import asyncio, pytest, datetime, uuid
+from faker import Faker
+
+from tortoise.exceptions import IntegrityError
+
+from app.api.crud import guardian_crud, student_crud
+from app.models.code_sequence import CodeSequence
+from app.models.guardian import Guardian
+from app.models.student import Student
+from app.models.student_attendance import StudentAttendance
+from app.schemas.guardian import GuardianUpdate
+from app.schemas.student import StudentCreate, StudentUpdate
+from app.services.CodeAllocator import CodeAllocator
+
+fake = Faker()
 
 
 @pytest.mark.parametrize("anyio_backend", ["asyncio"])
@@ -21,4 +34,217 @@ async def test_get_student_by_invalid_student_code(test_app_with_db, anyio_backe
     date = datetime.datetime.now().strftime("%Y-%m-%d")
     data = await student_crud.check_out(10000, date)
 
-    assert data == 0
+    assert data is None
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_parallel_creates_get_unique_codes(test_app_with_db, concurrent_db, anyio_backend):
+    students = await asyncio.gather(
+        *[
+            student_crud.post(
+                StudentCreate(first_name=fake.first_name(), last_name=fake.last_name())
+            )
+            for _ in range(2000)
+        ]
+    )
+    prefixes = {student.student_code.split("-")[0] for student in students}
+
+    assert len(prefixes) == 2000
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_allocators_sharing_a_sequence_never_overlap(test_app_with_db, concurrent_db, anyio_backend):
+    name = uuid.uuid4().hex
+    workers = [CodeAllocator(name, block_size=7) for _ in range(3)]
+
+    batches = await asyncio.gather(
+        *[workers[i % 3].next() for i in range(3000)],
+        *[worker.take(50) for worker in workers],
+    )
+    values = batches[:3000] + [value for batch in batches[3000:] for value in batch]
+
+    assert len(values) == 3150
+    assert len(set(values)) == 3150
+    assert min(values) == 1
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_allocator_continues_after_existing_rows(test_app_with_db, anyio_backend):
+    async def seed():
+        return 41
+
+    allocator = CodeAllocator(uuid.uuid4().hex, block_size=5, seed=seed)
+
+    assert await allocator.take(3) == [42, 43, 44]
+    assert await allocator.take(4) == [45, 46, 47, 48]
+    assert allocator.stats() == {"reservations": 2, "available": 3}
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_allocator_keeps_a_sequence_another_worker_created_first(test_app_with_db, anyio_backend):
+    name = uuid.uuid4().hex
+
+    async def seed():
+        # Another worker creates the row while this one is still seeding.
+        await CodeSequence.create(name=name, next_value=100)
+        return 41
+
+    allocator = CodeAllocator(name, block_size=5, seed=seed)
+
+    assert await allocator.take(2) == [100, 101]
+    assert (await CodeSequence.get(name=name)).next_value == 105
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_import_reports_rows_lost_to_a_concurrent_writer(
+    test_app_with_db, anyio_backend, monkeypatch
+):
+    async def bulk_create(*args, **kwargs):
+        raise IntegrityError("UNIQUE constraint failed: student.email")
+
+    monkeypatch.setattr(Student, "bulk_create", bulk_create)
+    rows = [
+        (1, {"first_name": fake.first_name(), "last_name": fake.last_name()}, None),
+        (2, {"first_name": fake.first_name(), "last_name": fake.last_name()}, None),
+    ]
+
+    created, errors = await student_crud.import_students(rows)
+
+    assert created == 0
+    assert errors == [
+        {"row": 1, "detail": "UNIQUE constraint failed: student.email"},
+        {"row": 2, "detail": "UNIQUE constraint failed: student.email"},
+    ]
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_set_guardians_applies_the_difference(
+    test_app_with_db, anyio_backend, create_student
+):
+    guardians = [
+        await Guardian.create(
+            first_name=fake.first_name(), last_name=fake.last_name(), phone=fake.unique.msisdn()
+        )
+        for _ in range(3)
+    ]
+    first, second, third = [guardian.id for guardian in guardians]
+
+    assert await student_crud.set_guardians(create_student.id, [first, second, 0]) == (2, 0)
+    assert await student_crud.set_guardians(create_student.id, [second, third]) == (1, 1)
+    assert await student_crud.set_guardians(create_student.id, [first], replace=False) == (1, 0)
+    assert await student_crud.set_guardians(create_student.id, [second, third, first]) == (0, 0)
+
+    linked = await create_student.guardians.all().values_list("id", flat=True)
+    assert sorted(linked) == [first, second, third]
+
+    assert await student_crud.set_guardians(create_student.id, []) == (0, 3)
+    assert await create_student.guardians.all().count() == 0
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_repeated_scans_resolve_from_the_cache(test_app_with_db, anyio_backend, monkeypatch):
+    guardian = await Guardian.create(
+        first_name="Abena", last_name=fake.last_name(), phone=fake.unique.msisdn(), email=fake.unique.email()
+    )
+    student = await student_crud.post(
+        StudentCreate(first_name="Yaw", last_name="Asare", guardians=[guardian.id])
+    )
+
+    scan = await student_crud.resolve_scan(student.student_code)
+    assert scan["guardians"] == [{"email": guardian.email, "name": "Abena"}]
+
+    async def no_database(*args, **kwargs):
+        raise AssertionError("scan went to the database")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(student_crud, "scan_rows", no_database)
+        assert await student_crud.resolve_scan(student.student_code) is scan
+
+    await guardian_crud.put(guardian.id, GuardianUpdate(first_name="Ekua"))
+    assert (await student_crud.resolve_scan(student.student_code))["guardians"][0]["name"] == "Ekua"
+
+    await student_crud.put(student.id, StudentUpdate(guardians=[], replace_guardians=True))
+    assert (await student_crud.resolve_scan(student.student_code))["guardians"] == []
+
+    await student_crud.delete(student.id)
+    assert await student_crud.resolve_scan(student.student_code) is None
+    assert await student_crud.resolve_scan("unknown") is None
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_scans_are_applied_in_the_order_they_were_made(test_app_with_db, anyio_backend):
+    first, second = [
+        await student_crud.post(StudentCreate(first_name=fake.first_name(), last_name=fake.last_name()))
+        for _ in range(2)
+    ]
+    morning = datetime.datetime(2022, 3, 1, 7, 30)
+    afternoon = datetime.datetime(2022, 3, 1, 15, 0)
+    await student_crud.check_in(second.id, morning.date())
+
+    results = await student_crud.record_scans(
+        [
+            (first.id, "check-out", afternoon),
+            (first.id, "check-in", morning),
+            (first.id, "check-in", afternoon),
+            (second.id, "check-out", afternoon),
+            (second.id, "check-out", afternoon + datetime.timedelta(minutes=1)),
+            (second.id, "check-out", morning + datetime.timedelta(days=1)),
+        ]
+    )
+
+    assert results == [True, True, False, True, False, None]
+    attendance = await StudentAttendance.get(student_id=first.id, date=morning.date())
+    assert attendance.checkin_at.replace(tzinfo=None) == morning
+    assert attendance.checkout_at.replace(tzinfo=None) == afternoon
+    attendance = await StudentAttendance.get(student_id=second.id, date=morning.date())
+    assert attendance.checkout_at.replace(tzinfo=None) == afternoon
+    assert await student_crud.record_scans([]) == []
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_scans_racing_another_check_in_are_planned_again(test_app_with_db, anyio_backend, monkeypatch):
+    student = await student_crud.post(StudentCreate(first_name=fake.first_name(), last_name=fake.last_name()))
+    scanned_at = datetime.datetime(2022, 3, 2, 7, 30)
+    await student_crud.check_in(student.id, scanned_at.date())
+    attendance_rows = student_crud.attendance_rows
+
+    async def stale(*args):
+        # Read before the other check-in committed.
+        monkeypatch.setattr(student_crud, "attendance_rows", attendance_rows)
+        return {}
+
+    monkeypatch.setattr(student_crud, "attendance_rows", stale)
+
+    assert await student_crud.record_scans([(student.id, "check-in", scanned_at)]) == [False]
+    assert await StudentAttendance.filter(student_id=student.id).count() == 1
+
+    async def always_stale(*args):
+        return {}
+
+    monkeypatch.setattr(student_crud, "attendance_rows", always_stale)
+    with pytest.raises(IntegrityError):
+        await student_crud.record_scans([(student.id, "check-in", scanned_at)])
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_resolve_scans_reads_every_missing_code_at_once(test_app_with_db, anyio_backend):
+    guardian = await Guardian.create(
+        first_name="Esi", last_name=fake.last_name(), phone=fake.unique.msisdn(), email=fake.unique.email()
+    )
+    students = [
+        await student_crud.post(
+            StudentCreate(first_name=fake.first_name(), last_name=fake.last_name(), guardians=[guardian.id])
+        )
+        for _ in range(3)
+    ]
+    codes = [student.student_code for student in students]
+    await student_crud.resolve_scan(codes[0])
+
+    scans = await student_crud.resolve_scans(codes + ["unknown"])
+
+    assert sorted(scans) == sorted(codes)
+    for student in students:
+        assert scans[student.student_code]["id"] == student.id
+        assert scans[student.student_code]["guardians"] == [{"email": guardian.email, "name": "Esi"}]
+        assert scans[student.student_code]["guardian_ids"] == {guardian.id}
+    assert await student_crud.resolve_scans(["unknown"]) == {}
@@ -1,5 +1,10 @@
-import pytest, datetime
+import asyncio, pytest, datetime
+from faker import Faker
+
 from app.api.crud import teacher_crud
+from app.schemas.teacher import TeacherCreate, TeacherUpdate
+
+fake = Faker()
 
 
 @pytest.mark.parametrize("anyio_backend", ["asyncio"])
@@ -21,4 +26,31 @@ async def test_get_teacher_by_invalid_teacher_code(test_app_with_db, anyio_backe
     date = datetime.datetime.now().strftime("%Y-%m-%d")
     data = await teacher_crud.check_out(10000, date)
 
-    assert data == 0
+    assert data is None
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_parallel_creates_get_unique_codes(test_app_with_db, concurrent_db, anyio_backend):
+    teachers = await asyncio.gather(
+        *[
+            teacher_crud.post(
+                TeacherCreate(
+                    first_name=fake.first_name(),
+                    last_name=fake.last_name(),
+                    phone=fake.unique.msisdn(),
+                )
+            )
+            for _ in range(1000)
+        ]
+    )
+    numbers = {teacher.teacher_code.split("-")[1] for teacher in teachers}
+
+    assert len(numbers) == 1000
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_phone_changes_update_the_lookup_keys(test_app_with_db, anyio_backend, create_teacher):
+    number = fake.unique.numerify("2########")
+    await teacher_crud.put(create_teacher.id, TeacherUpdate(phone="+233 " + number))
+
+    assert (await teacher_crud.get_teacher_by_phone("0" + number)).id == create_teacher.id
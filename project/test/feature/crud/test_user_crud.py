@@ -0,0 +1,55 @@
+import datetime
+
+import pytest
+from faker import Faker
+
+from app.api.crud import user_crud
+from app.models.user import User
+from app.services.TokenVersionTable import TokenVersionTable
+from app.schemas.user import UserCreate, UserUpdate
+from app.utils import principal_cache
+
+fake = Faker()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_put_forgets_cached_principal(test_app_with_db, anyio_backend):
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password=fake.password())
+    )
+    principal_cache.set("token", user)
+
+    await user_crud.put(user.id, UserUpdate(name=fake.name()))
+
+    assert "token" not in principal_cache
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_delete_forgets_cached_principal(test_app_with_db, anyio_backend):
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password=fake.password())
+    )
+    principal_cache.set("token", user)
+
+    await user_crud.delete(user.id)
+
+    assert "token" not in principal_cache
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_token_versions_pick_up_changes_from_other_workers(
+    test_app_with_db, anyio_backend
+):
+    table = TokenVersionTable(staleness=0)
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password=fake.password())
+    )
+    assert await table.is_current(user.id, 0)
+
+    await User.filter(id=user.id).update(
+        token_version=1, updated_at=datetime.datetime.now()
+    )
+
+    assert not await table.is_current(user.id, 0)
+    assert await table.is_current(user.id, 1)
+    assert table.stats()["refreshes"] == 3
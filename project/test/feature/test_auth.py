@@ -1,4 +1,27 @@
+import hashlib
+import time
+
+import pytest
 from faker import Faker
+from fastapi import HTTPException
+from jose import jwt
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+
+from app import utils
+
+from app.api import auth
+from app.api.auth import get_current_user
+from app.api.crud import user_crud
+from app.config.app import settings
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+from app.schemas.user import UserCreate, UserUpdate
+from app.services.NotPwnedVerifier import build_index
+from app.services.RateLimiter import RateLimiter
+from app.services.RevocationFilter import RevocationFilter
+from app.services.RevocationList import RevocationList
+from app.utils import create_user_access_token, unknown_emails
 
 fake = Faker()
 
@@ -88,3 +111,453 @@ def test_unregister_user_cannot_login(test_app_with_db):
     )
     assert response.status_code == 401
     assert response.json() == {"errors": "Incorrect username or password"}
+
+
+def test_login_token_carries_user_claims(test_app_with_db):
+    email = fake.email()
+    name = fake.name()
+    test_app_with_db.post(
+        "/auth/register",
+        json={"name": name, "email": email, "password": "password"},
+    )
+
+    response = test_app_with_db.post(
+        "/auth/login",
+        json={"username": email, "password": "password"},
+    )
+    data = response.json()
+    claims = jwt.decode(
+        data["access_token"], settings.app_secret, algorithms=[settings.app_hash_algorithm]
+    )
+
+    assert claims["sub"] == email
+    assert claims["uid"] == data["user"]["id"]
+    assert claims["name"] == name
+    assert claims["ver"] == 0
+    assert claims["scopes"] == ["*"]
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_trusted_claims_are_revoked_by_password_change(
+    test_app_with_db, anyio_backend, monkeypatch
+):
+    monkeypatch.setattr(settings, "auth_trust_token_claims", True)
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password="password")
+    )
+    token = create_user_access_token(user)
+
+    principal = await get_current_user(token)
+    assert principal.id == user.id
+    assert principal.email == user.email
+
+    await user_crud.change_password(user.id, "new_password")
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_current_user(token)
+    assert exc_info.value.status_code == 401
+
+    principal = await get_current_user(
+        create_user_access_token(await user_crud.get(user.id))
+    )
+    assert principal.id == user.id
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_trusted_claims_are_revoked_by_delete(
+    test_app_with_db, anyio_backend, monkeypatch
+):
+    monkeypatch.setattr(settings, "auth_trust_token_claims", True)
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password="password")
+    )
+    token = create_user_access_token(user)
+    await user_crud.delete(user.id)
+
+    with pytest.raises(HTTPException):
+        await get_current_user(token)
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_database_validation_rejects_stale_token_version(
+    test_app_with_db, anyio_backend
+):
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password="password")
+    )
+    token = create_user_access_token(user)
+    assert (await get_current_user(token)).id == user.id
+
+    await user_crud.change_password(user.id, "new_password")
+
+    with pytest.raises(HTTPException):
+        await get_current_user(token)
+
+
+def register_user(test_app_with_db) -> dict:
+    response = test_app_with_db.post(
+        "/auth/register",
+        json={"name": fake.name(), "email": fake.email(), "password": "password"},
+    )
+
+    return response.json()
+
+
+def test_refresh_token_rotates(test_app_with_db):
+    tokens = register_user(test_app_with_db)
+
+    response = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["user"] == tokens["user"]
+    assert data["refresh_token"] != tokens["refresh_token"]
+    assert data["access_token"] != tokens["access_token"]
+
+    response = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+
+    assert response.status_code == 401
+
+
+def test_access_token_cannot_be_used_to_refresh(test_app_with_db):
+    tokens = register_user(test_app_with_db)
+
+    response = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["access_token"]}
+    )
+
+    assert response.status_code == 401
+
+
+def test_invalid_refresh_token_returns_401(test_app_with_db):
+    response = test_app_with_db.post("/auth/refresh", json={"refresh_token": "invalid"})
+
+    assert response.status_code == 401
+    assert response.json() == {"errors": "Invalid refresh token"}
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_refresh_is_rejected_after_password_change(test_app_with_db, anyio_backend):
+    tokens = register_user(test_app_with_db)
+    await user_crud.change_password(tokens["user"]["id"], "new_password")
+
+    response = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_logout_revokes_access_and_refresh_tokens(test_app_with_db, anyio_backend):
+    tokens = register_user(test_app_with_db)
+    assert (await get_current_user(tokens["access_token"])).id == tokens["user"]["id"]
+
+    response = test_app_with_db.post(
+        "/auth/logout",
+        json={"refresh_token": tokens["refresh_token"]},
+        headers={"Authorization": "Bearer {0}".format(tokens["access_token"])},
+    )
+    assert response.status_code == 200
+
+    with pytest.raises(HTTPException):
+        await get_current_user(tokens["access_token"])
+
+    response = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    assert response.status_code == 401
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_refresh_token_cannot_be_spent_again_on_another_worker(
+    test_app_with_db, anyio_backend, monkeypatch
+):
+    tokens = register_user(test_app_with_db)
+    other_worker = RevocationList(RevocationFilter(capacity=100), staleness=60)
+    await other_worker.refresh()
+
+    first = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+    monkeypatch.setattr(auth, "revoked_tokens", other_worker)
+    replay = test_app_with_db.post(
+        "/auth/refresh", json={"refresh_token": tokens["refresh_token"]}
+    )
+
+    assert first.status_code == 200
+    assert replay.status_code == 401
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_logout_is_seen_by_other_workers(test_app_with_db, anyio_backend, monkeypatch):
+    tokens = register_user(test_app_with_db)
+    other_worker = RevocationList(RevocationFilter(capacity=100), staleness=0)
+    assert (await get_current_user(tokens["access_token"])).id == tokens["user"]["id"]
+
+    test_app_with_db.post(
+        "/auth/logout",
+        json={},
+        headers={"Authorization": "Bearer {0}".format(tokens["access_token"])},
+    )
+    monkeypatch.setattr(auth, "revoked_tokens", other_worker)
+
+    with pytest.raises(HTTPException):
+        await get_current_user(tokens["access_token"])
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_revocations_of_expired_tokens_are_deleted(test_app_with_db, anyio_backend):
+    revocations = RevocationList(RevocationFilter(capacity=100), staleness=0)
+    await revocations.revoke("expired", time.time() - 1)
+    await revocations.revoke("live", time.time() + 60)
+
+    await revocations.refresh()
+
+    assert await RevokedToken.filter(jti__in=["expired", "live"]).values_list(
+        "jti", flat=True
+    ) == ["live"]
+
+    other_worker = RevocationList(RevocationFilter(capacity=100))
+    await other_worker.revoke("later", time.time() + 60)
+
+    assert await revocations.is_revoked("later")
+    assert revocations.stats()["refreshes"] == 2
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_refresh_token_is_not_an_access_token(test_app_with_db, anyio_backend):
+    tokens = register_user(test_app_with_db)
+
+    with pytest.raises(HTTPException):
+        await get_current_user(tokens["refresh_token"])
+
+
+def test_logout_without_tokens_returns_200(test_app_with_db):
+    response = test_app_with_db.post("/auth/logout", json={})
+
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_changing_the_password_replaces_every_token(test_app_with_db, anyio_backend):
+    tokens = register_user(test_app_with_db)
+    headers = {"Authorization": "Bearer " + tokens["access_token"]}
+
+    response = test_app_with_db.post(
+        "/auth/password",
+        json={"current_password": "password", "new_password": "new_password"},
+        headers=headers,
+    )
+
+    assert response.status_code == 200
+    for token in (tokens["access_token"], tokens["refresh_token"]):
+        with pytest.raises(HTTPException):
+            await get_current_user(token)
+    assert (await get_current_user(response.json()["access_token"])).id == tokens["user"]["id"]
+    refreshed = test_app_with_db.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert refreshed.status_code == 401
+    login = test_app_with_db.post(
+        "/auth/login", json={"username": tokens["user"]["email"], "password": "new_password"}
+    )
+    assert login.status_code == 200
+
+
+@pytest.mark.parametrize("authorization", [None, "Basic abc", "Bearer nonsense"])
+def test_changing_the_password_needs_an_access_token(test_app_with_db, authorization):
+    response = test_app_with_db.post(
+        "/auth/password",
+        json={"current_password": "password", "new_password": "new_password"},
+        headers={"Authorization": authorization} if authorization else {},
+    )
+
+    assert response.status_code == 401
+
+
+def test_changing_the_password_needs_the_current_password(test_app_with_db):
+    tokens = register_user(test_app_with_db)
+
+    response = test_app_with_db.post(
+        "/auth/password",
+        json={"current_password": "wrong", "new_password": "new_password"},
+        headers={"Authorization": "Bearer " + tokens["access_token"]},
+    )
+
+    assert response.status_code == 401
+    assert response.json()["errors"] == "Incorrect password"
+
+
+def test_repeated_failed_logins_are_throttled(test_app_with_db, monkeypatch):
+    monkeypatch.setattr(
+        auth, "email_login_limiter", RateLimiter(capacity=2, rate=0.001)
+    )
+    email = fake.email()
+
+    for _ in range(2):
+        response = test_app_with_db.post(
+            "/auth/login", json={"username": email, "password": "password"}
+        )
+        assert response.status_code == 401
+
+    response = test_app_with_db.post(
+        "/auth/login", json={"username": email.upper(), "password": "password"}
+    )
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_logins_from_one_client_are_throttled(test_app_with_db, monkeypatch):
+    monkeypatch.setattr(auth, "ip_login_limiter", RateLimiter(capacity=1, rate=0.001))
+
+    response = test_app_with_db.post(
+        "/auth/login", json={"username": fake.email(), "password": "password"}
+    )
+    assert response.status_code == 401
+
+    response = test_app_with_db.post(
+        "/auth/login", json={"username": fake.email(), "password": "password"}
+    )
+    assert response.status_code == 429
+
+
+@pytest.mark.parametrize("proxies", ["testclient", "*"])
+def test_logins_behind_a_trusted_proxy_are_throttled_per_forwarded_client(
+    test_app_with_db, monkeypatch, proxies
+):
+    monkeypatch.setattr(auth, "ip_login_limiter", RateLimiter(capacity=1, rate=0.001))
+    monkeypatch.setattr(settings, "trusted_proxies", proxies)
+
+    def login(forwarded_for):
+        return test_app_with_db.post(
+            "/auth/login",
+            json={"username": fake.email(), "password": "password"},
+            headers={"X-Forwarded-For": forwarded_for},
+        ).status_code
+
+    assert login("198.51.100.7, 203.0.113.1") == 401
+    assert login("203.0.113.2") == 401
+    assert login("198.51.100.8, 203.0.113.1") == 429
+
+
+def test_forwarded_addresses_from_untrusted_clients_are_ignored(test_app_with_db, monkeypatch):
+    monkeypatch.setattr(auth, "ip_login_limiter", RateLimiter(capacity=1, rate=0.001))
+
+    for forwarded_for, expected in (("203.0.113.1", 401), ("203.0.113.2", 429)):
+        response = test_app_with_db.post(
+            "/auth/login",
+            json={"username": fake.email(), "password": "password"},
+            headers={"X-Forwarded-For": forwarded_for},
+        )
+        assert response.status_code == expected
+
+
+def test_breached_password_cannot_register(test_app_with_db, tmp_path, monkeypatch):
+    dump = tmp_path / "pwned.txt"
+    dump.write_text(
+        "{0}:3861493\n".format(hashlib.sha1(b"password").hexdigest().upper())
+    )
+    build_index(str(dump), str(tmp_path / "pwned.idx"))
+    monkeypatch.setattr(settings, "pwned_passwords_index", str(tmp_path / "pwned.idx"))
+
+    response = test_app_with_db.post(
+        "/auth/register",
+        json={"name": fake.name(), "email": fake.email(), "password": "password"},
+    )
+    assert response.status_code == 422
+
+    response = test_app_with_db.post(
+        "/auth/register",
+        json={"name": fake.name(), "email": fake.email(), "password": fake.password()},
+    )
+    assert response.status_code == 201
+
+
+def test_breached_password_is_rejected_through_range_api(test_app_with_db, monkeypatch):
+    async def count_breaches(password):
+        return 3861493 if password == "password" else 0
+
+    monkeypatch.setattr(auth, "count_breaches", count_breaches)
+
+    response = test_app_with_db.post(
+        "/users/",
+        json={"name": fake.name(), "email": fake.email(), "password": "password"},
+    )
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_login_rehashes_passwords_outside_policy(
+    test_app_with_db, anyio_backend, monkeypatch
+):
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    context.update(bcrypt__default_rounds=5, bcrypt__min_rounds=5, bcrypt__max_rounds=6)
+    monkeypatch.setattr(utils, "pwd_context", context)
+    email = fake.email()
+    user = await User.create(
+        name=fake.name(), email=email, password=bcrypt.using(rounds=4).hash("password")
+    )
+
+    response = test_app_with_db.post(
+        "/auth/login", json={"username": email, "password": "password"}
+    )
+    assert response.status_code == 200
+
+    user = await User.get(id=user.id)
+    assert context.identify(user.password) == "bcrypt"
+    assert not context.needs_update(user.password)
+    assert context.verify("password", user.password)
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_rehash_does_not_overwrite_a_changed_password(test_app_with_db, anyio_backend):
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password="password")
+    )
+    stale_hash = user.password
+    await user_crud.change_password(user.id, "new_password")
+
+    assert await user_crud.rehash_password(user.id, "password", stale_hash) == 0
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_unknown_emails_are_negatively_cached(test_app_with_db, anyio_backend):
+    email = fake.email()
+    dummy_verifies = auth.unknown_account_stats["dummy_verifies"]
+
+    assert not await auth.authenticate_user(email, "password")
+    hits = unknown_emails.hits
+    assert not await auth.authenticate_user(email, "password")
+
+    assert unknown_emails.hits == hits + 1
+    assert auth.unknown_account_stats["dummy_verifies"] == dummy_verifies + 2
+
+    await user_crud.post(UserCreate(name=fake.name(), email=email, password="password"))
+
+    assert await auth.authenticate_user(email, "password")
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_dummy_verify_can_be_disabled(test_app_with_db, anyio_backend, monkeypatch):
+    monkeypatch.setattr(settings, "auth_dummy_verify", False)
+    dummy_verifies = auth.unknown_account_stats["dummy_verifies"]
+
+    assert not await auth.authenticate_user(fake.email(), "password")
+    assert auth.unknown_account_stats["dummy_verifies"] == dummy_verifies
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_email_change_clears_negative_cache(test_app_with_db, anyio_backend):
+    email = fake.email()
+    assert not await auth.authenticate_user(email, "password")
+    user = await user_crud.post(
+        UserCreate(name=fake.name(), email=fake.email(), password="password")
+    )
+
+    await user_crud.put(user.id, UserUpdate(email=email))
+
+    assert await auth.authenticate_user(email, "password")
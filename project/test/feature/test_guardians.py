@@ -1,8 +1,10 @@
-import pytest
+import datetime, json, pytest
 from typing import List
 
 from faker import Faker
 
+from app.providers.PaginationProvider import encode_cursor
+
 
 fake = Faker(["tw_GH"])
 
@@ -50,6 +52,38 @@ def test_post_request_with_proper_body_returns_201(test_app_with_db):
     assert data["first_name"] == first_name
 
 
+def test_get_guardians_is_paginated(test_app_with_db):
+    response = test_app_with_db.get("/guardians/?limit=1&include_total=true")
+    rows = response.json()
+
+    assert len(rows) == 1
+    assert int(response.headers["X-Total-Count"]) >= 1
+
+
+def test_get_guardians_with_fields_returns_only_those_fields(test_app_with_db):
+    response = test_app_with_db.get("/guardians/?limit=1&fields=phone")
+    rows = response.json()
+
+    assert response.status_code == 200
+    assert [list(row) for row in rows] == [["id", "phone"]]
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_projected_fields_are_encoded_like_full_rows(
+    test_app_with_db, anyio_backend, create_guardian
+):
+    create_guardian.identification_document_expiry = datetime.datetime(2030, 1, 31, 9, 15)
+    await create_guardian.save()
+    cursor = encode_cursor(create_guardian.id - 1)
+
+    [full] = test_app_with_db.get("/guardians/?limit=1&cursor=" + cursor).json()
+    [projected] = test_app_with_db.get(
+        "/guardians/?limit=1&fields=identification_document_expiry&cursor=" + cursor
+    ).json()
+
+    assert projected["identification_document_expiry"] == full["identification_document_expiry"] == "2030-01-31"
+
+
 def test_get_returns_all_guardians(test_app_with_db):
     response = test_app_with_db.get("/guardians/")
 
@@ -57,6 +91,22 @@ def test_get_returns_all_guardians(test_app_with_db):
     assert isinstance(response.json(), List)
 
 
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_export_streams_guardians_as_ndjson(
+    test_app_with_db, anyio_backend, create_guardian
+):
+    create_guardian.identification_document_expiry = datetime.datetime(2030, 1, 31)
+    await create_guardian.save()
+
+    response = test_app_with_db.get("/guardians/export")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    guardian = next(row for row in rows if row["id"] == create_guardian.id)
+
+    assert response.status_code == 200
+    assert guardian["phone"] == create_guardian.phone
+    assert guardian["identification_document_expiry"] == "2030-01-31"
+
+
 def test_get_request_with_guardian_phone_returns_not_found(test_app_with_db):
     response = test_app_with_db.get(
         "/guardians/?phone={phone}".format(phone=fake.phone_number())
@@ -0,0 +1,166 @@
+import pytest
+from faker import Faker
+
+from app.api.crud import student_crud
+from app.middleware.IdempotencyMiddleware import IdempotencyMiddleware, _digest
+from app.models.idempotency_key import IdempotencyKey
+from app.models.student import Student
+from app.models.student_attendance import StudentAttendance
+from app.services.IdempotencyStore import DatabaseIdempotencyStore, IdempotencyStore
+
+fake = Faker()
+
+
+@pytest.fixture(params=["memory", "database"])
+def store(request, test_app_with_db, monkeypatch):
+    store = IdempotencyStore() if request.param == "memory" else DatabaseIdempotencyStore()
+    layer = test_app_with_db.app.middleware_stack
+    while not isinstance(layer, IdempotencyMiddleware):
+        layer = layer.app
+    monkeypatch.setattr(layer, "store", store)
+
+    return store
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_retried_check_in_replays_the_first_response(
+    test_app_with_db, store, create_student, anyio_backend
+):
+    path = "students/{0}/check-in".format(create_student.student_code)
+    headers = {"Idempotency-Key": fake.uuid4()}
+
+    first = test_app_with_db.post(path, headers=headers)
+    retry = test_app_with_db.post(path, headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.json() == first.json()
+    assert retry.headers["idempotent-replayed"] == "true"
+    assert "idempotent-replayed" not in first.headers
+    assert await StudentAttendance.filter(student_id=create_student.id).count() == 1
+    assert store.stats()["replays"] == 1
+
+    response = test_app_with_db.post(path, headers={"Idempotency-Key": fake.uuid4()})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_retried_create_makes_one_student(test_app_with_db, store, anyio_backend):
+    payload = {"first_name": fake.first_name(), "last_name": fake.unique.last_name()}
+    headers = {"Idempotency-Key": fake.uuid4()}
+
+    first = test_app_with_db.post("students/", json=payload, headers=headers)
+    retry = test_app_with_db.post("students/", json=payload, headers=headers)
+
+    assert first.status_code == retry.status_code == 201
+    id = first.json()["student"]["id"]
+    assert retry.json()["student"]["id"] == id
+    assert (await Student.get(id=id)).last_name == payload["last_name"]
+    # Nothing was created after the first attempt.
+    assert not await Student.filter(id__gt=id).exists()
+
+
+def test_key_reused_for_a_different_request_returns_422(test_app_with_db, store):
+    headers = {"Idempotency-Key": fake.uuid4()}
+    test_app_with_db.post(
+        "guardians/", json={"first_name": "Ama", "last_name": "Owusu", "phone": fake.msisdn()}, headers=headers
+    )
+
+    response = test_app_with_db.post(
+        "guardians/", json={"first_name": "Ama", "last_name": "Owusu", "phone": fake.msisdn()}, headers=headers
+    )
+
+    assert response.status_code == 422
+    assert response.json()["errors"] == "Idempotency-Key was already used for a different request"
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_retry_while_the_first_attempt_runs_returns_409(
+    test_app_with_db, store, create_student, anyio_backend
+):
+    key = fake.uuid4()
+    path = "/students/{0}/check-in".format(create_student.student_code)
+    await store.begin(_digest("", key), _digest("POST", path, "", b""))
+
+    response = test_app_with_db.post(path, headers={"Idempotency-Key": key})
+
+    assert response.status_code == 409
+    assert not await StudentAttendance.filter(student_id=create_student.id).exists()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_failed_requests_are_not_stored(
+    test_app_with_db, store, create_student, anyio_backend, monkeypatch
+):
+    path = "students/{0}/check-in".format(create_student.student_code)
+    headers = {"Idempotency-Key": fake.uuid4()}
+
+    async def unavailable(*args):
+        raise ConnectionError("database unavailable")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(student_crud, "check_in", unavailable)
+        with pytest.raises(ConnectionError):
+            test_app_with_db.post(path, headers=headers)
+
+    response = test_app_with_db.post(path, headers=headers)
+
+    assert response.status_code == 200
+    assert "idempotent-replayed" not in response.headers
+
+
+def test_server_error_responses_are_not_stored(test_app_with_db, store, monkeypatch):
+    path = "students/{0}/check-in".format(fake.uuid4())
+    headers = {"Idempotency-Key": fake.uuid4()}
+
+    async def overloaded(scope, receive, send):
+        await send({"type": "http.response.start", "status": 503, "headers": []})
+        await send({"type": "http.response.body", "body": b"busy"})
+
+    layer = test_app_with_db.app.middleware_stack
+    while not isinstance(layer, IdempotencyMiddleware):
+        layer = layer.app
+    with monkeypatch.context() as patch:
+        patch.setattr(layer, "app", overloaded)
+        assert test_app_with_db.post(path, headers=headers).status_code == 503
+
+    assert test_app_with_db.post(path, headers=headers).status_code == 404
+
+
+@pytest.mark.parametrize("key", ["", "k" * 256])
+def test_invalid_keys_return_400(test_app_with_db, key):
+    response = test_app_with_db.post("students/scans", json={"events": []}, headers={"Idempotency-Key": key})
+
+    assert response.status_code == 400
+
+
+def test_keys_are_scoped_to_the_caller(test_app_with_db, store):
+    payload = {"first_name": fake.first_name(), "last_name": fake.unique.last_name(), "phone": fake.msisdn()}
+    key = fake.uuid4()
+
+    first = test_app_with_db.post("teachers/", json=payload, headers={"Idempotency-Key": key})
+    other = test_app_with_db.post(
+        "teachers/", json=payload, headers={"Idempotency-Key": key, "Authorization": "Bearer other"}
+    )
+
+    assert first.status_code == 201
+    assert "idempotent-replayed" not in other.headers
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_database_store_drops_expired_keys(test_app_with_db, anyio_backend, monkeypatch):
+    store = DatabaseIdempotencyStore(ttl=0)
+    key = fake.uuid4()
+    assert await store.begin(key, "a") is None
+    assert await store.begin(key, "b") is None
+    assert await IdempotencyKey.filter(key=key).values_list("fingerprint", flat=True) == ["b"]
+
+    store = DatabaseIdempotencyStore(ttl=60)
+    key = fake.uuid4()
+    assert await store.begin(key, "a") is None
+    get_or_none = IdempotencyKey.get_or_none
+
+    async def discarded_once(**kwargs):
+        monkeypatch.setattr(IdempotencyKey, "get_or_none", get_or_none)
+
+    monkeypatch.setattr(IdempotencyKey, "get_or_none", discarded_once)
+    assert await store.begin(key, "a") == {"fingerprint": "a", "response": None}
@@ -1,3 +1,7 @@
+from app.config.app import Settings, get_settings
+from test.conftest import get_settings_override
+
+
 def test_root(test_app):
     response = test_app.get("/")
     assert response.status_code == 200
@@ -11,3 +15,19 @@ def test_ping(test_app):
         "ping": "pong!",
         "testing": True,
     }
+
+
+def test_metrics_are_hidden_by_default(test_app):
+    response = test_app.get("/metrics")
+    assert response.status_code == 404
+
+
+def test_metrics(test_app):
+    test_app.app.dependency_overrides[get_settings] = lambda: Settings(
+        metrics_enabled=True
+    )
+    response = test_app.get("/metrics")
+    test_app.app.dependency_overrides[get_settings] = get_settings_override
+
+    assert response.status_code == 200
+    assert "principal_cache" in response.json()
@@ -0,0 +1,86 @@
+import uuid
+
+import pytest
+from faker import Faker
+
+from app.api.crud import search_crud
+from app.models.student import Student
+
+fake = Faker()
+
+
+def test_search_finds_created_students_and_guardians(test_app_with_db):
+    last_name = "Quaicoe" + uuid.uuid4().hex
+    student = test_app_with_db.post(
+        "/students/", json={"first_name": "Esi", "last_name": last_name}
+    ).json()["student"]
+    guardian = test_app_with_db.post(
+        "/guardians/",
+        json={"first_name": "Kojo", "last_name": last_name, "phone": fake.unique.msisdn()},
+    ).json()
+
+    # A prefix of the name, still unique to this test.
+    response = test_app_with_db.get("/search/?q={0}".format(last_name[:15]))
+    results = {(result["type"], result["id"]): result for result in response.json()["results"]}
+
+    assert response.status_code == 200
+    assert results[("student", student["id"])]["student_code"] == student["student_code"]
+    assert results[("guardian", guardian["id"])]["name"] == "Kojo " + last_name
+
+    response = test_app_with_db.get("/search/?q=esi {0}&type=student".format(last_name))
+
+    assert [result["id"] for result in response.json()["results"]] == [student["id"]]
+
+
+def test_search_follows_updates_and_deletes(test_app_with_db):
+    first_name = "Nyamekye" + uuid.uuid4().hex
+    renamed = "Dzifa" + uuid.uuid4().hex
+    student = test_app_with_db.post(
+        "/students/", json={"first_name": first_name, "last_name": fake.last_name()}
+    ).json()["student"]
+    guardian = test_app_with_db.post(
+        "/guardians/",
+        json={"first_name": first_name, "last_name": fake.last_name(), "phone": fake.unique.msisdn()},
+    ).json()
+
+    test_app_with_db.put("/students/{0}".format(student["id"]), json={"first_name": renamed})
+    test_app_with_db.delete("/guardians/{0}".format(guardian["id"]))
+
+    assert test_app_with_db.get("/search/?q=" + first_name).json()["results"] == []
+    results = test_app_with_db.get("/search/?q=" + renamed).json()["results"]
+    assert [result["id"] for result in results] == [student["id"]]
+
+    test_app_with_db.delete("/students/{0}".format(student["id"]))
+    assert test_app_with_db.get("/search/?q=" + renamed).json()["results"] == []
+
+    test_app_with_db.put("/students/restore/{0}".format(student["id"]))
+    assert len(test_app_with_db.get("/search/?q=" + renamed).json()["results"]) == 1
+
+
+def test_search_requires_a_query(test_app_with_db):
+    assert test_app_with_db.get("/search/").status_code == 422
+    assert test_app_with_db.get("/search/?q=a&type=teacher").status_code == 422
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_rebuild_indexes_existing_rows_and_keeps_concurrent_changes(
+    test_app_with_db, anyio_backend, monkeypatch
+):
+    name = "Ofori" + uuid.uuid4().hex
+    student = await Student.create(first_name=name, last_name=fake.last_name())
+    imported = {"id": 10 ** 9, "student_code": None, "first_name": name, "other_names": None, "last_name": "Late"}
+    chunked = search_crud.chunked
+
+    def chunked_with_a_write(*args, **kwargs):
+        # A write that lands while the rebuild is reading the tables.
+        search_crud.index_students([imported])
+        return chunked(*args, **kwargs)
+
+    monkeypatch.setattr(search_crud, "chunked", chunked_with_a_write)
+    await search_crud.rebuild(chunk_size=2)
+
+    results = await search_crud.search(name, kind="student")
+
+    assert search_crud.ready
+    assert {result["id"] for result in results} == {student.id, imported["id"]}
+    search_crud.forget_student(imported["id"])
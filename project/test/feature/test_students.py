@@ -1,7 +1,16 @@
-import pytest
+import csv, datetime, io, json, pytest
 from typing import List
 
 from faker import Faker
+from fastapi_mail import FastMail
+from tortoise.exceptions import IntegrityError
+
+from app.api.crud import student_crud
+from app.config.app import Settings, get_settings, settings
+from app.models.student import Student
+from app.models.student_attendance import StudentAttendance
+from app.providers.PaginationProvider import encode_cursor
+from test.conftest import get_settings_override
 
 
 fake = Faker()
@@ -51,6 +60,133 @@ def test_get_returns_all_students(test_app_with_db):
     assert isinstance(response.json(), object)
 
 
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_get_pages_through_students_with_a_cursor(
+    test_app_with_db, anyio_backend, create_student
+):
+    await Student.create(first_name=fake.first_name(), last_name=fake.last_name())
+
+    first = test_app_with_db.get("/students/?limit=1&include_total=true")
+    second = test_app_with_db.get(
+        "/students/?limit=1&cursor={0}".format(first.headers["X-Next-Cursor"])
+    )
+    ids = [student["id"] for student in first.json()["students"] + second.json()["students"]]
+
+    assert first.headers["X-Total-Count"] == str(await Student.filter(deleted_at=None).count())
+    assert "X-Total-Count" not in second.headers
+    assert ids == sorted(set(ids))
+    assert len(ids) == 2
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_get_last_page_of_students_has_no_next_cursor(
+    test_app_with_db, anyio_backend, create_student
+):
+    cursor = encode_cursor(create_student.id - 1)
+
+    response = test_app_with_db.get("/students/?limit=1000&cursor={0}".format(cursor))
+
+    assert response.json()["students"][0]["id"] == create_student.id
+    assert "X-Next-Cursor" not in response.headers
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_get_without_limit_or_cursor_returns_every_student(
+    test_app_with_db, anyio_backend, create_student, monkeypatch
+):
+    monkeypatch.setattr(settings, "page_size", 1)
+    await Student.create(first_name=fake.first_name(), last_name=fake.last_name())
+
+    response = test_app_with_db.get("/students/")
+    following = test_app_with_db.get("/students/?cursor={0}".format(encode_cursor(create_student.id - 1)))
+
+    assert len(response.json()["students"]) == await Student.filter(deleted_at=None).count()
+    assert "X-Next-Cursor" not in response.headers
+    assert len(following.json()["students"]) == 1
+    assert "X-Next-Cursor" in following.headers
+
+
+@pytest.mark.parametrize("cursor", ["nonsense", encode_cursor("1"), "e30"])
+def test_get_students_with_invalid_cursor_returns_400(test_app_with_db, cursor):
+    response = test_app_with_db.get("/students/?cursor={0}".format(cursor))
+
+    assert response.status_code == 400
+    assert response.json() == {"errors": "Invalid cursor"}
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_export_streams_students_as_ndjson_in_chunks(
+    test_app_with_db, anyio_backend, create_student
+):
+    await Student.create(first_name=fake.first_name(), last_name=fake.last_name())
+    test_app_with_db.app.dependency_overrides[get_settings] = lambda: Settings(
+        export_chunk_size=1
+    )
+
+    response = test_app_with_db.get("/students/export")
+    test_app_with_db.app.dependency_overrides[get_settings] = get_settings_override
+    rows = [json.loads(line) for line in response.text.splitlines()]
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(rows) == await Student.filter(deleted_at=None).count()
+    assert [row["id"] for row in rows] == sorted(row["id"] for row in rows)
+    assert {"id": create_student.id, "student_code": create_student.student_code} == {
+        key: value
+        for key, value in next(row for row in rows if row["id"] == create_student.id).items()
+        if key in ("id", "student_code")
+    }
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_export_streams_students_as_csv(
+    test_app_with_db, anyio_backend, create_student
+):
+    response = test_app_with_db.get("/students/export?format=csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+
+    assert response.headers["content-type"].startswith("text/csv")
+    assert 'filename="students.csv"' in response.headers["content-disposition"]
+    assert list(rows[0]) == student_crud.EXPORT_FIELDS
+    assert str(create_student.id) in [row["id"] for row in rows]
+
+
+def test_export_rejects_unknown_formats(test_app_with_db):
+    response = test_app_with_db.get("/students/export?format=xml")
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_get_students_with_fields_returns_only_those_fields(
+    test_app_with_db, anyio_backend, create_student
+):
+    await Student.create(first_name=fake.first_name(), last_name=fake.last_name())
+
+    response = test_app_with_db.get("/students/?limit=1&fields=student_code, first_name")
+    following = test_app_with_db.get(
+        "/students/?limit=1&fields=first_name&cursor={0}".format(
+            response.headers["X-Next-Cursor"]
+        )
+    )
+
+    assert response.status_code == 200
+    assert list(response.json()["students"][0]) == ["id", "student_code", "first_name"]
+    assert following.json()["students"][0]["id"] > response.json()["students"][0]["id"]
+
+
+def test_get_students_with_unknown_fields_returns_400(test_app_with_db):
+    response = test_app_with_db.get("/students/?fields=first_name,deleted_at,password")
+
+    assert response.status_code == 400
+    assert response.json() == {"errors": "Unknown fields: deleted_at, password"}
+
+
+def test_get_students_rejects_oversized_pages(test_app_with_db):
+    response = test_app_with_db.get("/students/?limit=100000")
+
+    assert response.status_code == 422
+
+
 def test_get_request_with_student_student_code_returns_not_found(test_app_with_db):
     response = test_app_with_db.get(
         "/students/?student_code={student_code}".format(
@@ -132,6 +268,31 @@ async def test_put_request_with_invalid_guardians_does_not_creates_student_guard
         assert guardian.id != 4000
 
 
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_put_request_can_replace_guardians(
+    test_app_with_db, anyio_backend, create_student, create_guardian
+):
+    student = create_student
+    url = "/students/{id}".format(id=student.id)
+    test_app_with_db.put(url, json={"guardians": [create_guardian.id]})
+
+    response = test_app_with_db.put(url, json={"guardians": [], "replace_guardians": True})
+    guardians = test_app_with_db.get(
+        "/students/{0}/guardians".format(student.student_code)
+    ).json()["guardians"]
+
+    assert response.status_code == 200
+    assert guardians == []
+
+
+def test_put_request_replacing_guardians_of_missing_student_returns_404(test_app_with_db):
+    response = test_app_with_db.put(
+        "/students/0", json={"guardians": [], "replace_guardians": True}
+    )
+
+    assert response.status_code == 404
+
+
 @pytest.mark.parametrize("anyio_backend", ["asyncio"])
 async def test_get_request_with_id_returns_student(
     anyio_backend, create_student, test_app_with_db
@@ -316,6 +477,101 @@ async def test_existing_student_cannot_check_out_if_he_has_not_checked_in(
     assert data["errors"] == "Student has not checked in"
 
 
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_scans_are_recorded_in_one_batch(
+    test_app_with_db, create_student, create_guardian, anyio_backend
+):
+    student = create_student
+    await student.guardians.add(create_guardian)
+    code = student.student_code
+    events = [
+        {"code": code, "action": "check-out", "scanned_at": "2022-03-01T15:00:00"},
+        {"code": code, "action": "check-in", "scanned_at": "2022-03-01T07:30:00"},
+        {"code": code, "action": "check-in", "scanned_at": "2022-03-01T07:31:00"},
+        {"code": code, "action": "check-out", "scanned_at": "2022-03-01T15:01:00"},
+        {"code": code, "action": "check-out", "scanned_at": "2022-03-02T15:00:00"},
+        {"code": "unknown", "action": "check-in", "scanned_at": "2022-03-01T07:30:00"},
+    ]
+
+    with FastMail(get_settings_override().email_configuration).record_messages() as outbox:
+        response = test_app_with_db.post("students/scans", json={"events": events})
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == [
+        "checked_out",
+        "checked_in",
+        "already_checked_in",
+        "already_checked_out",
+        "not_checked_in",
+        "not_found",
+    ]
+    assert results[1]["detail"] == student.fullname() + " check in successful"
+    assert results[4]["detail"] == "Student has not checked in"
+    assert [message["To"] for message in outbox] == [create_guardian.email] * 2
+
+    response = test_app_with_db.get("students/{0}/attendance".format(code))
+    attendance = response.json()["attendance"]
+    assert len(attendance) == 1
+    assert attendance[0]["checkin_at"].startswith("2022-03-01T07:30")
+    assert attendance[0]["checkout_at"].startswith("2022-03-01T15:00")
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_scans_with_and_without_timezones_are_ordered_together(
+    test_app_with_db, create_student, anyio_backend
+):
+    code = create_student.student_code
+    events = [
+        {"code": code, "action": "check-out", "scanned_at": "2022-03-03T15:00:00"},
+        {"code": code, "action": "check-in", "scanned_at": "2022-03-03T09:30:00+02:00"},
+    ]
+
+    response = test_app_with_db.post("students/scans", json={"events": events})
+
+    assert response.status_code == 200
+    assert [result["status"] for result in response.json()["results"]] == ["checked_out", "checked_in"]
+    attendance = await StudentAttendance.get(student_id=create_student.id, date=datetime.date(2022, 3, 3))
+    assert attendance.checkin_at == datetime.datetime(2022, 3, 3, 7, 30, tzinfo=datetime.timezone.utc)
+    assert attendance.checkout_at == datetime.datetime(2022, 3, 3, 15, 0, tzinfo=datetime.timezone.utc)
+
+
+def test_oversized_scan_batches_return_400(test_app_with_db):
+    settings = get_settings_override()
+    events = [
+        {"code": "unknown", "action": "check-in", "scanned_at": "2022-03-01T07:30:00"}
+    ] * (settings.scan_batch_max_events + 1)
+
+    response = test_app_with_db.post("students/scans", json={"events": events})
+
+    assert response.status_code == 400
+
+
+def test_scans_with_unknown_actions_return_422(test_app_with_db):
+    events = [{"code": "unknown", "action": "wave", "scanned_at": "2022-03-01T07:30:00"}]
+
+    response = test_app_with_db.post("students/scans", json={"events": events})
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_scans_recorded_concurrently_return_409(
+    test_app_with_db, create_student, anyio_backend, monkeypatch
+):
+    async def conflict(scans):
+        raise IntegrityError("duplicate key value violates unique constraint")
+
+    monkeypatch.setattr(student_crud, "record_scans", conflict)
+    events = [
+        {"code": create_student.student_code, "action": "check-in", "scanned_at": "2022-03-01T07:30:00"}
+    ]
+
+    response = test_app_with_db.post("students/scans", json={"events": events})
+
+    assert response.status_code == 409
+
+
 @pytest.mark.parametrize("anyio_backend", ["asyncio"])
 async def test_get_existing_student_qr_code_returns_200(
     test_app_with_db, create_student, anyio_backend
@@ -456,3 +712,130 @@ async def test_welcome_student_without_guardians_returns_200(test_app_with_db, c
     response = test_app_with_db.post("students/{student_code}/welcome".format(student_code=create_student.student_code))
     
     assert response.status_code == 200
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_import_csv_creates_students_and_reports_bad_rows(
+    test_app_with_db, create_student, create_guardian, anyio_backend
+):
+    emails = [fake.unique.email() for _ in range(3)]
+    rows = [
+        "first_name,last_name,email,guardians",
+        "{0},{1},{2},{3}".format(fake.first_name(), fake.last_name(), emails[0], create_guardian.id),
+        "{0},{1},{2},".format(fake.first_name(), fake.last_name(), emails[1]),
+        ",{0},{1},".format(fake.last_name(), emails[2]),
+        "{0},{1},{2},".format(fake.first_name(), fake.last_name(), emails[1]),
+        "{0},{1},,0".format(fake.first_name(), fake.last_name()),
+    ]
+
+    response = test_app_with_db.post(
+        "/students/import",
+        files={"file": ("students.csv", "\n".join(rows), "text/csv")},
+    )
+    data = response.json()
+
+    assert response.status_code == 200
+    assert data["created"] == 2
+    assert data["failed"] == 3
+    assert [error["row"] for error in data["errors"]] == [3, 4, 5]
+    assert data["errors"][1]["detail"] == "Email has already been taken"
+    assert data["errors"][2]["detail"] == "Unknown guardians: 0"
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_import_ndjson_links_guardians(
+    test_app_with_db, create_guardian, anyio_backend
+):
+    email = fake.unique.email()
+    lines = [
+        json.dumps(
+            {
+                "first_name": fake.first_name(),
+                "last_name": fake.last_name(),
+                "email": email,
+                "guardians": [create_guardian.id],
+            }
+        ),
+        "",
+        "{not json",
+        "[1, 2]",
+    ]
+
+    response = test_app_with_db.post(
+        "/students/import",
+        files={"file": ("students.ndjson", "\n".join(lines), "application/x-ndjson")},
+    )
+    data = response.json()
+
+    assert data["created"] == 1
+    assert data["failed"] == 2
+    assert data["errors"][0]["detail"].startswith("Invalid JSON")
+    assert data["errors"][1] == {"row": 3, "detail": "Expected a JSON object"}
+
+    student = await Student.get(email=email)
+    guardians = test_app_with_db.get(
+        "/students/{0}/guardians".format(student.student_code)
+    ).json()["guardians"]
+
+    assert [guardian["id"] for guardian in guardians] == [create_guardian.id]
+
+
+def test_import_reports_rows_with_extra_columns(test_app_with_db):
+    rows = [
+        "first_name,last_name",
+        "{0},{1},unexpected".format(fake.first_name(), fake.last_name()),
+        "{0},{1}".format(fake.first_name(), fake.last_name()),
+    ]
+
+    response = test_app_with_db.post(
+        "/students/import",
+        files={"file": ("students.csv", "\n".join(rows), "text/csv")},
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "created": 1,
+        "failed": 1,
+        "errors": [{"row": 1, "detail": "Expected 2 columns, found 3"}],
+    }
+
+
+@pytest.mark.parametrize("format", ["csv", "ndjson"])
+def test_import_reports_where_a_file_stops_being_utf8(test_app_with_db, format):
+    first, second = (
+        {"first_name": fake.first_name(), "last_name": fake.last_name()} for _ in range(2)
+    )
+    if format == "csv":
+        lines = ["first_name,last_name", "{first_name},{last_name}".format(**first)]
+    else:
+        lines = [json.dumps(first)]
+    # The second student's last name is Latin-1, not UTF-8.
+    bad = "{first_name},{last_name}\u00e9" if format == "csv" else '{{"first_name": "{first_name}", "last_name": "{last_name}\u00e9"}}'
+    content = "\n".join(lines + [""]).encode() + bad.format(**second).encode("latin-1")
+
+    response = test_app_with_db.post(
+        "/students/import",
+        files={"file": ("students." + format, content, "text/plain")},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["created"] == 1
+    assert response.json()["errors"] == [{"row": 2, "detail": "The file is not UTF-8 text from this row on"}]
+
+
+def test_import_caps_the_error_report(test_app_with_db):
+    test_app_with_db.app.dependency_overrides[get_settings] = lambda: Settings(
+        import_batch_size=2, import_max_errors=3
+    )
+    rows = ["first_name,last_name"] + [",{0}".format(fake.last_name()) for _ in range(7)]
+
+    response = test_app_with_db.post(
+        "/students/import",
+        files={"file": ("students.csv", "\n".join(rows), "text/csv")},
+    )
+    test_app_with_db.app.dependency_overrides[get_settings] = get_settings_override
+    data = response.json()
+
+    assert data["created"] == 0
+    assert data["failed"] == 7
+    assert [error["row"] for error in data["errors"]] == [1, 2, 3]
@@ -1,4 +1,4 @@
-import pytest
+import csv, io, pytest
 from typing import List
 
 from faker import Faker
@@ -46,6 +46,22 @@ def test_post_request_with_proper_body_returns_201(test_app_with_db):
     assert data["first_name"] == first_name
 
 
+def test_get_teachers_is_paginated(test_app_with_db):
+    response = test_app_with_db.get("/teachers/?limit=1&include_total=true")
+    rows = response.json()["teachers"]
+
+    assert len(rows) == 1
+    assert int(response.headers["X-Total-Count"]) >= 1
+
+
+def test_get_teachers_with_fields_returns_only_those_fields(test_app_with_db):
+    response = test_app_with_db.get("/teachers/?limit=1&fields=teacher_code")
+    rows = response.json()["teachers"]
+
+    assert response.status_code == 200
+    assert [list(row) for row in rows] == [["id", "teacher_code"]]
+
+
 def test_get_returns_all_teachers(test_app_with_db):
     response = test_app_with_db.get("/teachers/")
 
@@ -53,6 +69,19 @@ def test_get_returns_all_teachers(test_app_with_db):
     assert isinstance(response.json(), object)
 
 
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_export_streams_teachers_as_csv(
+    test_app_with_db, anyio_backend, create_teacher
+):
+    response = test_app_with_db.get("/teachers/export?format=csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    teacher = next(row for row in rows if row["id"] == str(create_teacher.id))
+
+    assert response.status_code == 200
+    assert teacher["teacher_code"] == create_teacher.teacher_code
+    assert teacher["phone"] == create_teacher.phone
+
+
 def test_get_request_with_teacher_teacher_code_returns_not_found(test_app_with_db):
     response = test_app_with_db.get(
         "/teachers/?teacher_code={teacher_code}".format(
@@ -78,6 +107,20 @@ async def test_get_request_with_id_returns_teacher(
     assert str(teacher) == teacher.fullname()
 
 
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_get_request_with_teacher_phone_returns_teacher(
+    test_app_with_db, anyio_backend, create_teacher
+):
+    teacher = create_teacher
+
+    response = test_app_with_db.get("/teachers/", params={"phone": teacher.phone})
+
+    assert response.status_code == 200
+    assert response.json()["teachers"][0]["id"] == teacher.id
+    assert test_app_with_db.get("/teachers/?phone=000").status_code == 404
+    assert test_app_with_db.get("/teachers/?phone=none").status_code == 404
+
+
 @pytest.mark.parametrize("anyio_backend", ["asyncio"])
 async def test_get_request_with_teacher_code_returns_teacher(
     test_app_with_db, anyio_backend, create_teacher
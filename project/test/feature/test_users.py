@@ -49,6 +49,22 @@ def test_post_request_with_proper_body_returns_201(test_app_with_db):
     assert response.status_code == 201
 
 
+def test_get_users_is_paginated(test_app_with_db):
+    response = test_app_with_db.get("/users/?limit=1&include_total=true")
+    rows = response.json()
+
+    assert len(rows) == 1
+    assert int(response.headers["X-Total-Count"]) >= 1
+
+
+def test_get_users_with_fields_returns_only_those_fields(test_app_with_db):
+    response = test_app_with_db.get("/users/?limit=1&fields=email")
+    rows = response.json()
+
+    assert response.status_code == 200
+    assert [list(row) for row in rows] == [["id", "email"]]
+
+
 def test_get_returns_all_users(test_app_with_db):
     response = test_app_with_db.get("/users/")
 
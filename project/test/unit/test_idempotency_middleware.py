@@ -0,0 +1,59 @@
+import pytest
+
+from app.middleware.IdempotencyMiddleware import IdempotencyMiddleware
+from app.services.IdempotencyStore import IdempotencyStore
+
+
+async def echo(scope, receive, send):
+    request = await receive()
+    assert (await receive())["type"] == "http.disconnect"
+
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"x-echo", b"1")]})
+    await send({"type": "http.response.body", "body": request["body"][:5], "more_body": True})
+    await send({"type": "http.response.body", "body": request["body"][5:]})
+
+
+async def call(middleware, chunks, key="key"):
+    messages = [
+        {"type": "http.request", "body": chunk, "more_body": index < len(chunks) - 1}
+        for index, chunk in enumerate(chunks)
+    ] + [{"type": "http.disconnect"}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/students/scans",
+        "query_string": b"",
+        "headers": [(b"idempotency-key", key.encode())],
+    }
+    await middleware(scope, receive, send)
+
+    return sent[0]["status"], dict(sent[0]["headers"]), b"".join(message.get("body", b"") for message in sent[1:])
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_streamed_requests_and_responses_are_stored_whole(anyio_backend):
+    middleware = IdempotencyMiddleware(echo, IdempotencyStore(), [("POST", r"/students/scans")])
+
+    first = await call(middleware, [b"hello ", b"world"])
+    retry = await call(middleware, [b"hello world"])
+
+    assert first == (200, {b"x-echo": b"1"}, b"hello world")
+    assert retry == (200, {b"x-echo": b"1", b"idempotent-replayed": b"true"}, b"hello world")
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_other_routes_pass_through(anyio_backend):
+    middleware = IdempotencyMiddleware(echo, IdempotencyStore(), [("PUT", r"/students/\d+")])
+
+    await call(middleware, [b"hello world"])
+    retry = await call(middleware, [b"hello world"])
+
+    assert b"idempotent-replayed" not in retry[1]
@@ -0,0 +1,40 @@
+import pytest
+
+from app.config.app import settings
+from app.services import IdempotencyStore as module
+from app.services.IdempotencyStore import DatabaseIdempotencyStore, IdempotencyStore
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_first_request_claims_the_key_and_later_ones_see_its_response(anyio_backend):
+    store = IdempotencyStore(maxsize=10, ttl=60)
+
+    assert await store.begin("key", "request") is None
+    assert await store.begin("key", "request") == {"fingerprint": "request", "response": None}
+
+    await store.finish("key", "request", (201, [], b"{}"))
+    assert await store.begin("key", "request") == {"fingerprint": "request", "response": (201, [], b"{}")}
+    assert store.stats()["replays"] == 1
+
+    await store.discard("key")
+    assert await store.begin("key", "request") is None
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_keys_beyond_maxsize_are_forgotten(anyio_backend):
+    store = IdempotencyStore(maxsize=1, ttl=60)
+    await store.begin("first", "a")
+    await store.begin("second", "b")
+
+    assert await store.begin("first", "a") is None
+    assert store.stats()["size"] == 1
+
+
+@pytest.mark.parametrize("name, kind", [("database", DatabaseIdempotencyStore), ("memory", IdempotencyStore)])
+def test_store_is_chosen_by_setting(monkeypatch, name, kind):
+    monkeypatch.setattr(settings, "idempotency_store", name)
+    module.get_idempotency_store.cache_clear()
+    try:
+        assert isinstance(module.get_idempotency_store(), kind)
+    finally:
+        module.get_idempotency_store.cache_clear()
@@ -0,0 +1,72 @@
+import hashlib
+
+import pytest
+
+from app.services.NotPwnedVerifier import NotPwnedVerifier, build_index
+
+
+def sha1(password: str) -> str:
+    return hashlib.sha1(password.encode()).hexdigest().upper()
+
+
+@pytest.fixture
+def pwned_index(tmp_path):
+    dump = tmp_path / "pwned.txt"
+    counts = {"password": 9545824, "letmein": 285101, "monkey": 1}
+    lines = sorted("{0}:{1}".format(sha1(p), c) for p, c in counts.items())
+    dump.write_text("\r\n".join(lines) + "\r\n\r\n")
+    index = tmp_path / "pwned.idx"
+
+    assert build_index(str(dump), str(index)) == 3
+
+    verifier = NotPwnedVerifier(str(index))
+    yield verifier
+    verifier.close()
+
+
+def test_breached_passwords_are_counted(pwned_index):
+    assert len(pwned_index) == 3
+    assert pwned_index.count("password") == 9545824
+    assert pwned_index.count("letmein") == 285101
+    assert pwned_index.count("correct horse battery staple") == 0
+
+
+def test_verify_honours_threshold(pwned_index):
+    assert not pwned_index.verify("password")
+    assert not pwned_index.verify("monkey")
+    assert pwned_index.verify("monkey", threshold=1)
+    assert pwned_index.verify("correct horse battery staple")
+    assert not pwned_index.verify("")
+
+
+def test_empty_index_has_no_breaches(tmp_path):
+    index = tmp_path / "empty.idx"
+    index.write_bytes(b"")
+    verifier = NotPwnedVerifier(str(index))
+
+    assert verifier.count("password") == 0
+    verifier.close()
+
+
+def test_truncated_index_is_rejected(tmp_path):
+    index = tmp_path / "truncated.idx"
+    index.write_bytes(b"\x00" * 23)
+
+    with pytest.raises(ValueError):
+        NotPwnedVerifier(str(index))
+
+
+def test_importer_rejects_unsorted_dump(tmp_path):
+    dump = tmp_path / "pwned.txt"
+    dump.write_text("{0}:1\n{1}:1\n".format("F" * 40, "0" * 40))
+
+    with pytest.raises(ValueError):
+        build_index(str(dump), str(tmp_path / "pwned.idx"))
+
+
+def test_importer_rejects_malformed_lines(tmp_path):
+    dump = tmp_path / "pwned.txt"
+    dump.write_text("ABCDEF:1\n")
+
+    with pytest.raises(ValueError):
+        build_index(str(dump), str(tmp_path / "pwned.idx"))
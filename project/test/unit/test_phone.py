@@ -0,0 +1,22 @@
+from app.traits.models.phone import phone_e164, phone_keys, phone_suffix
+
+
+def test_national_and_international_forms_share_keys():
+    forms = ["024 400 0001", "+233 24 400 0001", "00233244000001", "244000001"]
+
+    assert {phone_e164(phone) for phone in forms} == {"+233244000001"}
+    assert {phone_suffix(phone) for phone in forms} == {"244000001"}
+
+
+def test_other_countries_keep_their_code():
+    assert phone_e164("+1 (555) 010-4477") == "+15550104477"
+    assert phone_e164("0207 946 0958", country_code="44") == "+442079460958"
+
+
+def test_numbers_that_are_not_e164_have_no_e164_key():
+    assert phone_keys("555-010-4477 x123456") == {
+        "phone_e164": None,
+        "phone_suffix": "477123456",
+    }
+    assert phone_keys("n/a") == {"phone_e164": None, "phone_suffix": None}
+    assert phone_keys(None) == {"phone_e164": None, "phone_suffix": None}
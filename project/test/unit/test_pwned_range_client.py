@@ -0,0 +1,140 @@
+import asyncio
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.config.app import settings
+from app.services.NotPwnedVerifier import (
+    PwnedRangeClient,
+    count_breaches,
+    get_pwned_verifier,
+)
+
+
+def sha1(password: str) -> str:
+    return hashlib.sha1(password.encode()).hexdigest().upper()
+
+
+BREACHES = {"password": 9545824, "letmein": 285101}
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    delay = 0
+    requests = []
+
+    def do_GET(self):
+        self.requests.append(self.path)
+        time.sleep(self.delay)
+        prefix = self.path.rsplit("/", 1)[-1]
+        lines = [
+            "{0}:{1}".format(sha1(password)[5:], count)
+            for password, count in BREACHES.items()
+            if sha1(password).startswith(prefix)
+        ]
+        lines.append("{0}:0".format("0" * 35))
+        body = "\r\n".join(lines).encode()
+
+        try:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up waiting, which the slow tests want it to.
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def range_server():
+    RangeHandler.delay = 0
+    RangeHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield "http://127.0.0.1:{0}/range/".format(server.server_address[1])
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_breach_counts_come_from_range_api(range_server, anyio_backend):
+    client = PwnedRangeClient(range_server)
+
+    assert await client.count("password") == 9545824
+    assert await client.count("letmein") == 285101
+    assert await client.count("correct horse battery staple") == 0
+    assert not await client.verify("password")
+    assert await client.verify("correct horse battery staple")
+    assert not await client.verify("")
+    assert RangeHandler.requests[0] == "/range/{0}".format(sha1("password")[:5])
+
+    await client.aclose()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_ranges_are_cached(range_server, anyio_backend):
+    client = PwnedRangeClient(range_server)
+
+    await client.count("password")
+    await client.count("password")
+
+    assert len(RangeHandler.requests) == 1
+    assert client.stats()["hits"] == 1
+
+    await client.aclose()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_concurrent_lookups_share_one_request(range_server, anyio_backend):
+    RangeHandler.delay = 0.1
+    client = PwnedRangeClient(range_server)
+
+    counts = await asyncio.gather(*(client.count("password") for _ in range(10)))
+
+    assert counts == [9545824] * 10
+    assert len(RangeHandler.requests) == 1
+    assert client.stats()["coalesced"] == 9
+
+    await client.aclose()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_timeouts_fall_back_to_unknown(range_server, anyio_backend):
+    RangeHandler.delay = 0.5
+    client = PwnedRangeClient(range_server, timeout=0.05)
+
+    assert await client.count("password") is None
+    assert await client.verify("password")
+    assert client.stats()["failures"] == 2
+    assert client.stats()["size"] == 0
+
+    await client.aclose()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_count_breaches_uses_configured_range_api(
+    range_server, anyio_backend, monkeypatch
+):
+    monkeypatch.setattr(settings, "pwned_passwords_index", None)
+    monkeypatch.setattr(settings, "pwned_passwords_api_url", range_server)
+
+    assert await count_breaches("password") == 9545824
+
+    await get_pwned_verifier().aclose()
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_count_breaches_is_unknown_when_not_configured(anyio_backend, monkeypatch):
+    monkeypatch.setattr(settings, "pwned_passwords_index", None)
+    monkeypatch.setattr(settings, "pwned_passwords_api_url", None)
+
+    assert await count_breaches("password") is None
@@ -0,0 +1,47 @@
+import time
+
+from app.services.RateLimiter import RateLimiter
+
+
+def test_burst_is_allowed_then_rejected():
+    limiter = RateLimiter(capacity=2, rate=0.01)
+
+    assert limiter.allow("key")
+    assert limiter.allow("key")
+    assert not limiter.allow("key")
+    assert limiter.allow("other")
+    assert limiter.retry_after("key") > 0
+    assert limiter.retry_after("other") == 0
+    assert limiter.stats()["allowed"] == 3
+    assert limiter.stats()["rejected"] == 1
+
+
+def test_bucket_refills_over_time():
+    limiter = RateLimiter(capacity=1, rate=100)
+
+    assert limiter.allow("key")
+    time.sleep(0.02)
+    assert limiter.allow("key")
+
+
+def test_number_of_keys_is_bounded():
+    limiter = RateLimiter(capacity=1, rate=0.01, max_keys=2)
+
+    for key in ("a", "b", "c"):
+        assert limiter.allow(key)
+
+    assert limiter.stats()["keys"] == 2
+    assert limiter.allow("a")
+
+
+def test_compaction_drops_full_buckets():
+    limiter = RateLimiter(capacity=1, rate=100, compact_interval=0)
+    limiter.allow("a")
+    time.sleep(0.02)
+    limiter.allow("b")
+
+    assert limiter.stats()["keys"] == 1
+    assert limiter.stats()["compactions"] == 2
+
+    limiter.reset("b")
+    assert limiter.stats()["keys"] == 0
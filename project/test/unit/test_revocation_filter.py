@@ -0,0 +1,46 @@
+import time
+
+from app.services.RevocationFilter import RevocationFilter
+
+
+def test_revoked_token_is_reported():
+    revocations = RevocationFilter(capacity=100)
+    revocations.revoke("revoked", time.time() + 60)
+
+    assert revocations.is_revoked("revoked")
+    assert not revocations.is_revoked("valid")
+    assert not revocations.is_revoked(None)
+
+
+def test_false_positives_fall_back_to_exact_set():
+    revocations = RevocationFilter(capacity=8, error_rate=0.5)
+    for i in range(8):
+        revocations.revoke("revoked-{0}".format(i), time.time() + 60)
+
+    results = [revocations.is_revoked("valid-{0}".format(i)) for i in range(200)]
+
+    assert not any(results)
+    assert revocations.stats()["false_positives"] > 0
+
+
+def test_compaction_drops_expired_revocations():
+    revocations = RevocationFilter(capacity=2)
+    revocations.revoke("expired", time.time() - 1)
+    revocations.revoke("live", time.time() + 60)
+    revocations.revoke("new", time.time() + 60)
+
+    assert not revocations.is_revoked("expired")
+    assert revocations.is_revoked("live")
+    assert revocations.is_revoked("new")
+    assert revocations.stats()["revoked"] == 2
+    assert revocations.stats()["compactions"] == 1
+
+
+def test_live_revocations_beyond_capacity_compact_when_the_set_doubles():
+    revocations = RevocationFilter(capacity=4)
+    for i in range(32):
+        revocations.revoke("live-{0}".format(i), time.time() + 60)
+
+    assert revocations.stats()["revoked"] == 32
+    assert revocations.stats()["compactions"] == 3
+    assert all(revocations.is_revoked("live-{0}".format(i)) for i in range(32))
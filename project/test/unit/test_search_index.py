@@ -0,0 +1,90 @@
+from app.services.SearchIndex import SearchIndex, normalize
+
+
+def build_index() -> SearchIndex:
+    index = SearchIndex()
+    for id, name in enumerate(
+        ["Kwame Mensah", "Kwabena Owusu", "Ama Serwaa Mensah", "Akosua Mensa", "Adjoa Asante"]
+    ):
+        index.add(id, name, {"type": "student", "id": id, "name": name})
+
+    return index
+
+
+def test_partial_words_match_as_prefixes():
+    results = build_index().search("kwa")
+
+    assert sorted(result["name"] for result in results) == ["Kwabena Owusu", "Kwame Mensah"]
+
+
+def test_prefix_matches_rank_shorter_names_first():
+    results = build_index().search("mensah")
+
+    assert [result["name"] for result in results] == ["Kwame Mensah", "Ama Serwaa Mensah"]
+    assert results[0]["score"] > results[1]["score"] > 1
+
+
+def test_typos_fall_back_to_shared_trigrams():
+    results = build_index().search("mensha")
+
+    assert sorted(result["name"] for result in results) == [
+        "Akosua Mensa", "Ama Serwaa Mensah", "Kwame Mensah"
+    ]
+    assert all(result["score"] < 1 for result in results)
+    assert build_index().search("mensha", kind="guardian") == []
+
+
+def test_every_word_narrows_the_results():
+    results = build_index().search("ama mens")
+
+    assert results[0]["name"] == "Ama Serwaa Mensah"
+
+
+def test_strict_indexes_drop_partial_matches():
+    index = SearchIndex(min_score=1)
+    for id, name in enumerate(["Kwame Mensah", "Kwabena Owusu", "Kwaku Mensah"]):
+        index.add(id, name, {"type": "student" if id else "guardian", "id": id, "name": name})
+
+    assert [result["id"] for result in index.search("kwame mens")] == [0]
+    assert index.search("kwa mensah") == []
+    assert index.search("kwab mens") == []
+    assert [result["id"] for result in index.search("kwame mnsah", kind="student")] == []
+    assert index.search("owsu") == []
+
+
+def test_names_are_matched_without_case_or_accents():
+    index = SearchIndex()
+    index.add(1, "Chloé Ásante", {"type": "guardian", "id": 1, "name": "Chloé Ásante"})
+
+    assert index.search("CHLOE asa")[0]["id"] == 1
+    assert normalize("Chloé  O'Neil-Ásante") == ["chloe", "o", "neil", "asante"]
+
+
+def test_remove_and_re_add_update_the_index():
+    index = build_index()
+
+    index.remove(0)
+    index.remove(0)
+    index.add(1, "Yaw Boateng", {"type": "student", "id": 1, "name": "Yaw Boateng"})
+
+    assert 0 not in index
+    assert index.search("kwa") == []
+    assert index.search("boat")[0]["id"] == 1
+    assert len(index) == 4
+
+
+def test_search_filters_by_type_and_limit():
+    index = build_index()
+    index.add("g", "Kwame Asante", {"type": "guardian", "id": 9, "name": "Kwame Asante"})
+
+    assert [result["id"] for result in index.search("kwame", kind="guardian")] == [9]
+    assert len(index.search("a", limit=2)) == 2
+
+
+def test_queries_without_words_find_nothing():
+    index = build_index()
+
+    assert index.search(" -- ") == []
+    assert index.stats() == {
+        "documents": 5, "trigrams": index.stats()["trigrams"], "words": 10, "searches": 1
+    }
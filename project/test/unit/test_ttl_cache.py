@@ -0,0 +1,57 @@
+import time
+
+from app.services.TTLCache import TTLCache
+
+
+def test_get_returns_cached_value_and_counts_hits_and_misses():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("token", "user")
+
+    assert cache.get("token") == "user"
+    assert cache.get("missing") is None
+    assert cache.stats() == {"size": 1, "maxsize": 2, "hits": 1, "misses": 1}
+
+
+def test_least_recently_used_entry_is_evicted_when_full():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert len(cache) == 2
+
+
+def test_expired_entry_is_a_miss():
+    cache = TTLCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert "a" not in cache
+    assert cache.get("a", "default") == "default"
+    assert len(cache) == 0
+
+
+def test_non_positive_ttl_is_not_stored():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1, ttl=0)
+
+    assert len(cache) == 0
+
+
+def test_evict_removes_matching_entries():
+    cache = TTLCache(maxsize=4, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("c", 1)
+
+    assert cache.evict(lambda key, value: value == 1) == 2
+    assert cache.pop("b") == 2
+    assert cache.pop("b", "gone") == "gone"
+
+    cache.set("d", 4)
+    cache.clear()
+    assert len(cache) == 0
@@ -1,7 +1,16 @@
-from datetime import timedelta
+from datetime import date, datetime, timedelta
 import pytest
+from passlib.context import CryptContext
+from passlib.hash import bcrypt
+from starlette.responses import Response
 
-from app.utils import create_access_token
+from app.utils import (
+    calibrate_password_hashing,
+    create_access_token,
+    fast_json_response,
+    get_password_hash_async,
+    verify_password_async,
+)
 
 
 def test_create_access_token_without_data_raises_type_error():
@@ -26,3 +35,41 @@ def test_create_access_token_with_data_and_expires_delta_returns_access_token():
     encoded_data = create_access_token(data, timedelta(minutes=2))
 
     assert isinstance(encoded_data, str)
+
+
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_password_hashing_runs_in_executor(anyio_backend):
+    hashed_password = await get_password_hash_async("password")
+
+    assert await verify_password_async("password", hashed_password)
+    assert not await verify_password_async("wrong_password", hashed_password)
+
+
+def test_calibration_picks_rounds_within_bounds():
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    assert calibrate_password_hashing(0.001, min_rounds=4, max_rounds=6, context=context) == 4
+    assert context.needs_update(bcrypt.using(rounds=6).hash("password"))
+    assert not context.needs_update(context.hash("password"))
+
+    assert calibrate_password_hashing(10 ** 9, min_rounds=4, max_rounds=6, context=context) == 6
+    assert context.needs_update(bcrypt.using(rounds=4).hash("password"))
+
+
+def test_fast_json_response_keeps_headers_and_encodes_dates():
+    headers = Response()
+    headers.headers["X-Next-Cursor"] = "abc"
+
+    response = fast_json_response(
+        [{"id": 1, "on": date(2030, 1, 31), "at": datetime(2030, 1, 31, 7, 45)}], headers
+    )
+
+    assert response.body == b'[{"id": 1, "on": "2030-01-31", "at": "2030-01-31T07:45:00"}]'
+    assert response.headers["X-Next-Cursor"] == "abc"
+    assert response.headers["Content-Length"] == str(len(response.body))
+    assert response.media_type == "application/json"
+
+
+def test_fast_json_response_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        fast_json_response({"value": object()}, Response())